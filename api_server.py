@@ -0,0 +1,439 @@
+"""上传应用计算入口的本地 HTTP 接口
+
+应用在模块中定义 compute(**params) 后，批处理脚本可以不经过浏览器直接调用：
+
+    POST /apps/<应用ID>/compute    {"params": {"T_c": 320, "T_h": 450}}
+    POST /apps/<应用ID>/compute    {"params": [{"T_c": 320}, {"T_c": 330}, ...]}
+    GET  /apps                     应用列表
+    GET  /health
+    GET  /downloads/<令牌>          设置页签发的临时下载链接（如导出的备份归档）
+
+单组参数返回 {"app_id", "result"}；参数列表返回 {"app_id", "results", "errors"}，失败的
+组在 results 中为 null 并在 errors 中给出下标与原因。请求头 Accept 为
+application/vnd.apache.arrow.stream（或查询参数 ?format=arrow）时以 Arrow IPC 流返回
+（需要安装 pyarrow）。
+
+模块通过 AppManager.compile_module() 加载，与界面共用常驻模块、编译缓存和注入的
+cache / offload 等函数，并经过运行调度器的名额控制。参数组在线程池中执行，每组参数
+在执行线程中单独申请名额并计时，应用中的 should_stop() 对应到这一次计算；mode="process"
+时整批参数交给工作进程池（只适用于模块级的 compute）。可以随 Streamlit 一起启动
+（设置中的 HTTP 接口端口），也可以单独运行：
+
+    python api_server.py --port 8601 --mode process --workers 8
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import importlib
+import json
+import math
+import mimetypes
+import os
+import shutil
+import sys
+import threading
+import uuid
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+from blob_store import blob_store
+from download_links import download_links
+from module_registry import module_registry
+from scheduler import DEFAULT_APP_WEIGHT, QueueTimeout, RunCancelled, scheduler
+from telemetry import telemetry
+from worker_pool import EXECUTION_INLINE, get_worker_pool, is_offloadable
+
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_WORKERS = 8
+MODE_THREAD = "thread"
+MODE_PROCESS = "process"
+API_MODES = {
+    MODE_THREAD: "线程池（服务进程内执行）",
+    MODE_PROCESS: "工作进程池",
+}
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MAX_BODY_BYTES = 64 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+COMPUTE_ENTRY = "compute"
+
+
+class ApiError(Exception):
+    """以指定 HTTP 状态码返回给调用方的错误"""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def to_jsonable(value: Any) -> Any:
+    """把计算结果转换为可 JSON 序列化的值（支持 numpy 与 pandas 对象）"""
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    type_name = type(value).__name__
+    if type_name == "DataFrame" and hasattr(value, "to_dict"):
+        return to_jsonable(value.to_dict(orient="records"))
+    if type_name == "Series" and hasattr(value, "to_dict"):
+        return to_jsonable(value.to_dict())
+    if hasattr(value, "tolist"):
+        # numpy 数组与标量
+        return to_jsonable(value.tolist())
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def to_arrow(results: List[Any], batch: bool) -> bytes:
+    """把结果编码为 Arrow IPC 流；批量请求增加 batch_index 列"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ApiError(HTTPStatus.NOT_ACCEPTABLE, "服务端未安装 pyarrow，无法返回 Arrow 格式")
+
+    tables = []
+    for index, result in enumerate(results):
+        if type(result).__name__ == "DataFrame":
+            table = pa.Table.from_pandas(result, preserve_index=False)
+        elif isinstance(result, dict) and result and all(isinstance(v, (list, tuple)) or hasattr(v, "tolist")
+                                                         for v in result.values()):
+            table = pa.table({str(k): to_jsonable(v) for k, v in result.items()})
+        elif isinstance(result, (list, tuple)) and result and all(isinstance(row, dict) for row in result):
+            table = pa.Table.from_pylist(to_jsonable(list(result)))
+        elif isinstance(result, dict):
+            table = pa.Table.from_pylist([to_jsonable(result)])
+        else:
+            table = pa.table({"result": [to_jsonable(result)]})
+        if batch:
+            table = table.append_column("batch_index", pa.array([index] * table.num_rows, pa.int64()))
+        tables.append(table)
+    if not tables:
+        table = pa.table({})
+    else:
+        try:
+            table = pa.concat_tables(tables, promote_options="default")
+        except TypeError:
+            # pyarrow < 14
+            table = pa.concat_tables(tables, promote=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ApiServer:
+    """按应用 ID 调用 compute(**params) 的 HTTP 服务"""
+
+    def __init__(self, manager_factory: Callable[[], Any], host: str = DEFAULT_API_HOST, port: int = 8601,
+                 workers: int = DEFAULT_API_WORKERS, mode: str = MODE_THREAD,
+                 context: Optional[Callable[[], ContextManager]] = None):
+        self.manager_factory = manager_factory
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.mode = mode
+        # 每个请求在此上下文中执行（独立运行时用于提供 headless streamlit 的会话）
+        self.context = context or contextlib.nullcontext
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self.errors = 0
+        # 启动失败（如端口被占用）的原因，显示在设置页
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def list_apps(self) -> List[Dict]:
+        with self.context():
+            manager = self.manager_factory()
+            return [{"id": app["id"], "title": app.get("title"), "category": app.get("category")}
+                    for app in manager.apps_config["apps"]]
+
+    def _run(self, app_id: str, weight: int, settings: Dict, func: Callable, params: Dict) -> Any:
+        """在执行线程中申请名额、计时并提供会话上下文后调用 compute(**params)"""
+        # 每组参数使用独立的会话 ID：同一会话的新运行会取消旧的
+        session_id = f"api-{uuid.uuid4().hex}"
+        with self.context(), \
+                scheduler.admit(app_id, session_id, weight, queue_timeout=settings["queue_timeout"],
+                                run_timeout=settings["run_timeout"]), \
+                telemetry.measure(app_id, session_id), module_registry.pin(app_id):
+            return func(**params)
+
+    def compute(self, app_id: str, param_sets: List[Dict]) -> Tuple[List[Any], List[Dict]]:
+        """对每组参数调用应用的 compute()，返回 (结果列表, 错误列表)"""
+        with self.context():
+            manager = self.manager_factory()
+            app = manager.get_app(app_id)
+            if not app:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"找不到应用 {app_id}")
+            code = manager.get_app_source(app)
+            if code is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"找不到应用 {app_id} 的源码")
+            try:
+                module = manager.compile_module(app_id, code, app.get("execution", EXECUTION_INLINE))
+            except Exception as e:
+                raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, f"加载模块失败: {e}")
+            func = getattr(module, COMPUTE_ENTRY, None)
+            if not callable(func):
+                raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, f"应用 {app_id} 未定义 {COMPUTE_ENTRY}()")
+
+            scheduler.configure(int(manager.get_setting("max_concurrent_runs")))
+            weight = app.get("weight", DEFAULT_APP_WEIGHT)
+            settings = {key: manager.get_setting(key) for key in ("queue_timeout", "run_timeout")}
+            if self.mode == MODE_PROCESS and is_offloadable(func):
+                # 工作进程中的计算无法协作停止：整批参数在当前线程申请一次名额
+                session_id = f"api-{uuid.uuid4().hex}"
+                try:
+                    with scheduler.admit(app_id, session_id, weight, queue_timeout=settings["queue_timeout"],
+                                         run_timeout=settings["run_timeout"]), \
+                            telemetry.measure(app_id, session_id), module_registry.pin(app_id):
+                        # 与 compile_module() 相同：以实际加载的源码摘要定位工作进程中的模块
+                        digest = blob_store.put(code)
+                        pool = get_worker_pool(manager.get_setting("worker_pool_size"))
+                        source_path = blob_store.path_for(digest)
+                        futures = [pool.submit(app_id, digest, source_path, func, (), params)
+                                   for params in param_sets]
+                        timeout = manager.get_setting("worker_timeout")
+                        outcomes = [self._settle(lambda f=future: f.get(timeout)) for future in futures]
+                except (QueueTimeout, RunCancelled) as e:
+                    outcomes = [(False, e)] * len(param_sets)
+            else:
+                futures = [self._executor.submit(self._run, app_id, weight, settings, func, params)
+                           for params in param_sets]
+                outcomes = [self._settle(future.result) for future in futures]
+
+        if len(outcomes) == 1 and isinstance(outcomes[0][1], (QueueTimeout, RunCancelled)):
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, self._describe(outcomes[0][1]))
+        results, errors = [], []
+        for index, (ok, value) in enumerate(outcomes):
+            if ok:
+                results.append(value)
+            else:
+                results.append(None)
+                errors.append({"index": index, "error": self._describe(value)})
+        return results, errors
+
+    @staticmethod
+    def _settle(get: Callable[[], Any]) -> Tuple[bool, Any]:
+        try:
+            return True, get()
+        except Exception as e:
+            return False, e
+
+    @staticmethod
+    def _describe(error: Exception) -> str:
+        if isinstance(error, QueueTimeout):
+            return "当前运行的应用较多，排队超时"
+        if isinstance(error, RunCancelled):
+            return "运行被取消"
+        return f"{type(error).__name__}: {error}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: HTTPStatus, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: HTTPStatus, payload: Any):
+                body = json.dumps(payload, ensure_ascii=False, allow_nan=False).encode('utf-8')
+                self._send(status, body, "application/json; charset=utf-8")
+
+            def _dispatch(self, method: str):
+                url = urlparse(self.path)
+                parts = [part for part in url.path.split("/") if part]
+                with server._lock:
+                    server.requests += 1
+                try:
+                    if method == "GET" and parts == ["health"]:
+                        self._send_json(HTTPStatus.OK, {"status": "ok", "mode": server.mode})
+                    elif method == "GET" and parts == ["apps"]:
+                        self._send_json(HTTPStatus.OK, {"apps": server.list_apps()})
+                    elif method == "POST" and len(parts) == 3 and parts[0] == "apps" and parts[2] == COMPUTE_ENTRY:
+                        self._compute(parts[1], url)
+                    elif method == "GET" and len(parts) == 2 and parts[0] == "downloads":
+                        self._download(parts[1])
+                    else:
+                        raise ApiError(HTTPStatus.NOT_FOUND, f"未知的接口: {method} {url.path}")
+                except ApiError as e:
+                    with server._lock:
+                        server.errors += 1
+                    self._send_json(e.status, {"error": str(e)})
+                except Exception as e:
+                    with server._lock:
+                        server.errors += 1
+                    self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"})
+
+            def _compute(self, app_id: str, url):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    # 未读取的请求体会留在连接上，回复后关闭连接
+                    self.close_connection = True
+                    raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError as e:
+                    raise ApiError(HTTPStatus.BAD_REQUEST, f"请求体不是合法的 JSON: {e}")
+                if not isinstance(body, dict):
+                    raise ApiError(HTTPStatus.BAD_REQUEST, "请求体必须是 JSON 对象")
+                params = body.get("params", body)
+                batch = isinstance(params, list)
+                param_sets = params if batch else [params]
+                if not all(isinstance(item, dict) for item in param_sets):
+                    raise ApiError(HTTPStatus.BAD_REQUEST, "params 必须是对象或对象列表")
+
+                results, errors = server.compute(app_id, param_sets)
+                wants_arrow = (parse_qs(url.query).get("format") == ["arrow"]
+                               or ARROW_MIME in (self.headers.get("Accept") or ""))
+                if wants_arrow:
+                    if errors:
+                        raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                       f"第 {errors[0]['index']} 组参数计算失败: {errors[0]['error']}")
+                    self._send(HTTPStatus.OK, to_arrow(results, batch), ARROW_MIME)
+                elif batch:
+                    self._send_json(HTTPStatus.OK, {"app_id": app_id, "results": to_jsonable(results),
+                                                    "errors": errors})
+                elif errors:
+                    raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, errors[0]["error"])
+                else:
+                    self._send_json(HTTPStatus.OK, {"app_id": app_id, "result": to_jsonable(results[0])})
+
+            def _download(self, token: str):
+                link = download_links.resolve(token)
+                if link is None:
+                    raise ApiError(HTTPStatus.NOT_FOUND, "下载链接无效或已过期")
+                path, filename = link
+                try:
+                    f = open(path, 'rb')
+                except OSError:
+                    raise ApiError(HTTPStatus.NOT_FOUND, "文件已不存在")
+                with f:
+                    self.send_response(HTTPStatus.OK)
+                    self.send_header("Content-Type", mimetypes.guess_type(filename)[0] or "application/octet-stream")
+                    self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+                    self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename)}")
+                    self.end_headers()
+                    try:
+                        # 按块发送，内存占用与文件大小无关
+                        shutil.copyfileobj(f, self.wfile, DOWNLOAD_CHUNK_SIZE)
+                    except OSError:
+                        # 响应头已发出，客户端中断时只能关闭连接
+                        self.close_connection = True
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+        return Handler
+
+    def _bind(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+    def start(self):
+        """在后台线程中开始监听"""
+        self._bind()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="api-server", daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        """在当前线程中监听（独立运行）"""
+        self._bind()
+        self._httpd.serve_forever()
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        self._executor.shutdown(wait=False)
+
+    def status(self) -> Dict:
+        return {"host": self.host, "port": self.port, "mode": self.mode, "workers": self.workers,
+                "requests": self.requests, "errors": self.errors, "error": self.error}
+
+
+_server: Optional[ApiServer] = None
+_server_lock = threading.Lock()
+
+
+def start_api_server(manager_factory: Callable[[], Any], port: int, mode: str = MODE_THREAD,
+                     workers: int = DEFAULT_API_WORKERS, host: str = DEFAULT_API_HOST) -> Optional[ApiServer]:
+    """随 Streamlit 启动的进程级单例；端口为 0 时关闭，参数变化时重启
+
+    端口被占用等启动失败不会抛出，原因记录在返回对象的 status()["error"] 中，
+    下次调用时重试。
+    """
+    global _server
+    with _server_lock:
+        if _server is not None and (_server.error is not None or
+                                    (_server.port, _server.mode, _server.workers) != (port, mode, workers)):
+            _server.stop()
+            _server = None
+        if _server is None and port:
+            server = ApiServer(manager_factory, host, port, workers, mode)
+            try:
+                server.start()
+            except OSError as e:
+                server.error = str(e)
+                server.stop()
+            _server = server
+        return _server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="上传应用计算入口的 HTTP 接口")
+    parser.add_argument("--host", default=DEFAULT_API_HOST)
+    parser.add_argument("--port", type=int, default=8601)
+    parser.add_argument("--mode", choices=list(API_MODES), default=MODE_THREAD)
+    parser.add_argument("--workers", type=int, default=DEFAULT_API_WORKERS, help="线程池大小")
+    args = parser.parse_args(argv)
+
+    # 独立运行时用 headless streamlit 导入启动器，不需要浏览器会话
+    from headless_streamlit import install
+    fake = install()
+    launcher = importlib.import_module("streamlit_app")
+    from app_watcher import start_app_watcher
+    from import_manifest import prewarm_on_startup
+    with fake.session():
+        manager = launcher.AppManager(start_services=False)
+        manager.initialize_if_empty()
+        prewarm_on_startup(manager.apps_config)
+    start_app_watcher(launcher.UPLOAD_DIR, launcher.CONFIG_FILE, launcher.DEFAULT_CONFIG)
+
+    server = ApiServer(functools.partial(launcher.AppManager, start_services=False), args.host, args.port,
+                       args.workers, args.mode, context=fake.session)
+    print(f"HTTP 接口已启动: http://{args.host}:{args.port}（{API_MODES[args.mode]}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
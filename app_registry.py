@@ -0,0 +1,194 @@
+"""应用注册表：按 ID、分类、标题索引的应用查询
+
+默认的 JsonAppRegistry 在共享配置之上维护内存索引；可选的 SqliteAppRegistry
+把应用元数据批量导入 SQLite（带 id、分类、标题索引），分页与按分类查询只读取
+可见的那部分记录。两者提供相同的查询方法，配置被整体重新加载时自动重建。
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+REGISTRY_JSON = "json"
+REGISTRY_SQLITE = "sqlite"
+REGISTRY_BACKENDS = {
+    REGISTRY_JSON: "内存索引（JSON 配置）",
+    REGISTRY_SQLITE: "SQLite 索引",
+}
+REGISTRY_DB = "apps_registry.db"
+
+
+class JsonAppRegistry:
+    """在配置中的应用列表上维护 id / 分类 / 标题索引"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation: Optional[int] = None
+        self._apps: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._by_title: Dict[str, Dict] = {}
+        self._by_category: Dict[str, List[Dict]] = {}
+
+    def sync(self, apps: List[Dict], generation: int):
+        """配置被整体替换或本地修改过时重建索引"""
+        with self._lock:
+            if self.generation == generation and self._apps is apps:
+                return
+            by_id, by_title, by_category = {}, {}, {}
+            for app in apps:
+                by_id[app["id"]] = app
+                # 标题重复时以列表中最后一个应用为准
+                by_title[app.get("title")] = app
+                by_category.setdefault(app.get("category", "default"), []).append(app)
+            self._apps = apps
+            self._by_id, self._by_title, self._by_category = by_id, by_title, by_category
+            self.generation = generation
+
+    def apply_change(self, change: Dict):
+        """本地修改后标记索引失效，下次查询时重建"""
+        with self._lock:
+            self.generation = None
+
+    def get(self, app_id: str) -> Optional[Dict]:
+        return self._by_id.get(app_id)
+
+    def get_by_title(self, title: str) -> Optional[Dict]:
+        return self._by_title.get(title)
+
+    def by_category(self, category_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        apps = self._by_category.get(category_id, [])
+        return apps[offset:offset + limit] if limit is not None else apps[offset:]
+
+    def count(self, category_id: Optional[str] = None) -> int:
+        if category_id is None:
+            return len(self._apps)
+        return len(self._by_category.get(category_id, []))
+
+    def page(self, offset: int, limit: int) -> List[Dict]:
+        return self._apps[offset:offset + limit]
+
+
+class SqliteAppRegistry:
+    """SQLite 中的应用注册表；所有线程共用一个连接，访问时加锁
+
+    Streamlit 每次重跑都在新的脚本线程中执行，按线程建立连接会不断打开新连接。
+    """
+
+    def __init__(self, path: str = REGISTRY_DB):
+        self.path = path
+        self.generation: Optional[int] = None
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS apps (
+                    id TEXT PRIMARY KEY,
+                    title TEXT,
+                    category TEXT,
+                    position INTEGER,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_apps_category ON apps (category, position);
+                CREATE INDEX IF NOT EXISTS idx_apps_title ON apps (title);
+                CREATE INDEX IF NOT EXISTS idx_apps_position ON apps (position);
+            """)
+
+    def sync(self, apps: List[Dict], generation: int):
+        """配置被整体重新加载（generation 变化）时从 JSON 批量导入"""
+        with self._lock:
+            if self.generation == generation:
+                return
+            self.bulk_import(apps)
+            self.generation = generation
+
+    def bulk_import(self, apps: List[Dict]):
+        """在一个事务中用应用列表替换全部记录"""
+        rows = [
+            (app["id"], app.get("title"), app.get("category", "default"), position,
+             json.dumps(app, ensure_ascii=False))
+            for position, app in enumerate(apps)
+        ]
+        with self._lock, self._conn as conn:
+            conn.execute("DELETE FROM apps")
+            conn.executemany(
+                "INSERT OR REPLACE INTO apps (id, title, category, position, data) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def apply_change(self, change: Dict):
+        """把一条配置变更同步到数据库"""
+        op = change["op"]
+        with self._lock, self._conn as conn:
+            if op == "upsert_app":
+                app = change["app"]
+                row = conn.execute("SELECT position FROM apps WHERE id = ?", (app["id"],)).fetchone()
+                if row is None:
+                    row = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM apps").fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO apps (id, title, category, position, data) VALUES (?, ?, ?, ?, ?)",
+                    (app["id"], app.get("title"), app.get("category", "default"), row[0],
+                     json.dumps(app, ensure_ascii=False)),
+                )
+            elif op == "delete_app":
+                conn.execute("DELETE FROM apps WHERE id = ?", (change["id"],))
+            elif op == "replace":
+                self.bulk_import(change["config"].get("apps", []))
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, app_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM apps WHERE id = ?", (app_id,))
+        return rows[0] if rows else None
+
+    def get_by_title(self, title: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM apps WHERE title = ? ORDER BY position DESC LIMIT 1", (title,))
+        return rows[0] if rows else None
+
+    def by_category(self, category_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        return self._query(
+            "SELECT data FROM apps WHERE category = ? ORDER BY position LIMIT ? OFFSET ?",
+            (category_id, -1 if limit is None else limit, offset),
+        )
+
+    def count(self, category_id: Optional[str] = None) -> int:
+        with self._lock:
+            if category_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM apps").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM apps WHERE category = ?",
+                                      (category_id,)).fetchone()[0]
+
+    def page(self, offset: int, limit: int) -> List[Dict]:
+        return self._query("SELECT data FROM apps ORDER BY position LIMIT ? OFFSET ?", (limit, offset))
+
+
+_registries: Dict[str, object] = {}
+_registries_lock = threading.Lock()
+
+
+def get_app_registry(backend: str, apps: List[Dict], generation: int, db_path: str = REGISTRY_DB):
+    """获取进程级共享的应用注册表，并确保其与当前配置同步"""
+    key = REGISTRY_SQLITE if backend == REGISTRY_SQLITE else REGISTRY_JSON
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            if key == REGISTRY_SQLITE:
+                registry = SqliteAppRegistry(os.path.abspath(db_path))
+            else:
+                registry = JsonAppRegistry()
+            _registries[key] = registry
+    registry.sync(apps, generation)
+    return registry
+
+
+def apply_change_to_registries(change: Dict):
+    """把一条配置变更（本地修改或文件监视器的对账结果）同步到所有已创建的注册表"""
+    with _registries_lock:
+        registries = list(_registries.values())
+    for registry in registries:
+        registry.apply_change(change)
@@ -0,0 +1,218 @@
+"""上传应用文件的后台监视与热重载
+
+在磁盘上直接编辑 uploaded_apps/*.py 或恢复备份后，后台线程会发现变化的文件，
+只重新编译这些文件：新的 code object 替换编译缓存中的旧条目，常驻的
+过期模块被移除，配置中的摘要、源码元数据与导入清单随之对账。优先使用 watchdog
+（inotify 等系统通知），不可用时退化为后台轮询；所有 stat 都发生在监视线程中，
+页面重跑不会为此付出任何文件系统开销。
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from app_registry import apply_change_to_registries
+from blob_store import blob_store, describe_source
+from code_cache import code_cache, source_digest
+from config_store import get_config_store
+from import_manifest import prewarm, scan_imports
+from module_registry import module_registry
+from search_index import update_indexed_app
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog 是 Streamlit 的可选依赖，缺失时使用轮询
+    FileSystemEventHandler = object
+    Observer = None
+
+WATCHER_WATCHDOG = "watchdog"
+WATCHER_POLLING = "polling"
+POLL_INTERVAL = 1.0
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "AppWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path:
+                self.watcher.mark_changed(path)
+
+
+class AppWatcher:
+    """监视应用目录，把变化的文件对账到编译缓存、sys.modules 与配置"""
+
+    def __init__(self, upload_dir: str, config_path: str, default_config: Dict,
+                 interval: float = POLL_INTERVAL, use_watchdog: bool = True):
+        self.upload_dir = upload_dir
+        self.config_path = config_path
+        self.default_config = default_config
+        self.interval = interval
+        self.backend = WATCHER_WATCHDOG if use_watchdog and Observer is not None else WATCHER_POLLING
+        self.reloads = 0
+        self.last_reload: Optional[str] = None
+        self.errors: Dict[str, str] = {}
+        self._pending: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._stat_keys: Dict[str, Tuple[int, int]] = {}
+        self._dir_key: Optional[Tuple[int, int]] = None
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动后台监视线程（重复调用无副作用）"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="app-watcher", daemon=True)
+        self._thread.start()
+
+    def mark_changed(self, path: str):
+        """记录一个可能变化的应用文件，由监视线程稍后处理"""
+        app_id = self._app_id_for(path)
+        if app_id is not None:
+            with self._pending_lock:
+                self._pending.add(app_id)
+
+    def _app_id_for(self, path: str) -> Optional[str]:
+        directory, name = os.path.split(os.path.abspath(path))
+        if directory != os.path.abspath(self.upload_dir) or not name.endswith(".py"):
+            return None
+        return name[:-3]
+
+    def _loop(self):
+        while True:
+            try:
+                self._check_directory()
+                if self.backend == WATCHER_POLLING:
+                    self._poll()
+                # 事件先积累一个周期再处理，编辑器的多次写入只触发一次重新编译
+                with self._pending_lock:
+                    pending, self._pending = self._pending, set()
+                for app_id in sorted(pending):
+                    self.reload_app(app_id)
+            except Exception as e:
+                self.errors["<watcher>"] = str(e)
+            time.sleep(self.interval)
+
+    def _check_directory(self):
+        """首次启动或目录被删除重建（重置、恢复备份）后挂载监视，并全量对账一次"""
+        try:
+            st = os.stat(self.upload_dir)
+            dir_key = (st.st_dev, st.st_ino)
+        except FileNotFoundError:
+            dir_key = None
+        if dir_key == self._dir_key:
+            return
+        self._dir_key = dir_key
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if dir_key is None:
+            return
+        if self.backend == WATCHER_WATCHDOG:
+            try:
+                observer = Observer()
+                observer.schedule(_EventHandler(self), self.upload_dir, recursive=False)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                # 例如 inotify 监视数达到上限：退化为轮询
+                self.errors["<watcher>"] = str(e)
+                self.backend = WATCHER_POLLING
+        # 启动时同样对账一次，覆盖服务停止期间发生的修改
+        self._stat_keys = self._scan()
+        with self._pending_lock:
+            self._pending.update(self._stat_keys)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        keys = {}
+        try:
+            entries = list(os.scandir(self.upload_dir))
+        except FileNotFoundError:
+            return keys
+        for entry in entries:
+            if entry.name.endswith(".py") and entry.is_file():
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                keys[entry.name[:-3]] = (st.st_mtime_ns, st.st_size)
+        return keys
+
+    def _poll(self):
+        keys = self._scan()
+        changed = {app_id for app_id, key in keys.items() if self._stat_keys.get(app_id) != key}
+        changed.update(set(self._stat_keys) - set(keys))
+        self._stat_keys = keys
+        if changed:
+            with self._pending_lock:
+                self._pending.update(changed)
+
+    def reload_app(self, app_id: str) -> bool:
+        """重新编译单个应用文件并对账配置，返回是否有改动"""
+        path = os.path.join(self.upload_dir, f"{app_id}.py")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                code = f.read()
+        except FileNotFoundError:
+            # 文件被删除：只丢弃过期模块，应用的删除由管理界面负责
+            module_registry.discard(app_id)
+            return False
+
+        store = get_config_store(self.config_path)
+        config = store.get(self.default_config)
+        app = next((item for item in config.get("apps", []) if item.get("id") == app_id), None)
+        digest = source_digest(code)
+        if app is None or app.get("code_sha256") == digest:
+            # 未登记的文件（例如上传尚未写入配置），或内容与配置一致
+            return False
+
+        try:
+            code_cache.replace(app_id, code, path)
+            self.errors.pop(app_id, None)
+        except SyntaxError as e:
+            # 仍以磁盘文件为准更新配置，错误会在应用运行时显示
+            self.errors[app_id] = f"{e.msg} (第 {e.lineno} 行)"
+        module_registry.discard(app_id)
+
+        updated = dict(app)
+        updated["code_sha256"] = blob_store.put(code)
+        updated["imports"] = scan_imports(code)
+        updated.update(describe_source(code))
+        change = {"op": "upsert_app", "app": updated}
+        store.record(change)
+        apply_change_to_registries(change)
+        update_indexed_app(updated, code)
+        prewarm(updated["imports"])
+        self.reloads += 1
+        self.last_reload = f"{app_id} @ {updated['updated_at']}"
+        return True
+
+    def status(self) -> Dict:
+        """监视器状态，供设置页展示"""
+        return {
+            "backend": self.backend,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+            "errors": dict(self.errors),
+        }
+
+
+_watcher: Optional[AppWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def start_app_watcher(upload_dir: str, config_path: str, default_config: Dict) -> AppWatcher:
+    """每个进程只启动一个应用文件监视器"""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = AppWatcher(upload_dir, config_path, default_config)
+            _watcher.start()
+        return _watcher
@@ -0,0 +1,391 @@
+"""增量、按内容寻址的备份快照
+
+每个备份目录只保存一份 manifest.json，记录相对路径到文件 SHA-256 的映射；
+文件内容保存在共享的 objects/ 目录中，未变化的文件在多个备份之间复用。
+已哈希过的文件按 (大小, mtime) 缓存摘要，创建备份的耗时只与变化的文件成正比。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config_store import replacement_mode
+
+MANIFEST_FILE = "manifest.json"
+OBJECTS_DIR = "objects"
+# 目录索引与哈希缓存放在子目录中，写入它们不会改变备份根目录的 mtime
+CATALOG_DIR = ".catalog"
+HASH_CACHE_FILE = os.path.join(CATALOG_DIR, "hash_cache.json")
+CATALOG_FILE = os.path.join(CATALOG_DIR, "catalog.json")
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.RLock()
+
+
+def file_digest(path: str) -> str:
+    """分块计算文件的 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _atomic_copy(src: str, dst: str):
+    directory = os.path.dirname(dst) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class BackupStore:
+    """backups/ 目录下的快照与共享对象存储"""
+
+    def __init__(self, root: str, exports_dir: Optional[str] = None):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+        self.exports_dir = exports_dir
+        self._catalog: Optional[Dict] = None
+        self._catalog_stat: Optional[Tuple[int, int]] = None
+
+    def object_path(self, digest: str) -> str:
+        """返回摘要对应的对象文件路径"""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def manifest_path(self, backup_path: str) -> str:
+        return os.path.join(backup_path, MANIFEST_FILE)
+
+    def is_snapshot(self, backup_path: str) -> bool:
+        """是否为增量快照（旧版备份是完整的目录拷贝）"""
+        return os.path.exists(self.manifest_path(backup_path))
+
+    def read_manifest(self, backup_path: str) -> Dict:
+        with open(self.manifest_path(backup_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load_hash_cache(self) -> Dict[str, List]:
+        try:
+            with open(os.path.join(self.root, HASH_CACHE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_hash_cache(self, cache: Dict[str, List]):
+        self._write_json(HASH_CACHE_FILE, cache)
+
+    def _write_json(self, rel_path: str, data):
+        path = os.path.join(self.root, rel_path)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.chmod(tmp_path, replacement_mode(path))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _cached_digest(path: str, hash_cache: Dict[str, List]):
+        """返回 (摘要, 大小)；大小与 mtime 未变时直接复用缓存的摘要"""
+        path_stat = os.stat(path)
+        cache_key = os.path.abspath(path)
+        cached = hash_cache.get(cache_key)
+        if cached and cached[0] == path_stat.st_size and cached[1] == path_stat.st_mtime_ns:
+            return cached[2], path_stat.st_size
+        digest = file_digest(path)
+        hash_cache[cache_key] = [path_stat.st_size, path_stat.st_mtime_ns, digest]
+        return digest, path_stat.st_size
+
+    def snapshot(self, backup_path: str, files: Dict[str, str]) -> Dict:
+        """为 {相对路径: 源文件路径} 创建快照，返回写入的 manifest"""
+        with _lock:
+            hash_cache = self._load_hash_cache()
+            entries = {}
+            new_objects = 0
+            for rel_path, src in sorted(files.items()):
+                digest, size = self._cached_digest(src, hash_cache)
+                obj = self.object_path(digest)
+                if not os.path.exists(obj):
+                    _atomic_copy(src, obj)
+                    new_objects += 1
+                entries[rel_path] = {"sha256": digest, "size": size}
+
+            manifest = {
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "files": entries,
+                "new_objects": new_objects,
+            }
+            os.makedirs(backup_path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=backup_path, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=4)
+            os.chmod(tmp_path, replacement_mode(self.manifest_path(backup_path)))
+            os.replace(tmp_path, self.manifest_path(backup_path))
+            self._save_hash_cache(hash_cache)
+            self.update_catalog(os.path.basename(os.path.normpath(backup_path)))
+            return manifest
+
+    def restore(self, backup_path: str, target_root: str = ".", prune_dirs: Iterable[str] = ()):
+        """把快照中的文件还原到 target_root；prune_dirs 中不在快照里的文件会被删除"""
+        with _lock:
+            manifest = self.read_manifest(backup_path)
+            files = manifest["files"]
+            for rel_path, entry in files.items():
+                obj = self.object_path(entry["sha256"])
+                if not os.path.exists(obj):
+                    raise FileNotFoundError(f"备份对象缺失: {rel_path} ({entry['sha256']})")
+
+            # 只还原内容不同的文件
+            hash_cache = self._load_hash_cache()
+            for rel_path, entry in files.items():
+                dst = os.path.join(target_root, rel_path)
+                if os.path.exists(dst) and self._cached_digest(dst, hash_cache)[0] == entry["sha256"]:
+                    continue
+                _atomic_copy(self.object_path(entry["sha256"]), dst)
+            self._save_hash_cache(hash_cache)
+
+            wanted = {os.path.normpath(rel_path) for rel_path in files}
+            for prune_dir in prune_dirs:
+                base = os.path.join(target_root, prune_dir)
+                if not os.path.isdir(base):
+                    os.makedirs(base, exist_ok=True)
+                    continue
+                for name in os.listdir(base):
+                    rel_path = os.path.normpath(os.path.join(prune_dir, name))
+                    path = os.path.join(base, name)
+                    if rel_path not in wanted and os.path.isfile(path):
+                        os.remove(path)
+
+            self.update_catalog(os.path.basename(os.path.normpath(backup_path)),
+                                last_restored_at=datetime.now().timestamp())
+
+    def export_sources(self, backup_path: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """返回 (内容哈希, [(归档内路径, 源文件路径)])，用于导出备份"""
+        if self.is_snapshot(backup_path):
+            files = self.read_manifest(backup_path)["files"]
+            sources = [(rel_path, self.object_path(entry["sha256"]))
+                       for rel_path, entry in sorted(files.items())]
+            key = json.dumps({rel_path: entry["sha256"] for rel_path, entry in files.items()},
+                             sort_keys=True)
+        else:
+            # 旧版完整拷贝的备份：按文件大小与 mtime 计算内容哈希
+            sources = []
+            fingerprint = []
+            for dirpath, _, filenames in os.walk(backup_path):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(path, backup_path)
+                    path_stat = os.stat(path)
+                    sources.append((rel_path, path))
+                    fingerprint.append([rel_path, path_stat.st_size, path_stat.st_mtime_ns])
+            sources.sort()
+            key = json.dumps(sorted(fingerprint))
+        return hashlib.sha256(key.encode('utf-8')).hexdigest(), sources
+
+    def export_archive(self, backup_path: str) -> Tuple[str, bool]:
+        """流式生成备份的 zip 归档并按内容哈希缓存，返回 (归档路径, 是否命中缓存)
+
+        文件逐块写入 zip，内存占用与备份大小无关；内容相同的备份共用一个归档。
+        """
+        if not self.exports_dir:
+            raise ValueError("未配置导出目录")
+        content_hash, sources = self.export_sources(backup_path)
+        archive_path = os.path.join(self.exports_dir, f"{content_hash}.zip")
+        if os.path.exists(archive_path):
+            return archive_path, True
+
+        os.makedirs(self.exports_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.exports_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as raw, \
+                    zipfile.ZipFile(raw, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+                for rel_path, src in sources:
+                    with open(src, 'rb') as fin, zf.open(rel_path, 'w', force_zip64=True) as fout:
+                        shutil.copyfileobj(fin, fout, CHUNK_SIZE)
+            os.chmod(tmp_path, replacement_mode(archive_path))
+            os.replace(tmp_path, archive_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return archive_path, False
+
+    def delete(self, backup_path: str) -> int:
+        """删除备份目录并回收不再被引用的对象，返回回收的对象数"""
+        with _lock:
+            shutil.rmtree(backup_path)
+            self.update_catalog(os.path.basename(os.path.normpath(backup_path)))
+            return self.collect_garbage()
+
+    def _collect_exports(self) -> int:
+        if not self.exports_dir or not os.path.isdir(self.exports_dir):
+            return 0
+        live = set()
+        for name in os.listdir(self.root):
+            backup_path = os.path.join(self.root, name)
+            if name.startswith("backup_") and os.path.isdir(backup_path):
+                live.add(f"{self.export_sources(backup_path)[0]}.zip")
+        removed = 0
+        for name in os.listdir(self.exports_dir):
+            if name.endswith(".zip") and name not in live:
+                os.remove(os.path.join(self.exports_dir, name))
+                removed += 1
+        return removed
+
+    def referenced_digests(self) -> Set[str]:
+        """所有快照引用的对象摘要"""
+        referenced = set()
+        if not os.path.isdir(self.root):
+            return referenced
+        for name in os.listdir(self.root):
+            backup_path = os.path.join(self.root, name)
+            if name == OBJECTS_DIR or not self.is_snapshot(backup_path):
+                continue
+            for entry in self.read_manifest(backup_path)["files"].values():
+                referenced.add(entry["sha256"])
+        return referenced
+
+    def collect_garbage(self) -> int:
+        """删除未被任何快照引用的对象，以及已不对应任何备份的导出归档"""
+        with _lock:
+            removed = self._collect_exports()
+            if not os.path.isdir(self.objects_dir):
+                return removed
+            referenced = self.referenced_digests()
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    if digest not in referenced:
+                        os.remove(os.path.join(prefix_dir, digest))
+                        removed += 1
+                if not os.listdir(prefix_dir):
+                    os.rmdir(prefix_dir)
+            return removed
+
+    # ---- 备份目录索引 ----
+
+    def _describe_backup(self, name: str) -> Dict:
+        backup_path = os.path.join(self.root, name)
+        if self.is_snapshot(backup_path):
+            manifest = self.read_manifest(backup_path)
+            files = manifest["files"]
+            created_at = datetime.strptime(manifest["created_at"], "%Y-%m-%d %H:%M:%S").timestamp()
+            size = sum(entry["size"] for entry in files.values())
+            file_count = len(files)
+        else:
+            created_at = os.path.getctime(backup_path)
+            size = 0
+            file_count = 0
+            for dirpath, _, filenames in os.walk(backup_path):
+                for filename in filenames:
+                    size += os.path.getsize(os.path.join(dirpath, filename))
+                    file_count += 1
+        return {
+            "name": name,
+            "created_at": created_at,
+            "size": size,
+            "file_count": file_count,
+            "content_hash": self.export_sources(backup_path)[0],
+            "snapshot": self.is_snapshot(backup_path),
+        }
+
+    def _stat_key(self, rel_path: str = "") -> Optional[Tuple[int, int]]:
+        try:
+            path_stat = os.stat(os.path.join(self.root, rel_path) if rel_path else self.root)
+        except FileNotFoundError:
+            return None
+        return path_stat.st_mtime_ns, path_stat.st_size
+
+    def catalog(self) -> List[Dict]:
+        """返回按创建时间倒序排列的备份索引
+
+        正常情况下只需两次 stat：备份根目录未变化（没有新增或删除备份目录）时直接返回
+        内存中的索引；否则只为新出现的目录计算元数据，与文件系统做一次增量对账。
+        """
+        with _lock:
+            catalog_stat = self._stat_key(CATALOG_FILE)
+            if self._catalog is None or catalog_stat != self._catalog_stat:
+                try:
+                    with open(os.path.join(self.root, CATALOG_FILE), 'r', encoding='utf-8') as f:
+                        self._catalog = json.load(f)
+                except (OSError, ValueError):
+                    self._catalog = {"root_stat": None, "backups": {}}
+                self._catalog_stat = catalog_stat
+
+            root_stat = self._stat_key()
+            if root_stat is not None and list(root_stat) != self._catalog.get("root_stat"):
+                self._reconcile(root_stat)
+            return sorted(self._catalog["backups"].values(), key=lambda entry: -entry["created_at"])
+
+    def _reconcile(self, root_stat: Tuple[int, int]):
+        names = {name for name in os.listdir(self.root)
+                 if name.startswith("backup_") and os.path.isdir(os.path.join(self.root, name))}
+        backups = self._catalog["backups"]
+        for name in list(backups):
+            if name not in names:
+                del backups[name]
+        for name in names - set(backups):
+            try:
+                backups[name] = self._describe_backup(name)
+            except (OSError, ValueError, KeyError):
+                # 正在写入或已损坏的备份，下次对账时再处理
+                continue
+        self._catalog["root_stat"] = list(root_stat)
+        self._save_catalog()
+
+    def _save_catalog(self):
+        self._write_json(CATALOG_FILE, self._catalog)
+        self._catalog_stat = self._stat_key(CATALOG_FILE)
+
+    def update_catalog(self, name: str, **fields):
+        """创建、删除或恢复备份后更新索引；对应目录不存在时移除条目"""
+        with _lock:
+            self.catalog()
+            backups = self._catalog["backups"]
+            if os.path.isdir(os.path.join(self.root, name)):
+                entry = backups.get(name) or self._describe_backup(name)
+                entry.update(fields)
+                backups[name] = entry
+            else:
+                backups.pop(name, None)
+            self._catalog["root_stat"] = list(self._stat_key() or ())
+            self._save_catalog()
+
+
+def collect_backup_files(config_file: str, upload_dir: str) -> Dict[str, str]:
+    """列出需要备份的文件：配置文件与上传目录下的应用文件"""
+    files = {}
+    if os.path.exists(config_file):
+        files[os.path.basename(config_file)] = config_file
+    if os.path.isdir(upload_dir):
+        for dirpath, dirnames, filenames in os.walk(upload_dir):
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, os.path.dirname(os.path.abspath(upload_dir)))] = path
+    return files
+
+
+_stores: Dict[str, BackupStore] = {}
+
+
+def get_backup_store(root: str, exports_dir: Optional[str] = None) -> BackupStore:
+    """获取指定备份目录对应的 BackupStore"""
+    key = os.path.abspath(root)
+    store: Optional[BackupStore] = _stores.get(key)
+    if store is None:
+        store = _stores[key] = BackupStore(root, exports_dir)
+    elif exports_dir is not None:
+        store.exports_dir = exports_dir
+    return store
@@ -0,0 +1,179 @@
+"""上传应用的无浏览器基准测试
+
+用 headless_streamlit 替换 streamlit 后导入启动器，通过 AppManager.run_app()
+按控件输入矩阵驱动每个应用，输出 JSON 报告：
+
+    python benchmark.py --output bench_report.json
+    python benchmark.py --matrix matrix.json --repeat 5 --thresholds thresholds.json --baseline old.json
+
+矩阵文件形如 {"<应用ID>": [{"<控件 key 或标签>": 值, ...}, ...]}；未列出的应用
+自动生成三组输入：默认值、数值控件取最小值、数值控件取最大值。
+
+阈值文件形如 {"default": {"warm_p95": 2.0}, "apps": {"<应用ID>": {"cold": 10}},
+"baseline_tolerance": 0.25}；check_report() 返回所有违反阈值的描述，可以直接在
+pytest 中断言其为空。
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Optional
+
+from headless_streamlit import SessionState, install
+from telemetry import percentile
+
+NUMERIC_WIDGETS = ("number_input", "slider")
+CHOICE_WIDGETS = ("selectbox", "radio", "select_slider")
+# 阈值可以约束的指标
+METRICS = ("cold", "warm_p50", "warm_p95", "warm_max")
+
+
+def auto_scenarios(widgets: List[Dict]) -> List[Dict]:
+    """根据默认运行中出现的控件生成默认 / 最小 / 最大三组输入"""
+    low, high = {}, {}
+    for widget in widgets:
+        name = widget["key"] or widget["label"]
+        if widget["kind"] in NUMERIC_WIDGETS:
+            if widget.get("min_value") is not None:
+                low[name] = widget["min_value"]
+            if widget.get("max_value") is not None:
+                high[name] = widget["max_value"]
+        elif widget["kind"] in CHOICE_WIDGETS and widget.get("options"):
+            low[name] = widget["options"][0]
+            high[name] = widget["options"][-1]
+    scenarios = [{}]
+    for scenario in (low, high):
+        if scenario and scenario not in scenarios:
+            scenarios.append(scenario)
+    return scenarios
+
+
+def run_scenario(fake, manager, app_id: str, inputs: Dict, repeat: int) -> Dict:
+    """在同一个会话中连续运行 repeat 次：第一次为冷启动，其余为重跑"""
+    session_state = SessionState()
+    runs = []
+    for _ in range(repeat):
+        with fake.session(inputs, session_state) as run:
+            manager.run_app(app_id)
+        runs.append(run)
+
+    sections: Dict[str, List[float]] = {}
+    for run in runs:
+        for name, seconds in run.sections.items():
+            sections.setdefault(name, []).append(seconds)
+    warm = sorted(run.wall for run in runs[1:]) or [runs[0].wall]
+    errors = sorted({error for run in runs for error in run.errors})
+    return {
+        "inputs": inputs,
+        "runs": len(runs),
+        "cold": runs[0].wall,
+        "warm_p50": percentile(warm, 50),
+        "warm_p95": percentile(warm, 95),
+        "warm_max": warm[-1],
+        "elements": len(runs[-1].elements),
+        "widgets": len(runs[-1].widgets),
+        "sections": {name: sum(values) / len(values) for name, values in sections.items()},
+        "errors": errors,
+        "_widgets": runs[0].widgets,
+    }
+
+
+def run_benchmark(matrix: Optional[Dict[str, List[Dict]]] = None, repeat: int = 3,
+                  app_ids: Optional[List[str]] = None) -> Dict:
+    """驱动全部（或指定的）应用，返回报告"""
+    matrix = matrix or {}
+    fake = install()
+    launcher = importlib.import_module("streamlit_app")
+    with fake.session():
+        manager = launcher.AppManager()
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "apps": [],
+    }
+    for app in manager.apps_config["apps"]:
+        if app_ids and app["id"] not in app_ids:
+            continue
+        scenarios = matrix.get(app["id"])
+        results = []
+        if scenarios is None:
+            first = run_scenario(fake, manager, app["id"], {}, repeat)
+            results.append(first)
+            scenarios = auto_scenarios(first["_widgets"])[1:]
+        for inputs in scenarios:
+            results.append(run_scenario(fake, manager, app["id"], inputs, repeat))
+        for result in results:
+            result.pop("_widgets")
+        report["apps"].append({"app_id": app["id"], "title": app.get("title"), "scenarios": results})
+    return report
+
+
+def check_report(report: Dict, thresholds: Dict, baseline: Optional[Dict] = None) -> List[str]:
+    """检查报告是否超出阈值（以及相对基线的回退幅度），返回违反项列表"""
+    violations = []
+    default = thresholds.get("default", {})
+    tolerance = thresholds.get("baseline_tolerance")
+    baseline_apps = {app["app_id"]: app for app in (baseline or {}).get("apps", [])}
+    for app in report["apps"]:
+        limits = {**default, **thresholds.get("apps", {}).get(app["app_id"], {})}
+        previous = baseline_apps.get(app["app_id"], {}).get("scenarios", [])
+        for index, scenario in enumerate(app["scenarios"]):
+            label = f"{app['app_id']}[{index}]"
+            if scenario["errors"] and not limits.get("allow_errors"):
+                violations.append(f"{label}: 运行出错 {scenario['errors'][0]}")
+            for metric in METRICS:
+                if metric in limits and scenario[metric] > limits[metric]:
+                    violations.append(f"{label}: {metric}={scenario[metric] * 1000:.1f}ms "
+                                      f"超过阈值 {limits[metric] * 1000:.1f}ms")
+            if tolerance is not None and index < len(previous):
+                for metric in METRICS:
+                    before = previous[index].get(metric)
+                    if before and scenario[metric] > before * (1 + tolerance):
+                        violations.append(
+                            f"{label}: {metric} 从 {before * 1000:.1f}ms 回退到 {scenario[metric] * 1000:.1f}ms"
+                        )
+    return violations
+
+
+def _load_json(path: Optional[str]) -> Optional[Dict]:
+    if not path:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="无浏览器运行上传应用并输出基准报告")
+    parser.add_argument("--matrix", help="控件输入矩阵 JSON 文件")
+    parser.add_argument("--repeat", type=int, default=3, help="每组输入在同一会话中连续运行的次数")
+    parser.add_argument("--app", action="append", dest="apps", help="只测试指定的应用 ID（可重复）")
+    parser.add_argument("--output", default="bench_report.json", help="报告输出路径")
+    parser.add_argument("--thresholds", help="阈值 JSON 文件")
+    parser.add_argument("--baseline", help="用于比较回退的旧报告")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(_load_json(args.matrix), max(1, args.repeat), args.apps)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    for app in report["apps"]:
+        for scenario in app["scenarios"]:
+            print(f"{app['app_id']:<12} cold={scenario['cold'] * 1000:8.1f}ms "
+                  f"warm_p50={scenario['warm_p50'] * 1000:8.1f}ms errors={len(scenario['errors'])}")
+    print(f"报告已写入 {os.path.abspath(args.output)}")
+
+    thresholds = _load_json(args.thresholds)
+    if thresholds is not None:
+        violations = check_report(report, thresholds, _load_json(args.baseline))
+        for violation in violations:
+            print(f"✗ {violation}", file=sys.stderr)
+        return 1 if violations else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
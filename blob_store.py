@@ -0,0 +1,115 @@
+"""按内容寻址的应用源码存储
+
+源码以 SHA-256 摘要为文件名保存在 app_blobs/ 下，配置中只记录摘要。
+相同内容的上传共享同一个 blob，读取时按需加载并保留在内存 LRU 中。
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from code_cache import source_digest
+from config_store import replacement_mode
+
+BLOB_DIR = "app_blobs"
+
+
+class BlobStore:
+    """以 SHA-256 为键的源码存储，带按字节数限制的内存缓存"""
+
+    def __init__(self, root: str = BLOB_DIR, max_memory_bytes: int = 64 * 1024 * 1024):
+        self.root = root
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+
+    def path_for(self, digest: str) -> str:
+        """返回摘要对应的 blob 文件路径"""
+        return os.path.join(self.root, digest[:2], f"{digest}.py")
+
+    def put(self, code: str) -> str:
+        """写入源码并返回其摘要；内容已存在时不重复写入"""
+        digest = source_digest(code)
+        with self._lock:
+            if digest in self._memory:
+                # 内存中的条目一定已经写入磁盘，省去一次 stat
+                self._memory.move_to_end(digest)
+                return digest
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(code)
+            os.chmod(tmp_path, replacement_mode(path))
+            os.replace(tmp_path, path)
+        self._remember(digest, code)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """按摘要读取源码，不存在时返回 None"""
+        with self._lock:
+            code = self._memory.get(digest)
+            if code is not None:
+                self._memory.move_to_end(digest)
+                return code
+        try:
+            with open(self.path_for(digest), 'r', encoding='utf-8', newline='') as f:
+                code = f.read()
+        except FileNotFoundError:
+            return None
+        self._remember(digest, code)
+        return code
+
+    def exists(self, digest: str) -> bool:
+        """判断 blob 是否存在"""
+        return os.path.exists(self.path_for(digest))
+
+    def clear(self):
+        """清空内存缓存（磁盘文件由调用方负责删除）"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _remember(self, digest: str, code: str):
+        size = len(code)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return
+            self._memory[digest] = code
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+
+def describe_source(code: str) -> Dict:
+    """源码的轻量元数据：字节数、行数与更新时间"""
+    return {
+        "code_size": len(code.encode('utf-8')),
+        "code_lines": code.count("\n") + (1 if code and not code.endswith("\n") else 0),
+        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def migrate_inline_sources(config: Dict, store: "BlobStore") -> bool:
+    """把旧配置中内联的 "code" 字段迁移到 blob 存储，返回配置是否有改动"""
+    changed = False
+    for app in config.get("apps", []):
+        code = app.pop("code", None)
+        if code is None:
+            continue
+        app["code_sha256"] = store.put(code)
+        app.update(describe_source(code))
+        changed = True
+    return changed
+
+
+blob_store = BlobStore()
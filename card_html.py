@@ -0,0 +1,82 @@
+"""主页应用卡片的 HTML 片段缓存
+
+卡片 HTML 只取决于应用的标题、描述和图标，按三者的摘要在进程内缓存，所有会话
+共享；主页把一个分类中可见的卡片拼接成一个 markdown 块一次性输出，而不是每个
+应用一次 st.markdown。标题和描述在写入 HTML 前都会转义；图标通过 icon_assets 的
+CSS 类引用，图片数据由页面中的样式块提供。
+"""
+import hashlib
+import html
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from icon_assets import icon_assets
+
+DEFAULT_MAX_CARDS = 20000
+DEFAULT_PAGE_SIZE = 50
+
+CARD_TEMPLATE = '''<div class="app-card">
+    <div style="display: flex; align-items: center;">
+        <div class="app-icon {icon_class}"></div>
+        <div>
+            <h3 style="margin: 0;">{title}</h3>
+            <p style="margin: 5px 0 0 0; color: #666;">{description}</p>
+        </div>
+    </div>
+</div>'''
+
+
+def card_key(app: Dict, icon_class: str) -> str:
+    """卡片内容的摘要"""
+    digest = hashlib.sha256()
+    for value in (app.get("title"), app.get("description"), icon_class):
+        value = str(value or "").encode('utf-8')
+        digest.update(len(value).to_bytes(8, 'little'))
+        digest.update(value)
+    return digest.hexdigest()
+
+
+class CardCache:
+    """按卡片内容摘要缓存渲染好的 HTML 片段"""
+
+    def __init__(self, max_cards: int = DEFAULT_MAX_CARDS):
+        self.max_cards = max_cards
+        self._lock = threading.Lock()
+        self._cards: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def card(self, app: Dict) -> str:
+        """返回单个应用的卡片 HTML"""
+        icon_class = icon_assets.css_class(app.get("icon") or "")
+        key = card_key(app, icon_class)
+        with self._lock:
+            fragment = self._cards.get(key)
+            if fragment is not None:
+                self._cards.move_to_end(key)
+                self.hits += 1
+                return fragment
+        fragment = CARD_TEMPLATE.format(
+            icon_class=icon_class,
+            title=html.escape(str(app.get("title") or "")),
+            description=html.escape(str(app.get("description") or "")),
+        )
+        with self._lock:
+            self.misses += 1
+            self._cards[key] = fragment
+            while len(self._cards) > self.max_cards:
+                self._cards.popitem(last=False)
+        return fragment
+
+    def block(self, apps: Iterable[Dict]) -> str:
+        """把多个卡片拼接成一个 markdown 块"""
+        # 块内不能有空行，否则 markdown 会把后面的 HTML 当作普通文本
+        return "\n".join(self.card(app) for app in apps)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cards": len(self._cards), "hits": self.hits, "misses": self.misses}
+
+
+card_cache = CardCache()
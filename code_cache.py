@@ -0,0 +1,140 @@
+"""上传应用的编译缓存
+
+按源码 SHA-256 缓存编译后的 code object：内存中保留最近使用的条目，
+磁盘上以 marshal 字节码形式持久化，进程重启后也无需重新编译。
+"""
+import hashlib
+import importlib.util
+import marshal
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from types import CodeType
+from typing import Dict, Optional
+
+CODE_CACHE_DIR = ".code_cache"
+
+
+def source_digest(code: str) -> str:
+    """计算源码的 SHA-256 摘要"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class CodeCache:
+    """以源码哈希为键的 code object 缓存（内存 LRU + 磁盘 marshal）"""
+
+    def __init__(self, cache_dir: str = CODE_CACHE_DIR, max_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CodeType]" = OrderedDict()
+        self._app_digests: Dict[str, str] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.bin")
+
+    def get_code(self, app_id: str, code: str, filename: str) -> CodeType:
+        """返回源码对应的 code object，必要时编译并写入缓存"""
+        digest = source_digest(code)
+        with self._lock:
+            self._app_digests[app_id] = digest
+            cached = self._memory.get(digest)
+            if cached is not None:
+                self._memory.move_to_end(digest)
+                self.memory_hits += 1
+                return cached
+
+        compiled = self._read_disk(digest)
+        if compiled is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            compiled = compile(code, filename, 'exec', dont_inherit=True)
+            self._write_disk(digest, compiled)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._memory[digest] = compiled
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return compiled
+
+    def _read_disk(self, digest: str) -> Optional[CodeType]:
+        try:
+            with open(self._disk_path(digest), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        magic = importlib.util.MAGIC_NUMBER
+        if not data.startswith(magic):
+            # 不同 Python 版本生成的字节码不可复用
+            return None
+        try:
+            return marshal.loads(data[len(magic):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def _write_disk(self, digest: str, compiled: CodeType):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(importlib.util.MAGIC_NUMBER)
+                f.write(marshal.dumps(compiled))
+            os.replace(tmp_path, self._disk_path(digest))
+        except OSError:
+            # 磁盘缓存只是加速手段，写入失败不影响运行
+            pass
+
+    def replace(self, app_id: str, code: str, filename: str) -> CodeType:
+        """编译应用的新源码并替换其缓存条目；编译失败时保留旧条目"""
+        with self._lock:
+            old_digest = self._app_digests.get(app_id)
+        compiled = self.get_code(app_id, code, filename)
+        new_digest = source_digest(code)
+        if old_digest is not None and old_digest != new_digest:
+            with self._lock:
+                still_used = old_digest in self._app_digests.values()
+                if not still_used:
+                    self._memory.pop(old_digest, None)
+            if not still_used:
+                try:
+                    os.remove(self._disk_path(old_digest))
+                except OSError:
+                    pass
+        return compiled
+
+    def invalidate(self, app_id: str, old_code: Optional[str] = None):
+        """移除某个应用当前（或 old_code 对应的）源码的缓存条目"""
+        with self._lock:
+            digest = self._app_digests.pop(app_id, None)
+            if digest is None and old_code is not None:
+                digest = source_digest(old_code)
+            if digest is None:
+                return
+            self._memory.pop(digest, None)
+            still_used = digest in self._app_digests.values()
+        if not still_used:
+            try:
+                os.remove(self._disk_path(digest))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中计数"""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
+
+
+code_cache = CodeCache()
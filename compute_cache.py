@@ -0,0 +1,272 @@
+"""注入上传应用的跨会话计算缓存
+
+load_module() 向应用模块注入 cache 装饰器：
+
+    @cache
+    def integrate(a, b): ...
+
+    @cache(ttl=600)
+    def load_table(path): ...
+
+缓存键由应用源码摘要、函数限定名和参数的 pickle 字节共同决定，结果以 pickle
+字节保存（每次命中返回独立的副本，会话之间互不影响）。内存层按字节数做 LRU，
+磁盘层保存在 .compute_cache/<应用ID>/<摘要前缀>/ 下并在多个进程间共享，超出
+容量时按最近使用时间淘汰。应用源码更新后摘要改变，旧版本的缓存目录被自动清除。
+"""
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+COMPUTE_CACHE_DIR = ".compute_cache"
+DEFAULT_MEMORY_MB = 256
+DEFAULT_DISK_MB = 2048
+
+
+class ComputeCache:
+    """内存 + 磁盘两级的函数结果缓存"""
+
+    def __init__(self, root: str = COMPUTE_CACHE_DIR, max_memory_bytes: int = DEFAULT_MEMORY_MB * 1024 * 1024,
+                 max_disk_bytes: int = DEFAULT_DISK_MB * 1024 * 1024):
+        self.root = root
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        # 正在计算的键 -> (完成事件, 计算线程)；同一个键的并发计算只执行一次
+        self._inflight: Dict[str, tuple[threading.Event, int]] = {}
+        # 键 -> (应用ID, pickle 字节, 过期时间)
+        self._memory: "OrderedDict[str, tuple[str, bytes, Optional[float]]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._cleaned: Dict[str, str] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def configure(self, max_memory_bytes: int, max_disk_bytes: int):
+        with self._lock:
+            self.max_memory_bytes = max_memory_bytes
+            self.max_disk_bytes = max_disk_bytes
+            self._trim_memory_locked()
+
+    def _app_dir(self, app_id: str) -> str:
+        return os.path.join(self.root, app_id)
+
+    def _path(self, app_id: str, digest: str, key: str) -> str:
+        return os.path.join(self._app_dir(app_id), digest[:16], f"{key}.pkl")
+
+    def decorator(self, app_id: str, digest: str) -> Callable:
+        """生成注入到应用模块中的 cache 装饰器"""
+        self._drop_stale_versions(app_id, digest)
+
+        def cache(func: Optional[Callable] = None, *, ttl: Optional[float] = None):
+            def wrap(target: Callable) -> Callable:
+                @functools.wraps(target)
+                def wrapper(*args, **kwargs):
+                    return self.call(app_id, digest, target, args, kwargs, ttl)
+                return wrapper
+            return wrap(func) if func is not None else wrap
+        return cache
+
+    def call(self, app_id: str, digest: str, func: Callable, args: tuple, kwargs: dict,
+             ttl: Optional[float] = None):
+        """按参数查找缓存结果，未命中时调用函数并写入两级缓存"""
+        try:
+            key_bytes = pickle.dumps((func.__qualname__, args, sorted(kwargs.items())),
+                                     protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # 参数无法序列化（例如锁、生成器）：直接计算，不缓存
+            with self._lock:
+                self.bypasses += 1
+            return func(*args, **kwargs)
+        key = hashlib.sha256(digest.encode('ascii') + key_bytes).hexdigest()
+
+        while True:
+            payload = self._get(app_id, digest, key)
+            if payload is not None:
+                return pickle.loads(payload)
+            with self._lock:
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    event = threading.Event()
+                    self._inflight[key] = (event, threading.get_ident())
+                    break
+            event, owner = inflight
+            if owner == threading.get_ident():
+                # 同一线程重入同一个键（递归调用自身）：不等待自己，直接计算
+                return func(*args, **kwargs)
+            # 计算期间不持有任何锁：等待其他会话算完后重新查找；
+            # 对方失败或结果无法缓存时，下一轮由本线程接手计算
+            event.wait()
+
+        try:
+            result = func(*args, **kwargs)
+            try:
+                payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                with self._lock:
+                    self.bypasses += 1
+                return result
+            expires = time.time() + ttl if ttl else None
+            with self._lock:
+                self.misses += 1
+            self._remember(app_id, key, payload, expires)
+            self._write_disk(app_id, digest, key, payload, expires)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _get(self, app_id: str, digest: str, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[2] is None or entry[2] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                self._forget_locked(key)
+        path = self._path(app_id, digest, key)
+        try:
+            with open(path, 'rb') as f:
+                expires, payload = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if expires is not None and expires <= now:
+            self._remove_file(path)
+            return None
+        try:
+            # 更新访问时间，供磁盘淘汰判断最近使用
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(app_id, key, payload, expires)
+        return payload
+
+    def _remember(self, app_id: str, key: str, payload: bytes, expires: Optional[float]):
+        if len(payload) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._forget_locked(key)
+            self._memory[key] = (app_id, payload, expires)
+            self._memory_bytes += len(payload)
+            self._trim_memory_locked()
+
+    def _forget_locked(self, key: str):
+        _, payload, _ = self._memory.pop(key)
+        self._memory_bytes -= len(payload)
+
+    def _trim_memory_locked(self):
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, (_, payload, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(payload)
+
+    def _write_disk(self, app_id: str, digest: str, key: str, payload: bytes, expires: Optional[float]):
+        path = self._path(app_id, digest, key)
+        try:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((expires, payload), f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except OSError:
+            # 磁盘缓存只是加速手段，写入失败不影响结果
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            over = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """统计磁盘占用，超出容量时按访问时间从旧到新删除"""
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if total > self.max_disk_bytes:
+            files.sort()
+            # 一次删到容量的 90%，避免每次写入都重新扫描
+            target = self.max_disk_bytes * 0.9
+            for _, size, path in files:
+                if total <= target:
+                    break
+                self._remove_file(path)
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _drop_stale_versions(self, app_id: str, digest: str):
+        """每个进程对每个应用版本只检查一次：删除其他源码版本留下的磁盘缓存"""
+        with self._lock:
+            previous = self._cleaned.get(app_id)
+            if previous == digest:
+                return
+            self._cleaned[app_id] = digest
+            if previous is not None:
+                # 本进程见过旧版本：内存中属于该应用的结果都已过期
+                for key in [key for key, entry in self._memory.items() if entry[0] == app_id]:
+                    self._forget_locked(key)
+        keep = digest[:16]
+        try:
+            versions = os.listdir(self._app_dir(app_id))
+        except OSError:
+            return
+        for version in versions:
+            if version != keep:
+                shutil.rmtree(os.path.join(self._app_dir(app_id), version), ignore_errors=True)
+                with self._lock:
+                    self._disk_bytes = None
+
+    def invalidate(self, app_id: str):
+        """删除应用的全部缓存结果（应用被更新或删除时调用）"""
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if entry[0] == app_id]:
+                self._forget_locked(key)
+            self._cleaned.pop(app_id, None)
+            self._disk_bytes = None
+        shutil.rmtree(self._app_dir(app_id), ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        """命中计数与占用空间"""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+compute_cache = ComputeCache()
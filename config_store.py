@@ -0,0 +1,343 @@
+"""进程级应用配置缓存与变更日志
+
+Streamlit 每次重跑都会重新执行 streamlit_app.py，但被导入的模块只会加载一次，
+因此放在这里的缓存可以被同一进程内的所有会话共享。
+
+配置由快照 apps_config.json 与追加写入的变更日志 apps_config.json.journal 组成：
+上传、更新、删除等操作只向日志追加一行（开销与变更大小成正比），读取时在快照上
+重放日志；日志条目积累到一定数量后在后台压缩成新的快照。跨进程的读写通过
+apps_config.json.lock 上的文件锁串行化，多个管理会话并发修改时不会丢失写入。
+"""
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台只做进程内加锁
+    fcntl = None
+
+# 日志超过任一阈值时触发后台压缩
+COMPACT_ENTRIES = 200
+COMPACT_BYTES = 1024 * 1024
+
+
+def _read_umask() -> int:
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# 进程的 umask 只在导入时读取一次（os.umask 只能先设置再恢复，运行中读取会影响其他线程）
+UMASK = _read_umask()
+
+
+def replacement_mode(path: str) -> int:
+    """替换 path 的临时文件应有的权限：沿用原文件的权限，没有原文件时与 open() 新建的文件相同
+
+    tempfile.mkstemp 创建的文件权限固定为 0600，原子替换前需要改回来。
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~UMASK
+
+
+def _upsert(items: List[Dict], item: Dict):
+    for existing in items:
+        if existing.get("id") == item.get("id"):
+            if existing is not item:
+                # 原地更新，保持其他地方持有的对象引用有效
+                existing.clear()
+                existing.update(item)
+            return
+    items.append(item)
+
+
+def apply_change(config: Dict, change: Dict) -> Dict:
+    """把一条变更应用到配置上，返回（可能被替换的）配置对象"""
+    op = change["op"]
+    if op == "replace":
+        return change["config"]
+    if op == "upsert_app":
+        _upsert(config.setdefault("apps", []), change["app"])
+    elif op == "delete_app":
+        config["apps"] = [app for app in config.get("apps", []) if app.get("id") != change["id"]]
+    elif op == "upsert_category":
+        _upsert(config.setdefault("categories", []), change["category"])
+    elif op == "delete_category":
+        config["categories"] = [cat for cat in config.get("categories", []) if cat.get("id") != change["id"]]
+    elif op == "update_settings":
+        config.setdefault("settings", {}).update(change["settings"])
+    else:
+        raise ValueError(f"未知的配置变更类型: {op}")
+    return config
+
+
+class ConfigStore:
+    """解析一次快照并重放变更日志，之后只在文件变化时增量刷新"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.RLock()
+        self._config: Optional[Dict] = None
+        self._default: Dict = {}
+        self._stat_key: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._journal_key: Optional[Tuple[int, int]] = None
+        self._journal_offset = 0
+        self._compacting = False
+        self.journal_entries = 0
+        self.generation = 0
+        # 配置被整体替换（从磁盘重新解析、重放了其他进程的变更或保存了另一个对象）时递增，
+        # 依赖配置的派生索引据此判断是否需要全量重建
+        self.load_generation = 0
+        self.loads = 0
+        self.compactions = 0
+        self._load_hooks: Dict[str, Callable[[Dict], bool]] = {}
+
+    def add_load_hook(self, name: str, hook: Callable[[Dict], bool]):
+        """注册配置从磁盘解析后执行的钩子；钩子返回 True 表示修改了配置，需要写回"""
+        with self._lock:
+            self._load_hooks[name] = hook
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _journal_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, default: Dict) -> Dict:
+        """返回共享的配置对象；快照不存在时以 default 的副本为基础"""
+        config = self._config
+        if (config is not None and self._stat(self.path) == self._stat_key
+                and self._journal_stat() == self._journal_key):
+            return config
+
+        with self._lock:
+            self._default = default
+            with self._file_lock(exclusive=False):
+                hooks_changed = self._refresh()
+            if hooks_changed:
+                self.save(self._config)
+            return self._config
+
+    def _refresh(self) -> bool:
+        """在持有文件锁时与磁盘同步，返回加载钩子是否修改了配置"""
+        stat_key = self._stat(self.path)
+        journal_key = self._journal_stat()
+        if self._config is not None and stat_key == self._stat_key and journal_key == self._journal_key:
+            return False
+
+        if (self._config is not None and stat_key == self._stat_key
+                and journal_key is not None and self._journal_key is not None
+                and journal_key[0] == self._journal_key[0] and journal_key[1] >= self._journal_offset):
+            # 快照未变，日志只是被其他进程追加：只重放新增的条目
+            if self._replay_journal():
+                self.generation += 1
+                self.load_generation += 1
+            return False
+
+        if stat_key is None:
+            raw = None
+            digest = None
+        else:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if self._config is not None and digest == self._digest and journal_key == self._journal_key:
+                # 仅 mtime 变化（例如 touch），内容未变，无需重新解析
+                self._stat_key = stat_key
+                return False
+
+        self.loads += 1
+        self._config = json.loads(raw.decode('utf-8')) if raw is not None else copy.deepcopy(self._default)
+        self._stat_key = stat_key
+        self._digest = digest
+        self._journal_offset = 0
+        self.journal_entries = 0
+        self._replay_journal()
+        self.generation += 1
+        self.load_generation += 1
+        return self._run_load_hooks(self._config)
+
+    def _replay_journal(self) -> int:
+        """从上次读到的位置重放日志，返回应用的条目数"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+                journal_key = (os.fstat(f.fileno()).st_ino, self._journal_offset + len(data))
+        except FileNotFoundError:
+            self._journal_key = None
+            return 0
+        # 只处理完整的行；崩溃遗留的半行留到下次（或压缩时丢弃）
+        complete = data[:data.rfind(b"\n") + 1]
+        applied = 0
+        for line in complete.splitlines():
+            if not line.strip():
+                continue
+            try:
+                change = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+            self._config = apply_change(self._config, change)
+            self.journal_entries += 1
+            applied += 1
+        self._journal_offset += len(complete)
+        self._journal_key = (journal_key[0], self._journal_offset)
+        return applied
+
+    def record(self, change: Dict) -> Dict:
+        """追加一条变更到日志并应用到缓存中的配置，返回最新配置"""
+        line = (json.dumps(change, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            with self._file_lock(exclusive=True):
+                # 先追上其他进程写入的变更，再在最新状态上追加
+                if self._config is None:
+                    self._refresh()
+                else:
+                    self._catch_up()
+                journal_key = self._journal_stat()
+                if journal_key is not None and journal_key[1] > self._journal_offset:
+                    # 截掉崩溃遗留的半行，保证新条目从完整的行开始
+                    os.truncate(self.journal_path, self._journal_offset)
+                with open(self.journal_path, 'ab') as f:
+                    f.write(line)
+                    f.flush()
+                    self._journal_offset = f.tell()
+                    self._journal_key = (os.fstat(f.fileno()).st_ino, self._journal_offset)
+                self._config = apply_change(self._config, change)
+                self.journal_entries += 1
+                self.generation += 1
+                if change["op"] == "replace":
+                    self.load_generation += 1
+            if self.journal_entries >= COMPACT_ENTRIES or self._journal_offset >= COMPACT_BYTES:
+                self._schedule_compaction()
+            return self._config
+
+    def _catch_up(self):
+        journal_key = self._journal_stat()
+        if self._stat(self.path) != self._stat_key or (
+                journal_key is not None and self._journal_key is not None
+                and journal_key[0] != self._journal_key[0]):
+            # 快照或日志已被替换（其他进程保存或压缩过），必须完整重新加载
+            self._refresh()
+        elif journal_key != self._journal_key and self._replay_journal():
+            self.load_generation += 1
+
+    def save(self, config: Dict):
+        """原子写入完整快照并清空变更日志，直接更新缓存"""
+        with self._lock:
+            with self._file_lock(exclusive=True):
+                self._write_snapshot(config)
+
+    def _write_snapshot(self, config: Dict):
+        raw = json.dumps(config, ensure_ascii=False, indent=4).encode('utf-8')
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".apps_config.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(raw)
+            os.chmod(tmp_path, replacement_mode(self.path))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # 用新的空文件替换日志（inode 改变），其他进程据此完整重新加载
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".apps_config.", suffix=".journal.tmp")
+        os.close(fd)
+        os.chmod(tmp_path, replacement_mode(self.journal_path))
+        os.replace(tmp_path, self.journal_path)
+
+        reloaded = config is not self._config
+        self._config = config
+        self._stat_key = self._stat(self.path)
+        self._digest = hashlib.sha256(raw).hexdigest()
+        self._journal_key = self._journal_stat()
+        self._journal_offset = 0
+        self.journal_entries = 0
+        self.generation += 1
+        if reloaded:
+            self.load_generation += 1
+
+    def _schedule_compaction(self):
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, name="config-compaction", daemon=True).start()
+
+    def compact(self):
+        """把快照与日志合并为新的快照"""
+        try:
+            with self._lock:
+                with self._file_lock(exclusive=True):
+                    if self._config is None:
+                        self._refresh()
+                    else:
+                        self._catch_up()
+                    if self.journal_entries:
+                        self._write_snapshot(self._config)
+                        self.compactions += 1
+        finally:
+            self._compacting = False
+
+    def _run_load_hooks(self, config: Dict) -> bool:
+        changed = False
+        for hook in list(self._load_hooks.values()):
+            changed = hook(config) or changed
+        return changed
+
+    def invalidate(self):
+        """丢弃缓存，下次读取时重新解析文件"""
+        with self._lock:
+            self._config = None
+            self._stat_key = None
+            self._digest = None
+            self._journal_key = None
+            self._journal_offset = 0
+
+
+_stores: Dict[str, ConfigStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_config_store(path: str) -> ConfigStore:
+    """获取指定配置文件对应的进程级共享 ConfigStore"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ConfigStore(path)
+        return store
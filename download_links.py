@@ -0,0 +1,47 @@
+"""本地文件的临时下载链接
+
+设置页导出的备份归档可能很大，不能整体读入内存交给浏览器。这里为磁盘上的文件
+签发随机令牌，HTTP 接口的 GET /downloads/<令牌> 按块读取文件返回；令牌只在
+本进程内有效，过期后失效，不知道令牌无法下载任何文件。
+"""
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_TTL = 600
+
+
+class DownloadLinks:
+    """令牌 -> (文件路径, 下载文件名, 过期时间)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._links: Dict[str, Tuple[str, str, float]] = {}
+
+    def issue(self, path: str, filename: str, ttl: float = DEFAULT_TTL) -> str:
+        """为文件签发下载令牌"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._lock:
+            # 顺便清理过期的令牌
+            for expired in [key for key, (_, _, expires) in self._links.items() if expires <= now]:
+                del self._links[expired]
+            self._links[token] = (os.path.abspath(path), filename, now + ttl)
+        return token
+
+    def resolve(self, token: str) -> Optional[Tuple[str, str]]:
+        """令牌有效时返回 (文件路径, 下载文件名)"""
+        with self._lock:
+            link = self._links.get(token)
+            if link is None:
+                return None
+            path, filename, expires = link
+            if expires <= time.time():
+                del self._links[token]
+                return None
+        return path, filename
+
+
+download_links = DownloadLinks()
@@ -0,0 +1,384 @@
+"""无浏览器运行上传应用的 Streamlit 替身
+
+install() 把 HeadlessStreamlit 实例放进 sys.modules["streamlit"]（以及
+streamlit_option_menu），之后导入的应用和启动器都会拿到这个替身：
+
+    fake = install()
+    launcher = importlib.import_module("streamlit_app")
+    with fake.session({"冷端温度 (K)": 300.0}) as run:
+        launcher.AppManager().run_app("u8lrcell")
+    run.elements, run.sections, run.widgets
+
+控件按 key、其次按标签返回脚本给定的值，否则返回控件自身的默认值；输出元素只做
+记录；with st.expander()/tabs/form/container 等区块会被计时。每个线程有独立的
+运行记录与会话状态，压测时可以在多个线程中同时驱动。
+"""
+import contextlib
+import datetime
+import functools
+import io
+import os
+import pickle
+import sys
+import threading
+import time
+import types
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+STREAMLIT_MODULES = ("streamlit", "streamlit.components", "streamlit.components.v1", "streamlit_option_menu")
+
+
+class StopException(Exception):
+    """st.stop() 被调用"""
+
+
+class RerunException(Exception):
+    """st.rerun() / st.experimental_rerun() 被调用"""
+
+
+class SessionState(dict):
+    """支持属性访问的会话状态"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class UploadedFile(io.BytesIO):
+    """file_uploader 返回的文件对象"""
+
+    def __init__(self, name: str, data: bytes, mime_type: str = "application/octet-stream"):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = len(data)
+
+    def getvalue(self) -> bytes:
+        return super().getvalue()
+
+
+def _uploaded(value: Any) -> Any:
+    """脚本值可以是文件路径、{"name", "data"} 或它们的列表"""
+    if value is None or isinstance(value, UploadedFile):
+        return value
+    if isinstance(value, list):
+        return [_uploaded(item) for item in value]
+    if isinstance(value, dict):
+        data = value.get("data", b"")
+        return UploadedFile(value.get("name", "upload"), data.encode('utf-8') if isinstance(data, str) else data)
+    with open(value, 'rb') as f:
+        return UploadedFile(os.path.basename(value), f.read())
+
+
+class RunRecord:
+    """一次运行中记录的元素、控件与区块耗时"""
+
+    def __init__(self, inputs: Optional[Dict[str, Any]] = None, session_state: Optional[SessionState] = None):
+        self.inputs = dict(inputs or {})
+        self.session_state = session_state if session_state is not None else SessionState()
+        self.elements: List[Dict] = []
+        self.widgets: List[Dict] = []
+        self.sections: Dict[str, float] = {}
+        self.section_stack: List[str] = []
+        self.stopped = False
+        self.rerun_requested = False
+        self.wall = 0.0
+
+    @property
+    def errors(self) -> List[str]:
+        return [element["text"] for element in self.elements if element["kind"] in ("error", "exception")]
+
+
+class DeltaGenerator:
+    """元素容器：记录调用，作为上下文管理器时对区块计时"""
+
+    def __init__(self, fake: "HeadlessStreamlit", section: Optional[str] = None):
+        self._fake = fake
+        self._section = section
+        self._started: List[float] = []
+
+    def __enter__(self):
+        if self._section is not None:
+            self._fake._run().section_stack.append(self._section)
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._started.pop()
+        if self._section is not None:
+            run = self._fake._run()
+            path = " / ".join(run.section_stack)
+            run.section_stack.pop()
+            run.sections[path] = run.sections.get(path, 0.0) + elapsed
+        return False
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._fake, name)
+
+
+class HeadlessStreamlit:
+    """按脚本返回控件值、记录输出元素的 Streamlit 替身"""
+
+    def __init__(self):
+        self.__name__ = "streamlit"
+        self._local = threading.local()
+        self._idle = RunRecord()
+        self._cache_lock = threading.Lock()
+        self.components = types.SimpleNamespace(v1=types.SimpleNamespace(
+            html=self._element("html"),
+            iframe=self._element("iframe"),
+            declare_component=lambda *args, **kwargs: self._element("component"),
+        ))
+        self.secrets: Dict[str, Any] = {}
+        self.query_params: Dict[str, Any] = {}
+
+    # ---- 运行上下文 ----
+
+    def _run(self) -> RunRecord:
+        return getattr(self._local, "run", None) or self._idle
+
+    @contextlib.contextmanager
+    def session(self, inputs: Optional[Dict[str, Any]] = None,
+                session_state: Optional[SessionState] = None) -> Iterator[RunRecord]:
+        """在当前线程中开始一次运行；st.stop()/st.rerun() 视为运行正常结束"""
+        run = RunRecord(inputs, session_state)
+        previous = getattr(self._local, "run", None)
+        self._local.run = run
+        start = time.perf_counter()
+        try:
+            yield run
+        except StopException:
+            run.stopped = True
+        except RerunException:
+            run.rerun_requested = True
+        finally:
+            run.wall = time.perf_counter() - start
+            self._local.run = previous
+
+    @property
+    def session_state(self) -> SessionState:
+        return self._run().session_state
+
+    @property
+    def sidebar(self) -> DeltaGenerator:
+        return DeltaGenerator(self)
+
+    def _record(self, kind: str, args: tuple, kwargs: dict):
+        run = self._run()
+        text = args[0] if args else kwargs.get("body", kwargs.get("label", ""))
+        if isinstance(text, BaseException):
+            text = f"{type(text).__name__}: {text}"
+        run.elements.append({
+            "kind": kind,
+            "section": " / ".join(run.section_stack),
+            "text": text if isinstance(text, str) else type(text).__name__,
+        })
+        if kind == "pyplot":
+            self._close_figure(args[0] if args else kwargs.get("fig"))
+
+    @staticmethod
+    def _close_figure(figure):
+        plt = sys.modules.get("matplotlib.pyplot")
+        if plt is not None:
+            plt.close(figure if figure is not None else "all")
+
+    def _element(self, kind: str) -> Callable:
+        def element(*args, **kwargs):
+            self._record(kind, args, kwargs)
+            return DeltaGenerator(self)
+        return element
+
+    def __getattr__(self, name: str):
+        # 未单独实现的输出元素（markdown、dataframe、pyplot、metric……）统一记录
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._element(name)
+
+    def _widget(self, kind: str, label: str, default: Any, key: Optional[str] = None, **options) -> Any:
+        run = self._run()
+        if key is not None and key in run.inputs:
+            value = run.inputs[key]
+        elif label in run.inputs:
+            value = run.inputs[label]
+        elif key is not None and key in run.session_state:
+            value = run.session_state[key]
+        else:
+            value = default
+        run.widgets.append({"kind": kind, "label": label, "key": key, "default": default, **options})
+        if key is not None:
+            run.session_state[key] = value
+        return value
+
+    # ---- 页面与控制流 ----
+
+    def set_page_config(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        raise StopException()
+
+    def rerun(self):
+        raise RerunException()
+
+    experimental_rerun = rerun
+
+    # ---- 容器 ----
+
+    def container(self, *args, **kwargs) -> DeltaGenerator:
+        return DeltaGenerator(self)
+
+    def empty(self) -> DeltaGenerator:
+        return DeltaGenerator(self)
+
+    def expander(self, label: str, expanded: bool = False, **kwargs) -> DeltaGenerator:
+        return DeltaGenerator(self, section=label)
+
+    def tabs(self, labels: List[str]) -> List[DeltaGenerator]:
+        return [DeltaGenerator(self, section=label) for label in labels]
+
+    def columns(self, spec, **kwargs) -> List[DeltaGenerator]:
+        count = spec if isinstance(spec, int) else len(spec)
+        return [DeltaGenerator(self) for _ in range(count)]
+
+    def form(self, key: str, **kwargs) -> DeltaGenerator:
+        return DeltaGenerator(self, section=f"form:{key}")
+
+    def spinner(self, text: str = "", **kwargs) -> DeltaGenerator:
+        return DeltaGenerator(self)
+
+    # ---- 控件 ----
+
+    def number_input(self, label, min_value=None, max_value=None, value="min", step=None, format=None,
+                     key=None, **kwargs):
+        if value == "min" or value is None:
+            value = min_value if min_value is not None else 0.0
+        return self._widget("number_input", label, value, key, min_value=min_value, max_value=max_value)
+
+    def slider(self, label, min_value=None, max_value=None, value=None, step=None, format=None,
+               key=None, **kwargs):
+        if value is None:
+            value = min_value if min_value is not None else 0
+        return self._widget("slider", label, value, key, min_value=min_value, max_value=max_value)
+
+    def select_slider(self, label, options=(), value=None, key=None, **kwargs):
+        options = list(options)
+        default = value if value is not None else (options[0] if options else None)
+        return self._widget("select_slider", label, default, key, options=options)
+
+    def text_input(self, label, value="", max_chars=None, key=None, **kwargs):
+        return self._widget("text_input", label, value, key)
+
+    def text_area(self, label, value="", height=None, max_chars=None, key=None, **kwargs):
+        return self._widget("text_area", label, value, key)
+
+    def selectbox(self, label, options, index=0, format_func=str, key=None, **kwargs):
+        options = list(options)
+        default = options[index] if options and index is not None else None
+        return self._widget("selectbox", label, default, key, options=options)
+
+    def radio(self, label, options, index=0, format_func=str, key=None, **kwargs):
+        options = list(options)
+        default = options[index] if options and index is not None else None
+        return self._widget("radio", label, default, key, options=options)
+
+    def multiselect(self, label, options, default=None, format_func=str, key=None, **kwargs):
+        options = list(options)
+        return self._widget("multiselect", label, list(default or []), key, options=options)
+
+    def checkbox(self, label, value=False, key=None, **kwargs):
+        return self._widget("checkbox", label, value, key)
+
+    def toggle(self, label, value=False, key=None, **kwargs):
+        return self._widget("toggle", label, value, key)
+
+    def button(self, label, key=None, **kwargs):
+        return self._widget("button", label, False, key)
+
+    def form_submit_button(self, label="Submit", **kwargs):
+        return self._widget("form_submit_button", label, False, kwargs.get("key"))
+
+    def download_button(self, label, data=None, file_name=None, key=None, **kwargs):
+        return self._widget("download_button", label, False, key)
+
+    def file_uploader(self, label, type=None, accept_multiple_files=False, key=None, **kwargs):
+        return _uploaded(self._widget("file_uploader", label, [] if accept_multiple_files else None, key))
+
+    def date_input(self, label, value=None, key=None, **kwargs):
+        return self._widget("date_input", label, value if value is not None else datetime.date.today(), key)
+
+    def time_input(self, label, value=None, key=None, **kwargs):
+        return self._widget("time_input", label, value if value is not None else datetime.time(8, 45), key)
+
+    def color_picker(self, label, value="#000000", key=None, **kwargs):
+        return self._widget("color_picker", label, value, key)
+
+    def option_menu(self, menu_title, options, default_index=0, key=None, **kwargs):
+        """streamlit_option_menu.option_menu 的替身"""
+        options = list(options)
+        return self._widget("option_menu", menu_title, options[default_index] if options else None, key,
+                            options=options)
+
+    # ---- 缓存 ----
+
+    def _memoize(self, func: Optional[Callable] = None, **options):
+        """cache_data / cache_resource 的替身：按参数在进程内记忆结果"""
+        def wrap(target: Callable) -> Callable:
+            results: Dict[bytes, Any] = {}
+
+            @functools.wraps(target)
+            def wrapper(*args, **kwargs):
+                try:
+                    key = pickle.dumps((args, sorted(kwargs.items())))
+                except Exception:
+                    return target(*args, **kwargs)
+                with self._cache_lock:
+                    if key in results:
+                        return results[key]
+                result = target(*args, **kwargs)
+                with self._cache_lock:
+                    results[key] = result
+                return result
+            wrapper.clear = results.clear
+            return wrapper
+        return wrap(func) if func is not None else wrap
+
+    cache_data = cache_resource = cache = experimental_memo = experimental_singleton = _memoize
+
+
+def install(fake: Optional[HeadlessStreamlit] = None) -> HeadlessStreamlit:
+    """把替身注册为 streamlit 及 streamlit_option_menu 模块"""
+    fake = fake or HeadlessStreamlit()
+    option_menu = types.ModuleType("streamlit_option_menu")
+    option_menu.option_menu = fake.option_menu
+    sys.modules["streamlit"] = fake
+    sys.modules["streamlit.components"] = fake.components
+    sys.modules["streamlit.components.v1"] = fake.components.v1
+    sys.modules["streamlit_option_menu"] = option_menu
+    return fake
+
+
+@contextlib.contextmanager
+def installed(fake: Optional[HeadlessStreamlit] = None) -> Iterator[HeadlessStreamlit]:
+    """临时替换 streamlit 模块，退出时恢复原来的模块"""
+    saved = {name: sys.modules.get(name) for name in STREAMLIT_MODULES}
+    try:
+        yield install(fake)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
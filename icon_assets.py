@@ -0,0 +1,268 @@
+"""本地化的应用图标
+
+远程图标（img.icons8.com 等）先用命令行下载到 icons/ 目录，文件以内容摘要命名，
+icons/manifest.json 记录 "远程地址 -> 本地文件" 的对应关系；整个目录可以直接复制到
+无法访问外网的部署环境：
+
+    python icon_assets.py --config apps_config.json
+
+配置中的应用图标随后被改写为 "icons/<文件名>" 形式的本地引用（--dir 指定其他目录时，
+引用为该目录相对于配置文件所在目录的路径）。主页渲染时每种图标
+只以 base64 data URI 的形式出现一次（写在页面的 <style> 中，卡片通过 CSS 类引用），
+转换结果缓存在内存中。没有本地文件的图标显示内置的 SVG 占位图，渲染过程不会发起
+任何外部请求。
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config_store import get_config_store, replacement_mode
+
+ICON_DIR = "icons"
+# 新建应用时可选的图标（下载后显示为本地引用）
+ICON_LIST = [
+    "https://img.icons8.com/color/48/000000/bar-chart.png",
+    "https://img.icons8.com/color/48/000000/data-configuration.png",
+    "https://img.icons8.com/ios-filled/50/000000/electricity.png",
+    "https://img.icons8.com/color/48/000000/python.png",
+    "https://img.icons8.com/color/48/000000/code.png"
+]
+MANIFEST_NAME = "manifest.json"
+# 清单文件的修改检查间隔（秒），命令行在其他进程中更新清单后无需重启
+MANIFEST_CHECK_INTERVAL = 5.0
+DOWNLOAD_TIMEOUT = 10
+PLACEHOLDER_CLASS = "icon-placeholder"
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 40 40">'
+    '<rect width="40" height="40" rx="8" fill="#e9ecef"/>'
+    '<rect x="11" y="11" width="18" height="18" rx="3" fill="none" stroke="#868e96" stroke-width="2.5"/>'
+    '</svg>'
+)
+MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml",
+    ".ico": "image/x-icon",
+}
+CONTENT_TYPE_EXTENSIONS = {mime: ext for ext, mime in MIME_TYPES.items() if ext != ".jpeg"}
+
+
+def is_remote(icon: str) -> bool:
+    return icon.startswith(("http://", "https://", "//"))
+
+
+class IconAssets:
+    """图标清单与 data URI 的进程内缓存"""
+
+    def __init__(self, root: str = ICON_DIR, app_root: str = "."):
+        self.root = root
+        self.app_root = app_root
+        # 本地引用的前缀：图标目录相对于应用目录的路径
+        self.prefix = os.path.relpath(os.path.abspath(root), os.path.abspath(app_root)).replace(os.sep, "/")
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, str] = {}
+        self._manifest_mtime: Optional[int] = None
+        self._checked_at = float("-inf")
+        # 图标引用 -> CSS 类名；本地文件路径 -> data URI
+        self._classes: Dict[str, str] = {}
+        self._uris: Dict[str, str] = {}
+
+    def manifest(self) -> Dict[str, str]:
+        """远程地址 -> 本地文件名；清单文件变化后自动重新读取"""
+        now = time.monotonic()
+        if now - self._checked_at < MANIFEST_CHECK_INTERVAL:
+            return self._manifest
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._manifest_mtime:
+                manifest = {}
+                if mtime is not None:
+                    try:
+                        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                            manifest = json.load(f)
+                    except (OSError, ValueError):
+                        manifest = {}
+                self._manifest = manifest
+                self._manifest_mtime = mtime
+                self._classes.clear()
+            return self._manifest
+
+    def local_path(self, icon: str) -> Optional[str]:
+        """图标对应的本地文件；未下载的远程图标和图标名返回 None"""
+        if not icon:
+            return None
+        if is_remote(icon):
+            name = self.manifest().get(icon)
+            if not name or os.path.basename(name) != name:
+                return None
+            return os.path.join(self.root, name)
+        # 本地引用是相对于应用目录的图片路径，不能指向应用目录之外
+        parts = icon.split("/")
+        if (os.path.isabs(icon) or any(part in ("", ".", "..") for part in parts)
+                or os.path.splitext(icon)[1].lower() not in MIME_TYPES):
+            return None
+        return os.path.join(self.app_root, *parts)
+
+    def localize(self, icon: str) -> str:
+        """已下载的远程图标改写为本地引用，其余原样返回"""
+        if icon and is_remote(icon):
+            name = self.manifest().get(icon)
+            if name:
+                return f"{self.prefix}/{name}"
+        return icon
+
+    def choices(self) -> List[str]:
+        """图标选择框的选项"""
+        return list(dict.fromkeys(self.localize(icon) for icon in ICON_LIST))
+
+    def css_class(self, icon: str) -> str:
+        """卡片引用图标所用的 CSS 类名"""
+        self.manifest()
+        with self._lock:
+            name = self._classes.get(icon)
+            if name is not None:
+                return name
+        path = self.local_path(icon)
+        if path is None or self._data_uri(path) is None:
+            name = PLACEHOLDER_CLASS
+        else:
+            name = f"icon-{hashlib.sha256(os.path.basename(path).encode('utf-8')).hexdigest()[:12]}"
+        with self._lock:
+            self._classes[icon] = name
+        return name
+
+    def _data_uri(self, path: str) -> Optional[str]:
+        with self._lock:
+            uri = self._uris.get(path)
+        if uri is not None:
+            return uri
+        mime = MIME_TYPES.get(os.path.splitext(path)[1].lower())
+        if mime is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        uri = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+        with self._lock:
+            self._uris[path] = uri
+        return uri
+
+    def stylesheet(self, icons: Iterable[str]) -> str:
+        """给定图标的 <style> 块：每种图标的 data URI 只出现一次"""
+        rules = {}
+        for icon in icons:
+            name = self.css_class(icon)
+            if name in rules:
+                continue
+            if name == PLACEHOLDER_CLASS:
+                uri = f"data:image/svg+xml;base64,{base64.b64encode(PLACEHOLDER_SVG.encode('utf-8')).decode('ascii')}"
+            else:
+                uri = self._data_uri(self.local_path(icon))
+            rules[name] = f".{name} {{ background-image: url({uri}); }}"
+        return "<style>\n" + "\n".join(rules.values()) + "\n</style>"
+
+    def vendor(self, urls: Iterable[str], fetch: Optional[Callable[[str], tuple]] = None) -> Dict[str, str]:
+        """下载尚未本地化的远程图标并更新清单，返回 {地址: 错误信息}"""
+        fetch = fetch or _download
+        os.makedirs(self.root, exist_ok=True)
+        manifest = dict(self.manifest())
+        errors = {}
+        for url in dict.fromkeys(urls):
+            if not is_remote(url) or url in manifest:
+                continue
+            try:
+                data, content_type = fetch(url)
+            except Exception as e:
+                errors[url] = str(e)
+                continue
+            ext = os.path.splitext(url.split("?")[0])[1].lower()
+            if ext not in MIME_TYPES:
+                ext = CONTENT_TYPE_EXTENSIONS.get((content_type or "").split(";")[0].strip(), ".png")
+            name = f"{hashlib.sha256(data).hexdigest()[:16]}{ext}"
+            path = os.path.join(self.root, name)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            manifest[url] = name
+        _write_atomic(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=4).encode('utf-8'))
+        with self._lock:
+            self._checked_at = float("-inf")
+        return errors
+
+
+def _download(url: str) -> tuple:
+    if url.startswith("//"):
+        url = "https:" + url
+    with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+        return response.read(), response.headers.get("Content-Type")
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, replacement_mode(path))
+    os.replace(tmp_path, path)
+
+
+def localize_icons(config: Dict, assets: "IconAssets") -> bool:
+    """把配置中已下载的远程应用图标改写为本地引用，返回配置是否有改动"""
+    changed = False
+    for app in config.get("apps", []):
+        icon = app.get("icon", "")
+        local = assets.localize(icon)
+        if local != icon:
+            app["icon"] = local
+            changed = True
+    return changed
+
+
+icon_assets = IconAssets()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="下载远程图标到本地并改写配置")
+    parser.add_argument("--config", default="apps_config.json", help="要改写的配置文件")
+    parser.add_argument("--dir", default=ICON_DIR, help="图标目录")
+    parser.add_argument("--url", action="append", default=[], help="额外下载的图标地址（可重复）")
+    args = parser.parse_args(argv)
+
+    assets = IconAssets(args.dir, os.path.dirname(os.path.abspath(args.config)))
+    if assets.prefix == ".." or assets.prefix.startswith("../"):
+        parser.error("图标目录必须位于配置文件所在的目录中")
+    store = get_config_store(args.config)
+    config = store.get({"apps": [], "categories": [], "settings": {}})
+    urls = list(ICON_LIST) + args.url + [app.get("icon", "") for app in config.get("apps", [])]
+    errors = assets.vendor(urls)
+    for url, error in errors.items():
+        print(f"✗ {url}: {error}", file=sys.stderr)
+    print(f"清单中共有 {len(assets.manifest())} 个图标（{assets.manifest_path}）")
+
+    if os.path.exists(args.config):
+        # 重新解析配置，由加载钩子改写图标引用并写回
+        store.add_load_hook("icon_assets", lambda config: localize_icons(config, assets))
+        store.invalidate()
+        store.get(config)
+        print(f"已改写 {args.config} 中的图标引用")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""上传应用的导入清单与后台预热
+
+上传和启动时用 AST 静态扫描应用源码中的 import 语句，清单记录在配置的
+"imports" 字段中；服务启动时在后台线程里预先导入所有清单模块的并集，
+让应用第一次运行时不必在 exec 中等待 matplotlib、scipy 等库的导入。
+"""
+import ast
+import importlib
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 模块名 -> {"status": "pending" | "loaded" | "cached" | "failed", "seconds": float, "error": str}
+import_status: Dict[str, Dict] = {}
+_queue: List[str] = []
+_queue_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+_started = False
+
+
+def scan_imports(code: str) -> List[str]:
+    """静态扫描源码中的绝对导入，返回排序后的模块名列表"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module)
+    return sorted(modules)
+
+
+def fill_missing_manifests(config: Dict, get_source: Callable[[Dict], Optional[str]]) -> bool:
+    """为缺少导入清单的应用补充清单，返回配置是否有改动"""
+    changed = False
+    for app in config.get("apps", []):
+        if "imports" in app:
+            continue
+        code = get_source(app)
+        if code is None:
+            continue
+        app["imports"] = scan_imports(code)
+        changed = True
+    return changed
+
+
+def manifest_union(config: Dict) -> List[str]:
+    """所有应用导入清单的并集"""
+    modules = set()
+    for app in config.get("apps", []):
+        modules.update(app.get("imports", []))
+    return sorted(modules)
+
+
+def manifest_usage(config: Dict) -> Dict[str, int]:
+    """导入清单中每个模块被多少个应用使用，按模块名排序"""
+    counts: Dict[str, int] = {}
+    for app in config.get("apps", []):
+        for name in set(app.get("imports", [])):
+            counts[name] = counts.get(name, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def prewarm(modules: Iterable[str]):
+    """把尚未处理过的模块加入后台预热队列"""
+    global _worker
+    with _queue_lock:
+        for name in modules:
+            if name not in import_status:
+                import_status[name] = {"status": "pending", "seconds": 0.0, "error": ""}
+                _queue.append(name)
+        if _queue and (_worker is None or not _worker.is_alive()):
+            _worker = threading.Thread(target=_drain_queue, name="import-prewarm", daemon=True)
+            _worker.start()
+
+
+def prewarm_on_startup(config: Dict):
+    """每个进程只在第一次调用时预热全部清单模块"""
+    global _started
+    if _started:
+        return
+    _started = True
+    prewarm(manifest_union(config))
+
+
+def _drain_queue():
+    while True:
+        with _queue_lock:
+            if not _queue:
+                return
+            name = _queue.pop(0)
+        if name in sys.modules:
+            import_status[name] = {"status": "cached", "seconds": 0.0, "error": ""}
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            import_status[name] = {
+                "status": "failed",
+                "seconds": time.perf_counter() - start,
+                "error": str(e),
+            }
+        else:
+            import_status[name] = {
+                "status": "loaded",
+                "seconds": time.perf_counter() - start,
+                "error": "",
+            }
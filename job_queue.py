@@ -0,0 +1,395 @@
+"""上传应用的后台任务队列
+
+load_module() 向应用模块注入 jobs 对象，耗时的模块级函数（参数扫描、生成报告等）
+可以提交到独立的任务进程中执行，会话只需在每次重跑时查询状态：
+
+    def sweep(values):
+        for i, value in enumerate(values):
+            ...
+            jobs.progress((i + 1) / len(values), f"已完成 {i + 1} 组")
+        return table
+
+    def run():
+        job_id = jobs.submit(sweep, values)
+        status = jobs.status(job_id)
+        if status["state"] == "done":
+            st.dataframe(jobs.result(job_id))
+        else:
+            st.progress(status["progress"])
+
+任务 ID 由应用源码摘要、函数限定名和参数决定：相同参数的提交（无论来自哪个会话、
+重跑多少次）对应同一个任务，结果只计算一次。状态与结果保存在
+.jobs/<应用ID>/<任务ID>/ 下，重跑、切换会话甚至重启服务后仍然可用。
+"""
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config_store import replacement_mode
+from worker_pool import PRELOAD_MODULES, _init_worker, _load_worker_module, is_offloadable, resolve_function
+
+JOB_DIR = ".jobs"
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_RETENTION_DAYS = 7
+# 进度写入的最小间隔（秒），避免频繁调用 progress() 时反复写文件
+PROGRESS_INTERVAL = 0.2
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+JOB_STATES = {
+    STATE_QUEUED: "排队中",
+    STATE_RUNNING: "运行中",
+    STATE_DONE: "已完成",
+    STATE_FAILED: "失败",
+    STATE_CANCELLED: "已取消",
+}
+ACTIVE_STATES = (STATE_QUEUED, STATE_RUNNING)
+
+
+class JobCancelled(Exception):
+    """任务已被取消；由任务内部的 jobs.progress() 抛出"""
+
+
+def job_id_for(digest: str, qualname: str, args: tuple, kwargs: dict) -> str:
+    """源码摘要 + 函数 + 参数确定任务 ID；参数无法 pickle 时抛出 TypeError"""
+    try:
+        params = pickle.dumps((args, sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        raise TypeError(f"任务参数无法序列化: {e}") from e
+    return hashlib.sha256(digest.encode('ascii') + qualname.encode('utf-8') + b"\0" + params).hexdigest()[:32]
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, replacement_mode(path))
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobStore:
+    """任务状态与结果的本地存储"""
+
+    def __init__(self, root: str = JOB_DIR):
+        self.root = root
+
+    def job_dir(self, app_id: str, job_id: str) -> str:
+        return os.path.join(self.root, app_id, job_id)
+
+    def read_status(self, app_id: str, job_id: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.job_dir(app_id, job_id), "status.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_status(self, app_id: str, job_id: str, status: Dict):
+        directory = self.job_dir(app_id, job_id)
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(os.path.join(directory, "status.json"),
+                      json.dumps(status, ensure_ascii=False).encode('utf-8'))
+
+    def update_status(self, app_id: str, job_id: str, **fields) -> Dict:
+        status = self.read_status(app_id, job_id) or {"app_id": app_id, "job_id": job_id}
+        status.update(fields)
+        self.write_status(app_id, job_id, status)
+        return status
+
+    def status(self, app_id: str, job_id: str) -> Optional[Dict]:
+        """任务状态；负责该任务的进程已经不存在时标记为失败"""
+        status = self.read_status(app_id, job_id)
+        if status is not None and status.get("state") in ACTIVE_STATES and not _pid_alive(status.get("pid")):
+            status = self.update_status(app_id, job_id, state=STATE_FAILED, finished_at=time.time(),
+                                        error="执行任务的进程已退出")
+        return status
+
+    def write_result(self, app_id: str, job_id: str, result: Any):
+        _write_atomic(os.path.join(self.job_dir(app_id, job_id), "result.pkl"),
+                      pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def read_result(self, app_id: str, job_id: str) -> Any:
+        with open(os.path.join(self.job_dir(app_id, job_id), "result.pkl"), 'rb') as f:
+            return pickle.load(f)
+
+    def list_jobs(self, app_id: Optional[str] = None) -> List[Dict]:
+        """全部（或某个应用的）任务状态，按提交时间从新到旧"""
+        jobs = []
+        try:
+            app_ids = [app_id] if app_id else os.listdir(self.root)
+        except OSError:
+            return jobs
+        for current in app_ids:
+            try:
+                job_ids = os.listdir(os.path.join(self.root, current))
+            except OSError:
+                continue
+            for job_id in job_ids:
+                status = self.read_status(current, job_id)
+                if status is not None:
+                    jobs.append(status)
+        jobs.sort(key=lambda status: status.get("submitted_at", 0), reverse=True)
+        return jobs
+
+    def page_jobs(self, offset: int, limit: int) -> Tuple[int, List[Dict]]:
+        """按状态最近更新的时间从新到旧分页，只解析当前页的状态文件；返回 (任务总数, 当前页)"""
+        entries = []
+        try:
+            app_dirs = [entry for entry in os.scandir(self.root) if entry.is_dir()]
+        except OSError:
+            return 0, []
+        for app_dir in app_dirs:
+            try:
+                job_dirs = list(os.scandir(app_dir.path))
+            except OSError:
+                continue
+            for job_dir in job_dirs:
+                try:
+                    mtime = os.stat(os.path.join(job_dir.path, "status.json")).st_mtime
+                except OSError:
+                    continue
+                entries.append((mtime, app_dir.name, job_dir.name))
+        entries.sort(reverse=True)
+        jobs = []
+        for _, app_id, job_id in entries[offset:offset + limit]:
+            status = self.read_status(app_id, job_id)
+            if status is not None:
+                jobs.append(status)
+        return len(entries), jobs
+
+    def remove(self, app_id: str, job_id: Optional[str] = None):
+        """删除单个任务或应用的全部任务"""
+        path = self.job_dir(app_id, job_id) if job_id else os.path.join(self.root, app_id)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def prune(self, max_age_days: float = DEFAULT_RETENTION_DAYS) -> int:
+        """删除结束时间早于 max_age_days 天前的任务，返回删除的数量"""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for status in self.list_jobs():
+            if status.get("state") not in ACTIVE_STATES and (status.get("finished_at") or 0) < cutoff:
+                self.remove(status["app_id"], status["job_id"])
+                removed += 1
+        return removed
+
+
+# ---- 任务进程内 ----
+
+_current_job: Optional[Dict] = None
+
+
+class _WorkerJobs:
+    """任务进程中模块的 jobs 对象：只支持报告进度"""
+
+    def __init__(self, store: JobStore):
+        self._store = store
+        self._last_write = 0.0
+
+    def progress(self, fraction: float, message: str = ""):
+        """报告当前任务的进度（0~1）；任务已被取消时抛出 JobCancelled"""
+        job = _current_job
+        if job is None:
+            return
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL and fraction < 1:
+            return
+        self._last_write = now
+        status = self._store.read_status(job["app_id"], job["job_id"])
+        if status is not None and status.get("state") == STATE_CANCELLED:
+            raise JobCancelled(job["job_id"])
+        self._store.update_status(job["app_id"], job["job_id"],
+                                  progress=max(0.0, min(1.0, float(fraction))), message=message)
+
+
+def _run_job(root: str, app_id: str, digest: str, source_path: str, job_id: str, qualname: str,
+             args: tuple, kwargs: dict):
+    global _current_job
+    store = JobStore(root)
+    status = store.read_status(app_id, job_id)
+    if status is not None and status.get("state") == STATE_CANCELLED:
+        return
+    store.update_status(app_id, job_id, state=STATE_RUNNING, started_at=time.time(), pid=os.getpid())
+    _current_job = {"app_id": app_id, "job_id": job_id}
+    try:
+        module = _load_worker_module(app_id, digest, source_path)
+        module.jobs = _WorkerJobs(store)
+        result = resolve_function(module, qualname)(*args, **kwargs)
+        store.write_result(app_id, job_id, result)
+        store.update_status(app_id, job_id, state=STATE_DONE, progress=1.0, finished_at=time.time())
+    except JobCancelled:
+        store.update_status(app_id, job_id, state=STATE_CANCELLED, finished_at=time.time())
+    except Exception as e:
+        store.update_status(app_id, job_id, state=STATE_FAILED, finished_at=time.time(),
+                            error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    finally:
+        _current_job = None
+
+
+# ---- 服务进程内 ----
+
+class JobQueue:
+    """把任务提交到独立进程池，并通过 JobStore 跟踪状态"""
+
+    def __init__(self, size: int = DEFAULT_JOB_WORKERS, root: str = JOB_DIR, preload=None):
+        self.size = size
+        self.store = JobStore(root)
+        self.preload = list(PRELOAD_MODULES if preload is None else preload)
+        if os.name == "posix":
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(self.preload)
+        else:
+            context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(processes=size, initializer=_init_worker, initargs=(self.preload,))
+        self._lock = threading.Lock()
+
+    def submit(self, app_id: str, digest: str, source_path: str, func: Callable,
+               args: tuple = (), kwargs: Optional[dict] = None) -> str:
+        """提交任务并返回任务 ID；相同的任务已在运行或已完成时直接返回"""
+        if not is_offloadable(func):
+            raise ValueError("只能提交模块级函数（不能是 lambda 或嵌套函数）")
+        kwargs = kwargs or {}
+        job_id = job_id_for(digest, func.__qualname__, args, kwargs)
+        with self._lock:
+            status = self.store.status(app_id, job_id)
+            if status is not None and status["state"] in (STATE_DONE,) + ACTIVE_STATES:
+                return job_id
+            self.store.write_status(app_id, job_id, {
+                "app_id": app_id,
+                "job_id": job_id,
+                "function": func.__qualname__,
+                "state": STATE_QUEUED,
+                "progress": 0.0,
+                "message": "",
+                "submitted_at": time.time(),
+                "pid": os.getpid(),
+            })
+            self._pool.apply_async(
+                _run_job,
+                (os.path.abspath(self.store.root), app_id, digest, os.path.abspath(source_path), job_id,
+                 func.__qualname__, args, kwargs),
+            )
+        return job_id
+
+    def cancel(self, app_id: str, job_id: str) -> bool:
+        """取消排队中的任务；运行中的任务在下一次报告进度时结束"""
+        status = self.store.status(app_id, job_id)
+        if status is None or status["state"] not in ACTIVE_STATES:
+            return False
+        self.store.update_status(app_id, job_id, state=STATE_CANCELLED, finished_at=time.time())
+        return True
+
+    def retire(self):
+        """不再接收新任务；已提交的任务在旧进程中照常执行完毕后进程退出"""
+        pool = self._pool
+        pool.close()
+        threading.Thread(target=pool.join, name="job-queue-retire", daemon=True).start()
+
+    def close(self):
+        """终止任务进程；本进程提交、尚未开始的任务标记为失败"""
+        self._pool.terminate()
+        self._pool.join()
+        for status in self.store.list_jobs():
+            if status.get("state") == STATE_QUEUED and status.get("pid") == os.getpid():
+                self.store.update_status(status["app_id"], status["job_id"], state=STATE_FAILED,
+                                         finished_at=time.time(), error="任务队列已关闭")
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(size: int = DEFAULT_JOB_WORKERS) -> JobQueue:
+    """获取进程级共享的任务队列，进程数变化时重建（已提交的任务不受影响）"""
+    global _queue
+    with _queue_lock:
+        if _queue is not None and _queue.size != size:
+            _queue.retire()
+            _queue = None
+        if _queue is None:
+            _queue = JobQueue(size)
+        return _queue
+
+
+def shutdown_job_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.close()
+            _queue = None
+
+
+atexit.register(shutdown_job_queue)
+
+
+class AppJobs:
+    """注入到应用模块中的 jobs 对象"""
+
+    def __init__(self, app_id: str, digest: str, source_path: str, size: int = DEFAULT_JOB_WORKERS,
+                 store: Optional[JobStore] = None):
+        self.app_id = app_id
+        self.digest = digest
+        self.source_path = source_path
+        self.size = size
+        self._store = store or JobStore()
+
+    def submit(self, func: Callable, *args, **kwargs) -> str:
+        """在任务进程中执行模块级函数，返回任务 ID"""
+        return get_job_queue(self.size).submit(self.app_id, self.digest, self.source_path, func, args, kwargs)
+
+    def job_id(self, func: Callable, *args, **kwargs) -> str:
+        """不提交任务，只计算对应的任务 ID"""
+        return job_id_for(self.digest, func.__qualname__, args, kwargs)
+
+    def status(self, job_id: str) -> Dict:
+        """任务状态：state、progress、message、error 等；不存在时 state 为 None"""
+        return self._store.status(self.app_id, job_id) or {"app_id": self.app_id, "job_id": job_id, "state": None, "progress": 0.0, "message": ""}
+
+    def done(self, job_id: str) -> bool:
+        return self.status(job_id)["state"] == STATE_DONE
+
+    def result(self, job_id: str, default: Any = None) -> Any:
+        """已完成任务的结果，未完成时返回 default"""
+        if not self.done(job_id):
+            return default
+        return self._store.read_result(self.app_id, job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        return get_job_queue(self.size).cancel(self.app_id, job_id)
+
+    def list(self) -> List[Dict]:
+        """本应用的全部任务"""
+        return self._store.list_jobs(self.app_id)
+
+    def progress(self, fraction: float, message: str = ""):
+        """在会话中直接调用任务函数时没有任务可报告，忽略"""
+
+
+def make_jobs(app_id: str, digest: str, source_path: str, size: int = DEFAULT_JOB_WORKERS) -> AppJobs:
+    """生成注入到应用模块中的 jobs 对象"""
+    return AppJobs(app_id, digest, source_path, size)
+
+
+job_store = JobStore()
@@ -0,0 +1,301 @@
+"""启动器的合成负载测试
+
+生成指定规模的合成目录（apps_config.json、uploaded_apps/ 与 blob 存储），再用
+headless_streamlit 在线程池与进程池中并发模拟会话，驱动 AppManager 的各条渲染
+路径，统计每个场景的延迟百分位、每次渲染的文件 I/O 次数与内存：
+
+    python loadgen.py --root /tmp/loadgen --apps 10000 --categories 200 --sessions 100
+    python loadgen.py --root /tmp/loadgen --scenarios home,search --mode process --processes 4
+
+每次渲染都像真实的重跑一样先构造 AppManager，再调用对应的渲染方法。文件 I/O
+只统计会话线程自己发起的 open/stat/scandir/listdir，不包括后台线程。
+"""
+import argparse
+import builtins
+import concurrent.futures
+import importlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from blob_store import BLOB_DIR, BlobStore, describe_source
+from headless_streamlit import SessionState, install
+from import_manifest import scan_imports
+from telemetry import percentile
+
+CONFIG_NAME = "apps_config.json"
+UPLOAD_NAME = "uploaded_apps"
+# 场景 -> (渲染方法, 控件输入)
+SCENARIOS: Dict[str, Tuple[str, Dict]] = {
+    "navigation": ("render_navigation", {}),
+    "home": ("render_app_details_compact", {}),
+    "search": ("render_app_details_compact", {"search_apps": "智能分析"}),
+    "settings": ("render_settings", {}),
+    "backup": ("render_backup_management", {}),
+}
+IO_FUNCTIONS = (
+    (builtins, "open"),
+    (os, "stat"),
+    (os, "scandir"),
+    (os, "listdir"),
+)
+
+APP_TEMPLATE = '''import streamlit as st
+
+
+def run():
+    st.markdown("## {title}")
+    value = st.number_input("参数", min_value=0, max_value=100, value={value}, key="value")
+{body}
+'''
+
+
+def generate_catalog(root: str, apps: int = 10000, categories: int = 200, seed: int = 0) -> Dict:
+    """在 root 下生成合成目录，返回生成的配置"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, UPLOAD_NAME), exist_ok=True)
+    store = BlobStore(os.path.join(root, BLOB_DIR))
+    prefixes = ["智能", "自动化", "高效", "创新", "专业"]
+    suffixes = ["分析工具", "处理系统", "管理器", "辅助工具", "控制台"]
+    config = {
+        "apps": [],
+        "categories": [{"id": "default", "name": "默认分组", "icon": "folder"}] + [
+            {"id": f"cat{i:04d}", "name": f"分类 {i}", "icon": "folder"} for i in range(1, categories)
+        ],
+        "settings": {},
+    }
+    category_ids = [category["id"] for category in config["categories"]]
+    for i in range(apps):
+        app_id = f"app{i:06d}"
+        title = f"{rng.choice(prefixes)}{rng.choice(suffixes)} {i}"
+        body = "\n".join(f"    st.write(value * {n})" for n in range(rng.randint(1, 20)))
+        code = APP_TEMPLATE.format(title=title, value=rng.randint(0, 100), body=body)
+        with open(os.path.join(root, UPLOAD_NAME, f"{app_id}.py"), 'w', encoding='utf-8') as f:
+            f.write(code)
+        config["apps"].append({
+            "id": app_id,
+            "title": title,
+            "description": f"这是第 {i} 个合成应用，用于负载测试。",
+            "icon": "https://img.icons8.com/color/48/000000/bar-chart.png",
+            "category": rng.choice(category_ids),
+            "code_sha256": store.put(code),
+            "imports": scan_imports(code),
+            **describe_source(code),
+        })
+    with open(os.path.join(root, CONFIG_NAME), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    return config
+
+
+class IOCounter:
+    """统计开启计数的线程发起的文件系统调用次数"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self._originals: List[Tuple[object, str, Callable]] = []
+
+    def install(self):
+        for owner, name in IO_FUNCTIONS:
+            original = getattr(owner, name)
+            self._originals.append((owner, name, original))
+            setattr(owner, name, self._wrap(name, original))
+
+    def uninstall(self):
+        for owner, name, original in self._originals:
+            setattr(owner, name, original)
+        self._originals.clear()
+
+    def _wrap(self, name: str, original: Callable) -> Callable:
+        def counted(*args, **kwargs):
+            if getattr(self._local, "active", False):
+                with self._lock:
+                    self.counts[name] = self.counts.get(name, 0) + 1
+            return original(*args, **kwargs)
+        return counted
+
+    def activate(self, active: bool):
+        self._local.active = active
+
+    def take(self) -> Dict[str, int]:
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class LoadRunner:
+    """在当前进程中加载启动器并并发驱动渲染路径"""
+
+    def __init__(self, root: str):
+        os.chdir(root)
+        self.fake = install()
+        self.launcher = importlib.import_module("streamlit_app")
+        self.io = IOCounter()
+        self.io.install()
+        with self.fake.session():
+            self.launcher.AppManager()
+
+    def _one_session(self, scenario: str, iterations: int) -> List[float]:
+        method, inputs = SCENARIOS[scenario]
+        session_state = SessionState()
+        samples = []
+        self.io.activate(True)
+        try:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                with self.fake.session(inputs, session_state):
+                    manager = self.launcher.AppManager()
+                    getattr(manager, method)()
+                samples.append(time.perf_counter() - start)
+        finally:
+            self.io.activate(False)
+        return samples
+
+    def run(self, scenario: str, sessions: int, iterations: int, trace_memory: bool = False) -> Dict:
+        """用 sessions 个线程各渲染 iterations 次"""
+        self.io.take()
+        if trace_memory:
+            # 只开启、不关闭：其他线程仍在分配时调用 tracemalloc.stop() 不安全
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sessions) as pool:
+            futures = [pool.submit(self._one_session, scenario, iterations) for _ in range(sessions)]
+            samples = [sample for future in futures for sample in future.result()]
+        elapsed = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        return {
+            "samples": samples,
+            "elapsed": elapsed,
+            "io": self.io.take(),
+            "rss_mb": _rss_mb(),
+            "traced_peak_mb": peak,
+        }
+
+
+_runner: Optional[LoadRunner] = None
+
+
+def _init_process(root: str):
+    global _runner
+    _runner = LoadRunner(root)
+
+
+def _process_task(scenario: str, sessions: int, iterations: int, trace_memory: bool) -> Dict:
+    return _runner.run(scenario, sessions, iterations, trace_memory)
+
+
+def summarize(scenario: str, mode: str, results: List[Dict]) -> Dict:
+    """合并一个或多个进程的结果"""
+    samples = sorted(sample for result in results for sample in result["samples"])
+    io: Dict[str, int] = {}
+    for result in results:
+        for name, count in result["io"].items():
+            io[name] = io.get(name, 0) + count
+    rss = [result["rss_mb"] for result in results if result["rss_mb"] is not None]
+    peaks = [result["traced_peak_mb"] for result in results if result["traced_peak_mb"] is not None]
+    elapsed = max(result["elapsed"] for result in results)
+    return {
+        "scenario": scenario,
+        "mode": mode,
+        "renders": len(samples),
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": samples[-1] if samples else 0.0,
+        "io_per_render": {name: count / max(1, len(samples)) for name, count in sorted(io.items())},
+        "rss_mb": max(rss) if rss else None,
+        "traced_peak_mb": max(peaks) if peaks else None,
+    }
+
+
+def run_load(root: str, scenarios: List[str], modes: List[str], sessions: int, iterations: int,
+             processes: int, trace_memory: bool = False) -> List[Dict]:
+    """按场景与并发方式运行负载，返回每个组合的汇总"""
+    rows = []
+    if "thread" in modes:
+        runner = LoadRunner(root)
+        for scenario in scenarios:
+            rows.append(summarize(scenario, "thread", [runner.run(scenario, sessions, iterations, trace_memory)]))
+    if "process" in modes:
+        per_process = max(1, sessions // processes)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_process,
+                                                    initargs=(root,)) as pool:
+            for scenario in scenarios:
+                futures = [pool.submit(_process_task, scenario, per_process, iterations, trace_memory)
+                           for _ in range(processes)]
+                rows.append(summarize(scenario, "process", [future.result() for future in futures]))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="启动器的合成负载测试")
+    parser.add_argument("--root", default="loadgen_catalog", help="合成目录所在的目录")
+    parser.add_argument("--apps", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regenerate", action="store_true", help="即使目录已存在也重新生成")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景列表")
+    parser.add_argument("--mode", default="thread,process", help="thread、process 或两者")
+    parser.add_argument("--sessions", type=int, default=100, help="并发会话数")
+    parser.add_argument("--iterations", type=int, default=3, help="每个会话的渲染次数")
+    parser.add_argument("--processes", type=int, default=4, help="进程模式下的进程数")
+    parser.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 统计峰值内存（较慢）")
+    parser.add_argument("--output", default="loadgen_report.json")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(args.root)
+    output = os.path.abspath(args.output)
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+    if args.regenerate or not os.path.exists(os.path.join(root, CONFIG_NAME)):
+        start = time.perf_counter()
+        generate_catalog(root, args.apps, args.categories, args.seed)
+        print(f"已生成 {args.apps} 个应用、{args.categories} 个分类（{time.perf_counter() - start:.1f}s）")
+
+    # LoadRunner 会切换到合成目录，确保之后仍能导入启动器
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    rows = run_load(root, scenarios, args.mode.split(","), args.sessions, args.iterations,
+                    args.processes, args.trace_memory)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "root": root,
+        "apps": args.apps,
+        "categories": args.categories,
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "results": rows,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    for row in rows:
+        io_total = sum(row["io_per_render"].values())
+        print(f"{row['scenario']:<10} {row['mode']:<7} n={row['renders']:<5} "
+              f"p50={row['p50'] * 1000:8.1f}ms p95={row['p95'] * 1000:8.1f}ms p99={row['p99'] * 1000:8.1f}ms "
+              f"io/render={io_total:6.1f} rss={row['rss_mb'] or 0:.0f}MB")
+    print(f"报告已写入 {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
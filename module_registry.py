@@ -0,0 +1,202 @@
+"""已加载应用模块的有界注册表
+
+load_module() 执行过的应用模块登记在这里（同时放入 sys.modules），源码摘要未变时
+直接复用常驻模块。常驻模块数量与估算的内存总量都有上限，超出时按最近最少使用
+淘汰：从 sys.modules 移除、清空模块字典并显式触发 gc，让模块级的数组、图形、
+字体等对象尽快释放。正在运行的模块不会被清空，待运行结束后再回收。
+"""
+import contextlib
+import gc
+import sys
+import threading
+import time
+from collections import OrderedDict
+from types import ModuleType
+from typing import Dict, List, Optional
+
+DEFAULT_MAX_MODULES = 32
+DEFAULT_MAX_MB = 512
+# 估算模块内存时最多遍历的对象数与嵌套深度，避免在巨大的对象图上耗时过长
+SIZE_WALK_LIMIT = 100000
+SIZE_WALK_DEPTH = 6
+# 完整 gc 在大堆上要几十毫秒，连续淘汰时至多每隔这么多秒执行一次
+GC_MIN_INTERVAL = 5.0
+
+
+def estimate_size(module: ModuleType) -> int:
+    """估算模块字典可达对象占用的字节数（不计其他模块、类与函数内部）"""
+    seen = set()
+    total = 0
+    stack = [(value, 0) for value in list(vars(module).values())]
+    while stack and len(seen) < SIZE_WALK_LIMIT:
+        obj, depth = stack.pop()
+        if id(obj) in seen or isinstance(obj, (ModuleType, type)):
+            continue
+        seen.add(id(obj))
+        try:
+            total += sys.getsizeof(obj)
+        except TypeError:
+            continue
+        if depth >= SIZE_WALK_DEPTH or callable(obj):
+            continue
+        if isinstance(obj, dict):
+            children = list(obj.keys()) + list(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            children = list(obj)
+        else:
+            children = list(getattr(obj, "__dict__", {}).values())
+        stack.extend((child, depth + 1) for child in children)
+    return total
+
+
+class _Entry:
+    __slots__ = ("app_id", "module", "digest", "size", "hits", "loaded_at", "last_used")
+
+    def __init__(self, app_id: str, module: ModuleType, digest: str, size: int):
+        self.app_id = app_id
+        self.module = module
+        self.digest = digest
+        self.size = size
+        self.hits = 0
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+
+class ModuleRegistry:
+    """按模块数与内存总量限制的 LRU 模块注册表"""
+
+    def __init__(self, max_modules: int = DEFAULT_MAX_MODULES, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_modules = max_modules
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._retired: Dict[str, List[ModuleType]] = {}
+        self.evictions = 0
+        self._last_gc = 0.0
+
+    def configure(self, max_modules: int, max_bytes: int):
+        """调整上限，立即按新上限淘汰"""
+        if (max_modules, max_bytes) == (self.max_modules, self.max_bytes):
+            return
+        with self._lock:
+            self.max_modules = max_modules
+            self.max_bytes = max_bytes
+            evicted = self._evict_locked()
+        self._release(evicted)
+
+    def get(self, app_id: str, digest: str) -> Optional[ModuleType]:
+        """返回摘要匹配的常驻模块；摘要不同时丢弃旧模块并返回 None"""
+        with self._lock:
+            entry = self._entries.get(app_id)
+            if entry is None:
+                return None
+            if entry.digest == digest:
+                self._entries.move_to_end(app_id)
+                entry.hits += 1
+                entry.last_used = time.time()
+                sys.modules[app_id] = entry.module
+                return entry.module
+            evicted = [self._remove_locked(app_id)]
+        self._release(evicted)
+        return None
+
+    def put(self, app_id: str, digest: str, module: ModuleType):
+        """登记新执行的模块，并按上限淘汰最久未用的模块"""
+        entry = _Entry(app_id, module, digest, estimate_size(module))
+        with self._lock:
+            evicted = []
+            if app_id in self._entries:
+                evicted.append(self._remove_locked(app_id))
+            self._entries[app_id] = entry
+            sys.modules[app_id] = module
+            evicted.extend(self._evict_locked(keep=app_id))
+        self._release(evicted)
+
+    def discard(self, app_id: str):
+        """移除应用的常驻模块（应用被删除或源码已变化）"""
+        with self._lock:
+            evicted = [self._remove_locked(app_id)] if app_id in self._entries else []
+            if not evicted and sys.modules.get(app_id) is not None:
+                sys.modules.pop(app_id, None)
+        self._release(evicted)
+
+    @contextlib.contextmanager
+    def pin(self, app_id: str):
+        """运行期间钉住模块：期间被淘汰的模块在运行结束后才清空"""
+        with self._lock:
+            self._pins[app_id] = self._pins.get(app_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[app_id] -= 1
+                retired = []
+                if not self._pins[app_id]:
+                    del self._pins[app_id]
+                    retired = self._retired.pop(app_id, [])
+            if retired:
+                self._clear(retired)
+
+    def _remove_locked(self, app_id: str) -> _Entry:
+        entry = self._entries.pop(app_id)
+        if sys.modules.get(app_id) is entry.module:
+            del sys.modules[app_id]
+        self.evictions += 1
+        return entry
+
+    def _evict_locked(self, keep: Optional[str] = None) -> List[_Entry]:
+        evicted = []
+        total = sum(entry.size for entry in self._entries.values())
+        for app_id in list(self._entries):
+            if len(self._entries) <= self.max_modules and total <= self.max_bytes:
+                break
+            if app_id == keep:
+                continue
+            entry = self._remove_locked(app_id)
+            total -= entry.size
+            evicted.append(entry)
+        return evicted
+
+    def _release(self, evicted: List[_Entry]):
+        if not evicted:
+            return
+        ready = []
+        with self._lock:
+            for entry in evicted:
+                if self._pins.get(entry.app_id):
+                    self._retired.setdefault(entry.app_id, []).append(entry.module)
+                else:
+                    ready.append(entry.module)
+        self._clear(ready)
+
+    def _clear(self, modules: List[ModuleType]):
+        for module in modules:
+            # 清空模块字典以打断函数与全局变量之间的引用环，大部分对象随即由引用计数释放
+            module.__dict__.clear()
+        if not modules:
+            return
+        now = time.monotonic()
+        if now - self._last_gc >= GC_MIN_INTERVAL:
+            self._last_gc = now
+            gc.collect()
+        else:
+            gc.collect(0)
+
+    def stats(self) -> List[Dict]:
+        """每个常驻模块的内存估算与使用情况"""
+        with self._lock:
+            return [{
+                "app_id": app_id,
+                "size": entry.size,
+                "hits": entry.hits,
+                "loaded_at": entry.loaded_at,
+                "last_used": entry.last_used,
+            } for app_id, entry in reversed(self._entries.items())]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+
+module_registry = ModuleRegistry()
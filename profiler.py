@@ -0,0 +1,273 @@
+"""上传应用的采样分析
+
+管理员在设置中为某个应用开启采样后，该应用接下来的 N 次运行由一个后台采样线程
+按固定间隔读取运行线程的调用栈（sys._current_frames()），折叠成
+"帧;帧;帧 次数" 形式的 collapsed stacks，按应用累计并保存到 profiles/<应用ID>.folded，
+可以直接交给 flamegraph.pl / speedscope 等工具。
+
+Streamlit 在脚本线程中执行应用，信号只会投递给主线程，因此这里用采样线程而不是
+信号定时器。未开启采样时 profile() 只做一次字典查询，不启动采样线程。通过
+offload() 在工作进程中执行的函数不在采样范围内。
+"""
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config_store import replacement_mode
+
+PROFILE_DIR = "profiles"
+DEFAULT_INTERVAL = 0.005
+DEFAULT_RUNS = 5
+MAX_STACK_DEPTH = 256
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def top_functions(stacks: Dict[str, int], limit: int = 50) -> List[Dict]:
+    """按自身样本数排序的函数表；总样本数中同一个栈里的递归帧只计一次"""
+    self_samples: Counter = Counter()
+    total_samples: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_samples[frames[-1]] += count
+        for label in set(frames):
+            total_samples[label] += count
+    grand_total = sum(stacks.values()) or 1
+    rows = [{
+        "function": label,
+        "self": self_samples[label],
+        "total": total,
+        "self_pct": self_samples[label] / grand_total * 100,
+        "total_pct": total / grand_total * 100,
+    } for label, total in total_samples.items()]
+    rows.sort(key=lambda row: (row["self"], row["total"]), reverse=True)
+    return rows[:limit]
+
+
+class SamplingProfiler:
+    """按应用累计 collapsed stacks 的线程采样器"""
+
+    def __init__(self, root: str = PROFILE_DIR, interval: float = DEFAULT_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self._lock = threading.Lock()
+        # 应用ID -> 剩余的采样运行次数
+        self._armed: Dict[str, int] = {}
+        # 线程 ident -> (应用ID, 进入 profile() 的帧)
+        self._targets: Dict[int, Tuple[str, object]] = {}
+        self._stacks: Dict[str, Counter] = {}
+        self._runs: Dict[str, int] = {}
+        self._sampler: Optional[threading.Thread] = None
+
+    def arm(self, app_id: str, runs: int = DEFAULT_RUNS, interval: Optional[float] = None):
+        """对应用接下来的 runs 次运行开启采样"""
+        with self._lock:
+            if interval:
+                self.interval = interval
+            if runs > 0:
+                self._armed[app_id] = runs
+            else:
+                self._armed.pop(app_id, None)
+
+    def armed(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._armed)
+
+    @contextlib.contextmanager
+    def profile(self, app_id: str) -> Iterator[None]:
+        """已开启采样时在采样下执行代码块，否则直接执行"""
+        if app_id not in self._armed or not self._take_run(app_id):
+            yield
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            self._targets[ident] = (app_id, sys._getframe(2))
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="app-profiler", daemon=True)
+                self._sampler.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._targets.pop(ident, None)
+                self._runs[app_id] = self._runs.get(app_id, 0) + 1
+            self._save(app_id)
+
+    def _take_run(self, app_id: str) -> bool:
+        with self._lock:
+            remaining = self._armed.get(app_id, 0)
+            if remaining <= 0:
+                return False
+            if remaining == 1:
+                del self._armed[app_id]
+            else:
+                self._armed[app_id] = remaining - 1
+            self._load_locked(app_id)
+            return True
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    # 没有需要采样的运行：退出线程，下次开启时再启动
+                    self._sampler = None
+                    return
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            samples = []
+            for ident, (app_id, entry) in targets.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and frame is not entry and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    samples.append((app_id, ";".join(reversed(stack))))
+            del frames
+            with self._lock:
+                for app_id, stack in samples:
+                    self._stacks.setdefault(app_id, Counter())[stack] += 1
+            time.sleep(self.interval)
+
+    def _path(self, app_id: str) -> str:
+        return os.path.join(self.root, f"{app_id}.folded")
+
+    def _load_locked(self, app_id: str):
+        if app_id in self._stacks:
+            return
+        stacks: Counter = Counter()
+        runs = 0
+        try:
+            with open(self._path(app_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith("# runs "):
+                        runs = int(line.split()[2])
+                        continue
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    if stack and count.isdigit():
+                        stacks[stack] += int(count)
+        except (OSError, ValueError):
+            pass
+        self._stacks[app_id] = stacks
+        self._runs[app_id] = runs
+
+    def _save(self, app_id: str):
+        with self._lock:
+            stacks = dict(self._stacks.get(app_id, {}))
+            runs = self._runs.get(app_id, 0)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f"# runs {runs}\n")
+                for stack, count in sorted(stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            os.chmod(tmp_path, replacement_mode(self._path(app_id)))
+            os.replace(tmp_path, self._path(app_id))
+        except OSError:
+            # 落盘失败不影响应用运行，结果仍保留在内存中
+            pass
+
+    def stacks(self, app_id: str) -> Dict[str, int]:
+        """应用累计的 collapsed stacks"""
+        with self._lock:
+            self._load_locked(app_id)
+            return dict(self._stacks[app_id])
+
+    def runs(self, app_id: str) -> int:
+        with self._lock:
+            self._load_locked(app_id)
+            return self._runs.get(app_id, 0)
+
+    def profiled_apps(self) -> List[str]:
+        """有采样结果的应用ID"""
+        with self._lock:
+            apps = {app_id for app_id, stacks in self._stacks.items() if stacks}
+        try:
+            apps.update(name[:-len(".folded")] for name in os.listdir(self.root) if name.endswith(".folded"))
+        except OSError:
+            pass
+        return sorted(apps)
+
+    def folded(self, app_id: str) -> str:
+        """collapsed stacks 文本"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks(app_id).items()))
+
+    def clear(self, app_id: str):
+        with self._lock:
+            self._stacks.pop(app_id, None)
+            self._runs.pop(app_id, None)
+        try:
+            os.remove(self._path(app_id))
+        except OSError:
+            pass
+
+
+def flamegraph_html(stacks: Dict[str, int], title: str = "", height: int = 18) -> str:
+    """不依赖外部资源的交互式火焰图（点击节点放大，点击根节点还原）"""
+    root = {"n": title or "all", "v": 0, "c": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["v"] += count
+        for label in stack.split(";"):
+            node = node["c"].setdefault(label, {"n": label, "v": 0, "c": {}})
+            node["v"] += count
+
+    def compact(node):
+        return {"n": node["n"], "v": node["v"],
+                "c": [compact(child) for child in sorted(node["c"].values(), key=lambda c: c["n"])]}
+
+    data = json.dumps(compact(root), ensure_ascii=False).replace("</", "<\\/")
+    return f'''<div id="fg" style="font: 12px monospace; position: relative;"></div>
+<div id="fg-info" style="font: 12px monospace; color: #555; margin-top: 4px;"></div>
+<script>
+const data = {data};
+const rowHeight = {height};
+const container = document.getElementById("fg");
+const info = document.getElementById("fg-info");
+function color(name) {{
+  let h = 0;
+  for (let i = 0; i < name.length; i++) h = (h * 31 + name.charCodeAt(i)) >>> 0;
+  return `hsl(${{20 + h % 40}}, ${{70 + h % 20}}%, ${{55 + h % 15}}%)`;
+}}
+function depth(node) {{
+  return 1 + node.c.reduce((m, c) => Math.max(m, depth(c)), 0);
+}}
+function render(focus) {{
+  container.innerHTML = "";
+  container.style.height = (depth(focus) * rowHeight) + "px";
+  const total = focus.v || 1;
+  function draw(node, x, level) {{
+    const width = node.v / total * 100;
+    if (width < 0.1) return;
+    const el = document.createElement("div");
+    el.textContent = node.n;
+    el.title = `${{node.n}}\\n${{node.v}} 个样本（${{(node.v / data.v * 100).toFixed(1)}}%）`;
+    el.style.cssText = `position:absolute;left:${{x}}%;width:${{width}}%;top:${{level * rowHeight}}px;` +
+      `height:${{rowHeight - 1}}px;background:${{color(node.n)}};overflow:hidden;white-space:nowrap;` +
+      `box-sizing:border-box;border-right:1px solid #fff;padding-left:2px;cursor:pointer;`;
+    el.onclick = () => render(node === focus ? data : node);
+    el.onmouseover = () => info.textContent = el.title.replace("\\n", " — ");
+    container.appendChild(el);
+    let offset = x;
+    for (const child of node.c) {{
+      draw(child, offset, level + 1);
+      offset += child.v / total * 100;
+    }}
+  }}
+  draw(focus, 0, 0);
+}}
+render(data);
+</script>'''
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,119 @@
+"""注入上传应用的响应式节点图
+
+应用把 run() 中开销大的部分声明为节点，并写明它依赖的控件值和上游节点：
+
+    def run():
+        g = reactive_graph()
+        T_c = st.number_input("冷端温度 (K)", value=320.0, key="T_c")
+        T_h = st.number_input("热端温度 (K)", value=450.0, key="T_h")
+        SN = st.number_input("单元数", value=10, key="SN")
+        props = g.node("props", average_properties, inputs=["T_c", "T_h"])
+        device = g.node("device", device_output, inputs={"SN": SN}, after=["props"])
+        st.dataframe(device)
+
+inputs 可以是控件 key 的列表（从会话状态中读取）或显式的 {参数名: 值}，上游节点的
+输出按节点名作为关键字参数传入。平台按会话记录每个节点上次的输入指纹与输出：
+重跑时只有输入变化的节点及其下游节点重新计算，其余节点直接返回上次的输出。
+界面元素仍由应用每次重跑时绘制；节点函数只负责计算，不应修改返回过的对象。
+"""
+import hashlib
+import pickle
+from typing import Any, Callable, Dict, Iterable, List, Mapping, MutableMapping, Optional, Union
+
+from telemetry import telemetry
+
+STATE_KEY_PREFIX = "_reactive_"
+
+
+def fingerprint(values: Mapping[str, Any]) -> str:
+    """输入值的指纹；无法 pickle 的值退化为 repr"""
+    digest = hashlib.sha256()
+    for name in sorted(values):
+        value = values[name]
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            data = repr(value).encode('utf-8', 'replace')
+        digest.update(name.encode('utf-8'))
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class _Node:
+    __slots__ = ("fingerprint", "version", "output")
+
+    def __init__(self, node_fingerprint: str, version: int, output: Any):
+        self.fingerprint = node_fingerprint
+        self.version = version
+        self.output = output
+
+
+class ReactiveGraph:
+    """一次运行中的节点图，节点状态保存在会话中"""
+
+    def __init__(self, nodes: Dict[str, _Node], widgets: Mapping[str, Any]):
+        self._nodes = nodes
+        self._widgets = widgets
+        self._declared: List[str] = []
+        self.recomputed: List[str] = []
+        self.reused: List[str] = []
+
+    def node(self, name: str, func: Callable, inputs: Union[Iterable[str], Mapping[str, Any], None] = None,
+             after: Iterable[str] = ()) -> Any:
+        """声明并求值一个节点；输入与上游节点都未变化时直接返回上次的输出"""
+        if name in self._declared:
+            raise ValueError(f"节点 {name} 在一次运行中被重复声明")
+        if isinstance(inputs, Mapping):
+            values = dict(inputs)
+        else:
+            values = {key: self._widgets.get(key) for key in (inputs or ())}
+        upstream = {}
+        for dep in after:
+            if dep not in self._declared:
+                raise ValueError(f"节点 {name} 依赖的节点 {dep} 必须先声明")
+            upstream[dep] = self._nodes[dep]
+
+        node_fingerprint = fingerprint({
+            "__func__": getattr(func, "__qualname__", repr(func)),
+            "__after__": [(dep, state.version) for dep, state in upstream.items()],
+            **{f"input:{key}": value for key, value in values.items()},
+        })
+        self._declared.append(name)
+        state = self._nodes.get(name)
+        if state is not None and state.fingerprint == node_fingerprint:
+            self.reused.append(name)
+            telemetry.note("nodes_reused", 1.0)
+            return state.output
+
+        output = func(**values, **{dep: state.output for dep, state in upstream.items()})
+        self._nodes[name] = _Node(node_fingerprint, state.version + 1 if state is not None else 1, output)
+        self.recomputed.append(name)
+        telemetry.note("nodes_recomputed", 1.0)
+        return output
+
+    def invalidate(self, name: Optional[str] = None):
+        """丢弃某个节点（或全部节点）的缓存输出，下次运行时重新计算"""
+        if name is None:
+            self._nodes.clear()
+        else:
+            self._nodes.pop(name, None)
+
+
+def make_reactive_graph(app_id: str, digest: str,
+                        get_state: Callable[[], MutableMapping[str, Any]]) -> Callable[[], ReactiveGraph]:
+    """生成注入到应用模块中的 reactive_graph()
+
+    模块会被多个会话共享，因此每次调用时才通过 get_state() 取得当前会话的状态；
+    应用源码变化（摘要不同）后，会话中旧版本的节点状态被丢弃。
+    """
+    key = f"{STATE_KEY_PREFIX}{app_id}"
+
+    def reactive_graph() -> ReactiveGraph:
+        state = get_state()
+        graph_state = state.get(key)
+        if graph_state is None or graph_state.get("digest") != digest:
+            graph_state = {"digest": digest, "nodes": {}}
+            state[key] = graph_state
+        return ReactiveGraph(graph_state["nodes"], state)
+    return reactive_graph
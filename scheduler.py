@@ -0,0 +1,167 @@
+"""应用运行的准入控制与公平调度
+
+run_app() 在执行应用前向调度器申请运行名额：管理员标记了权重的重型应用按权重
+占用有限的名额，名额不足时排队；未设置权重的应用默认权重为 0，不受准入控制。队列按会话公平排序——
+正在运行的应用越少的会话越靠前，同等情况下先到先得；队首放不下时后面的请求
+也不会插队，重型应用不会被饿死。排队超时会抛出 QueueTimeout；运行超时或被
+取消后，应用可以通过注入的 should_stop() 协作地提前结束。
+"""
+import contextlib
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MAX_CONCURRENT_RUNS = 4
+DEFAULT_QUEUE_TIMEOUT = 60
+DEFAULT_RUN_TIMEOUT = 120
+# 未设置权重的应用不占用名额
+DEFAULT_APP_WEIGHT = 0
+# 排队时刷新位置提示的间隔
+WAIT_POLL_INTERVAL = 0.5
+
+
+class QueueTimeout(Exception):
+    """排队等待超过了允许的时间"""
+
+
+class RunCancelled(Exception):
+    """排队中的运行被取消（同一会话发起了新的运行）"""
+
+
+class Ticket:
+    """一次运行申请"""
+
+    __slots__ = ("id", "app_id", "session_id", "weight", "arrival", "admitted_at", "deadline", "cancelled")
+
+    def __init__(self, ticket_id: int, app_id: str, session_id: str, weight: int):
+        self.id = ticket_id
+        self.app_id = app_id
+        self.session_id = session_id
+        self.weight = weight
+        self.arrival = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.cancelled = False
+
+    def should_stop(self) -> bool:
+        return self.cancelled or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+
+class RunScheduler:
+    """按权重分配运行名额，按会话公平排队"""
+
+    def __init__(self, capacity: int = DEFAULT_MAX_CONCURRENT_RUNS):
+        self.capacity = capacity
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._queue: List[Ticket] = []
+        self._running: Dict[int, Ticket] = {}
+        self._in_use = 0
+        self._local = threading.local()
+        self.admitted = 0
+        self.timeouts = 0
+        self.cancellations = 0
+        self.total_wait = 0.0
+
+    def configure(self, capacity: int):
+        with self._cond:
+            if capacity != self.capacity:
+                self.capacity = capacity
+                self._cond.notify_all()
+
+    def _order(self) -> List[Ticket]:
+        running_by_session: Dict[str, int] = {}
+        for ticket in self._running.values():
+            running_by_session[ticket.session_id] = running_by_session.get(ticket.session_id, 0) + 1
+        return sorted(self._queue, key=lambda t: (running_by_session.get(t.session_id, 0), t.arrival))
+
+    def _position(self, ticket: Ticket) -> int:
+        return self._order().index(ticket) + 1
+
+    def _try_admit(self, ticket: Ticket) -> bool:
+        if ticket.weight and (self._order()[0] is not ticket
+                              or self._in_use + ticket.weight > self.capacity):
+            return False
+        self._queue.remove(ticket)
+        self._running[ticket.id] = ticket
+        self._in_use += ticket.weight
+        return True
+
+    @contextlib.contextmanager
+    def admit(self, app_id: str, session_id: str, weight: int = DEFAULT_APP_WEIGHT,
+              queue_timeout: float = DEFAULT_QUEUE_TIMEOUT, run_timeout: float = DEFAULT_RUN_TIMEOUT,
+              on_wait: Optional[Callable[[int], None]] = None):
+        """申请运行名额；on_wait(位置) 在排队期间被周期性调用"""
+        weight = max(0, min(int(weight), self.capacity))
+        with self._cond:
+            ticket = Ticket(next(self._ids), app_id, session_id, weight)
+            # 同一会话的新运行取代旧的：排队中的直接取消，运行中的通过 should_stop() 通知
+            for other in itertools.chain(self._queue, self._running.values()):
+                if other.session_id == session_id:
+                    other.cancelled = True
+            self._queue.append(ticket)
+            self._cond.notify_all()
+        deadline = ticket.arrival + queue_timeout
+        try:
+            while True:
+                with self._cond:
+                    if ticket.cancelled:
+                        self.cancellations += 1
+                        raise RunCancelled()
+                    if self._try_admit(ticket):
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise QueueTimeout()
+                    position = self._position(ticket)
+                if on_wait is not None:
+                    on_wait(position)
+                with self._cond:
+                    if ticket in self._queue:
+                        self._cond.wait(min(WAIT_POLL_INTERVAL, remaining))
+        except BaseException:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+            raise
+
+        with self._cond:
+            ticket.admitted_at = time.monotonic()
+            ticket.deadline = ticket.admitted_at + run_timeout
+            self.admitted += 1
+            self.total_wait += ticket.admitted_at - ticket.arrival
+        previous = getattr(self._local, "ticket", None)
+        self._local.ticket = ticket
+        try:
+            yield ticket
+        finally:
+            self._local.ticket = previous
+            with self._cond:
+                self._running.pop(ticket.id, None)
+                self._in_use -= ticket.weight
+                self._cond.notify_all()
+
+    def should_stop(self) -> bool:
+        """当前线程的运行是否已超时或被取消（注入到应用模块中供协作式取消）"""
+        ticket = getattr(self._local, "ticket", None)
+        return ticket is not None and ticket.should_stop()
+
+    def stats(self) -> Dict:
+        """调度器当前状态与累计计数"""
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_use": self._in_use,
+                "running": len(self._running),
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "timeouts": self.timeouts,
+                "cancellations": self.cancellations,
+                "mean_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+            }
+
+
+scheduler = RunScheduler()
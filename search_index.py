@@ -0,0 +1,186 @@
+"""应用搜索的倒排索引
+
+对标题、描述（以及可选的源码）建立字符 n-gram 倒排索引，中文标题无需分词也能命中。
+标题或描述直接包含查询词的应用全部返回，按命中位置、字段和长度排序；其余候选中
+n-gram 覆盖度最高的少数几个再用 fuzzywuzzy 打分，排在直接命中之后。索引在进程内
+共享，上传、更新、删除时增量维护。
+"""
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fuzzywuzzy import fuzz
+
+NGRAM_SIZES = (1, 2, 3)
+SOURCE_WEIGHT = 0.3
+# 不直接包含查询词的候选只有覆盖了足够多的查询 n-gram 才参与模糊打分，且只取覆盖度
+# 最高的前若干个：纯 Python 的 fuzzywuzzy 每次打分约需数十微秒
+MAX_FUZZY_CANDIDATES = 30
+FUZZY_MIN_COVERAGE = 0.6
+FUZZY_MIN_SCORE = 75
+# 直接命中的基础分，保证排在模糊匹配（最高约 120 分）之前
+TITLE_MATCH_SCORE = 300
+DESCRIPTION_MATCH_SCORE = 200
+
+
+def ngrams(text: str) -> Set[str]:
+    """生成文本的字符 n-gram 集合（小写、忽略空白）"""
+    normalized = "".join(text.lower().split())
+    grams = set()
+    for n in NGRAM_SIZES:
+        for i in range(len(normalized) - n + 1):
+            grams.add(normalized[i:i + n])
+    return grams
+
+
+def match_score(query: str, text: str, base: float) -> Optional[float]:
+    """text 直接包含 query 时的得分：命中位置越靠前、文本越短越相关；不包含时返回 None"""
+    position = text.find(query)
+    if position < 0:
+        return None
+    return base + 50 * (1 - position / len(text)) + 50 * len(query) / len(text)
+
+
+class SearchIndex:
+    """按应用 ID 维护的字符 n-gram 倒排索引"""
+
+    def __init__(self, include_source: bool = False):
+        self.include_source = include_source
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._source_postings: Dict[str, Set[str]] = defaultdict(set)
+        self._docs: Dict[str, Dict] = {}
+        self._doc_grams: Dict[str, Set[str]] = {}
+        self._doc_title_grams: Dict[str, Set[str]] = {}
+        self._doc_source_grams: Dict[str, Set[str]] = {}
+        # 小写的 (标题, 描述)，直接命中判断时不必每次转换
+        self._doc_text: Dict[str, Tuple[str, str]] = {}
+        self.generation: Optional[int] = None
+
+    def rebuild(self, apps: Iterable[Dict], generation: Optional[int] = None, get_source=None):
+        """用完整的应用列表重建索引"""
+        with self._lock:
+            self._postings.clear()
+            self._source_postings.clear()
+            self._docs.clear()
+            self._doc_grams.clear()
+            self._doc_title_grams.clear()
+            self._doc_source_grams.clear()
+            self._doc_text.clear()
+            for app in apps:
+                self.add(app, get_source(app) if get_source and self.include_source else None)
+            self.generation = generation
+
+    def add(self, app: Dict, source: Optional[str] = None):
+        """加入或更新单个应用"""
+        with self._lock:
+            app_id = app["id"]
+            self.remove(app_id)
+            title = app.get("title", "")
+            description = app.get("description", "")
+            self._docs[app_id] = app
+            self._doc_text[app_id] = (title.lower(), description.lower())
+            title_grams = ngrams(title)
+            grams = title_grams | ngrams(description)
+            self._doc_title_grams[app_id] = title_grams
+            self._doc_grams[app_id] = grams
+            for gram in grams:
+                self._postings[gram].add(app_id)
+            if source is not None and self.include_source:
+                source_grams = ngrams(source)
+                self._doc_source_grams[app_id] = source_grams
+                for gram in source_grams:
+                    self._source_postings[gram].add(app_id)
+
+    def remove(self, app_id: str):
+        """从索引中移除应用"""
+        with self._lock:
+            self._docs.pop(app_id, None)
+            self._doc_text.pop(app_id, None)
+            self._doc_title_grams.pop(app_id, None)
+            for gram in self._doc_grams.pop(app_id, ()):
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings.discard(app_id)
+                    if not postings:
+                        del self._postings[gram]
+            for gram in self._doc_source_grams.pop(app_id, ()):
+                postings = self._source_postings.get(gram)
+                if postings is not None:
+                    postings.discard(app_id)
+                    if not postings:
+                        del self._source_postings[gram]
+
+    def search(self, query: str, limit: Optional[int] = None, title_only: bool = False,
+               min_score: int = FUZZY_MIN_SCORE) -> List[Dict]:
+        """返回按相关度排序的应用列表；min_score 只作用于模糊匹配"""
+        query_grams = ngrams(query)
+        if not query_grams:
+            return []
+        normalized_query = query.lower()
+        with self._lock:
+            # 候选集合：至少覆盖一半查询 n-gram 的应用
+            hits: Counter = Counter()
+            for gram in query_grams:
+                for app_id in self._postings.get(gram, ()):
+                    hits[app_id] += 1
+                if self.include_source and not title_only:
+                    for app_id in self._source_postings.get(gram, ()):
+                        hits[app_id] += SOURCE_WEIGHT
+            threshold = len(query_grams) / 2
+            fuzzy_threshold = max(threshold, len(query_grams) * FUZZY_MIN_COVERAGE)
+
+            scored, fuzzy = [], []
+            for app_id, count in hits.items():
+                if count < threshold:
+                    continue
+                if title_only:
+                    count = len(query_grams & self._doc_title_grams[app_id])
+                    if count < threshold:
+                        continue
+                title, description = self._doc_text[app_id]
+                # 直接命中只用廉价的特征排序，不做模糊打分
+                score = match_score(normalized_query, title, TITLE_MATCH_SCORE)
+                if score is None and not title_only:
+                    score = match_score(normalized_query, description, DESCRIPTION_MATCH_SCORE)
+                if score is not None:
+                    scored.append((score, self._docs[app_id]))
+                elif count >= fuzzy_threshold:
+                    fuzzy.append((count, app_id))
+
+            for count, app_id in heapq.nlargest(MAX_FUZZY_CANDIDATES, fuzzy):
+                title, description = self._doc_text[app_id]
+                score = fuzz.partial_ratio(normalized_query, title)
+                if not title_only:
+                    score = max(score, fuzz.partial_ratio(normalized_query, description) * 0.8)
+                score += 20 * count / len(query_grams)
+                if score >= min_score:
+                    scored.append((score, self._docs[app_id]))
+        scored.sort(key=lambda item: -item[0])
+        ranked = [doc for _, doc in scored]
+        return ranked[:limit] if limit else ranked
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index(apps: List[Dict], generation: int, include_source: bool = False,
+                     get_source=None) -> SearchIndex:
+    """获取进程级共享索引；配置被整体重新加载（generation 变化）时全量重建"""
+    global _index
+    with _index_lock:
+        if _index is None or _index.include_source != include_source:
+            _index = SearchIndex(include_source)
+        if _index.generation != generation:
+            _index.rebuild(apps, generation, get_source)
+        return _index
+
+
+def update_indexed_app(app: Dict, source: Optional[str] = None):
+    """更新共享索引中的单个应用（索引尚未创建时无需处理）"""
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.add(app, source)
@@ -2,6 +2,7 @@ import streamlit as st
 # 确保 set_page_config 是第一个 Streamlit 命令
 st.set_page_config(page_title="WJJ 应用集合", layout="wide")
 
+import streamlit.components.v1 as components
 from streamlit_option_menu import option_menu
 import json
 import os
@@ -10,14 +11,49 @@ from datetime import datetime
 import random
 import string
 import base64
+import copy
+import functools
+import html
 import importlib.util
 import sys
+import time
+import uuid
 from typing import Dict, List, Optional
 
+from blob_store import BLOB_DIR, blob_store, describe_source, migrate_inline_sources
+from api_server import API_MODES, DEFAULT_API_WORKERS, MODE_THREAD, start_api_server
+from app_watcher import start_app_watcher
+from app_registry import REGISTRY_BACKENDS, REGISTRY_JSON, apply_change_to_registries, get_app_registry
+from backup_store import collect_backup_files, get_backup_store
+from card_html import DEFAULT_PAGE_SIZE, card_cache
+from code_cache import code_cache
+from icon_assets import icon_assets, localize_icons
+from compute_cache import COMPUTE_CACHE_DIR, DEFAULT_DISK_MB, DEFAULT_MEMORY_MB, compute_cache
+from config_store import get_config_store
+from profiler import DEFAULT_RUNS, flamegraph_html, profiler, top_functions
+from reactive import make_reactive_graph
+from scheduler import (DEFAULT_APP_WEIGHT, DEFAULT_MAX_CONCURRENT_RUNS, DEFAULT_QUEUE_TIMEOUT,
+                       DEFAULT_RUN_TIMEOUT, QueueTimeout, RunCancelled, scheduler)
+from search_index import get_search_index
+from download_links import DEFAULT_TTL as DOWNLOAD_LINK_TTL, download_links
+from telemetry import telemetry
+from module_registry import DEFAULT_MAX_MB, DEFAULT_MAX_MODULES, module_registry
+from job_queue import (DEFAULT_JOB_WORKERS, DEFAULT_RETENTION_DAYS, JOB_DIR, JOB_STATES, job_store,
+                       make_jobs)
+from import_manifest import (fill_missing_manifests, import_status, manifest_usage,
+                             prewarm, prewarm_on_startup, scan_imports)
+from worker_pool import (DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, EXECUTION_INLINE,
+                         EXECUTION_MODES, make_offload)
+
 # 配置常量
 CONFIG_FILE = "apps_config.json"
 BACKUP_DIR = "backups"
 UPLOAD_DIR = "uploaded_apps"
+# 设置页的应用选择框与任务列表每次只列出这么多项
+PICKER_LIMIT = 50
+JOB_PAGE_SIZE = 50
+# 导出的备份归档缓存在私有目录中，只通过 HTTP 接口的临时下载链接提供
+EXPORT_DIR = "exports"
 DEFAULT_CONFIG = {
     "apps": [],
     "categories": [
@@ -25,15 +61,41 @@ DEFAULT_CONFIG = {
         {"id": "analysis", "name": "数据分析", "icon": "graph-up"},
         {"id": "tools", "name": "工具集合", "icon": "tools"},
         {"id": "simulation", "name": "仿真模拟", "icon": "pc-display"},
-    ]
+    ],
+    "settings": {
+        "worker_pool_size": DEFAULT_POOL_SIZE,
+        "worker_timeout": DEFAULT_TIMEOUT,
+        "search_include_source": False,
+        "registry_backend": REGISTRY_JSON,
+        "telemetry_memory_sample_rate": 0.05,
+        "module_cache_size": DEFAULT_MAX_MODULES,
+        "module_cache_mb": DEFAULT_MAX_MB,
+        "max_concurrent_runs": DEFAULT_MAX_CONCURRENT_RUNS,
+        "queue_timeout": DEFAULT_QUEUE_TIMEOUT,
+        "run_timeout": DEFAULT_RUN_TIMEOUT,
+        "compute_cache_memory_mb": DEFAULT_MEMORY_MB,
+        "compute_cache_disk_mb": DEFAULT_DISK_MB,
+        "home_page_size": DEFAULT_PAGE_SIZE,
+        "job_workers": DEFAULT_JOB_WORKERS,
+        "job_retention_days": DEFAULT_RETENTION_DAYS,
+        "api_port": 0,
+        "api_mode": MODE_THREAD,
+        "api_workers": DEFAULT_API_WORKERS,
+    }
 }
-ICON_LIST = [
-    "https://img.icons8.com/color/48/000000/bar-chart.png",
-    "https://img.icons8.com/color/48/000000/data-configuration.png",
-    "https://img.icons8.com/ios-filled/50/000000/electricity.png",
-    "https://img.icons8.com/color/48/000000/python.png",
-    "https://img.icons8.com/color/48/000000/code.png"
-]
+
+# 旧配置中内联的源码在解析时迁移到 blob 存储
+get_config_store(CONFIG_FILE).add_load_hook(
+    "blob_store", lambda config: migrate_inline_sources(config, blob_store)
+)
+# 已下载到本地的远程图标改写为本地引用
+get_config_store(CONFIG_FILE).add_load_hook(
+    "icon_assets", lambda config: localize_icons(config, icon_assets)
+)
+# 为缺少导入清单的应用补充清单
+get_config_store(CONFIG_FILE).add_load_hook(
+    "import_manifest", lambda config: fill_missing_manifests(config, AppManager.get_app_source)
+)
 
 # 自定义CSS样式
 st.markdown("""
@@ -57,6 +119,15 @@ st.markdown("""
         transition: all 0.3s ease;
         cursor: pointer;
     }
+    .app-icon {
+        width: 40px;
+        height: 40px;
+        margin-right: 15px;
+        flex: none;
+        background-size: contain;
+        background-repeat: no-repeat;
+        background-position: center;
+    }
     .app-card:hover {
         transform: translateY(-5px);
         box-shadow: 0 8px 15px rgba(0,0,0,0.2);
@@ -83,9 +154,20 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 class AppManager:
-    def __init__(self):
+    def __init__(self, start_services: bool = True):
         self.apps_config = self.load_apps_config()
+        self.watcher = None
+        self.api_server = None
+        if not start_services:
+            # HTTP 接口等后台调用只读取共享配置，不启动（或重启）任何后台服务
+            return
         self.initialize_if_empty()
+        prewarm_on_startup(self.apps_config)
+        self.watcher = start_app_watcher(UPLOAD_DIR, CONFIG_FILE, DEFAULT_CONFIG)
+        # 端口不为 0 时随 Streamlit 一起提供计算入口的 HTTP 接口
+        self.api_server = start_api_server(functools.partial(AppManager, start_services=False),
+                                           int(self.get_setting("api_port")),
+                                           self.get_setting("api_mode"), int(self.get_setting("api_workers")))
 
     def generate_random_id(self) -> str:
         """生成随机应用ID"""
@@ -104,21 +186,101 @@ class AppManager:
         benefits = ["提高效率", "节省时间", "优化性能", "降低成本", "提升体验"]
         return f"这是一个{random.choice(features)}的{random.choice(functions)}工具，能够{random.choice(benefits)}。"
 
-    def load_module(self, app_id: str, code: str) -> Optional[object]:
-        """加载Python模块"""
+    def get_setting(self, key: str):
+        """读取系统设置，缺失时使用默认值"""
+        return self.apps_config.get("settings", {}).get(key, DEFAULT_CONFIG["settings"][key])
+
+    def load_module(self, app_id: str, code: str, execution: str = EXECUTION_INLINE) -> Optional[object]:
+        """加载Python模块（源码未变时复用常驻模块）"""
+        try:
+            return self.compile_module(app_id, code, execution)
+        except Exception as e:
+            st.error(f"加载模块失败: {str(e)}")
+            return None
+
+    def compile_module(self, app_id: str, code: str, execution: str = EXECUTION_INLINE):
+        """编译并执行应用模块，注入平台提供的函数；失败时抛出异常（供 HTTP 接口等非界面调用）"""
         try:
+            module_registry.configure(int(self.get_setting("module_cache_size")),
+                                      int(self.get_setting("module_cache_mb")) * 1024 * 1024)
+            digest = blob_store.put(code)
+            # 注入 offload()，按应用的执行方式把计算函数路由到工作进程池
+            offload = make_offload(
+                app_id, digest, blob_store.path_for(digest), execution,
+                pool_size=self.get_setting("worker_pool_size"),
+                timeout=self.get_setting("worker_timeout"),
+            )
+            # 注入 jobs：把耗时函数提交到后台任务进程，结果按任务 ID 持久化
+            jobs = make_jobs(app_id, digest, blob_store.path_for(digest), int(self.get_setting("job_workers")))
+            module = module_registry.get(app_id, digest)
+            if module is not None:
+                module.offload = offload
+                module.should_stop = scheduler.should_stop
+                module.jobs = jobs
+                return module
+
             spec = importlib.util.spec_from_loader(
                 app_id,
                 loader=None,
                 origin=os.path.join(UPLOAD_DIR, f"{app_id}.py")
             )
             module = importlib.util.module_from_spec(spec)
+            compile_start = time.perf_counter()
+            compiled = code_cache.get_code(app_id, code, spec.origin)
+            telemetry.note("compile", time.perf_counter() - compile_start)
+            module.offload = offload
+            module.jobs = jobs
+            # 注入 should_stop()，运行超时或被取消时应用可以协作地提前结束
+            module.should_stop = scheduler.should_stop
+            # 注入 cache 装饰器：按参数与源码摘要缓存函数结果，跨会话、跨进程共享
+            compute_cache.configure(int(self.get_setting("compute_cache_memory_mb")) * 1024 * 1024,
+                                    int(self.get_setting("compute_cache_disk_mb")) * 1024 * 1024)
+            module.cache = compute_cache.decorator(app_id, digest)
+            # 注入 reactive_graph()：按会话跟踪节点输入，只重新计算受影响的节点
+            module.reactive_graph = make_reactive_graph(app_id, digest, lambda: st.session_state)
             sys.modules[app_id] = module
-            exec(code, module.__dict__)
+            exec_start = time.perf_counter()
+            exec(compiled, module.__dict__)
+            telemetry.note("exec", time.perf_counter() - exec_start)
+            module_registry.put(app_id, digest, module)
             return module
         except Exception as e:
-            st.error(f"加载模块失败: {str(e)}")
-            return None
+            sys.modules.pop(app_id, None)
+            telemetry.note("error", type(e).__name__)
+            raise
+
+    @staticmethod
+    def get_app_source(app: Dict) -> Optional[str]:
+        """按配置中记录的摘要从 blob 存储读取源码，缺失时回退到应用文件"""
+        digest = app.get("code_sha256")
+        if digest:
+            code = blob_store.get(digest)
+            if code is not None:
+                return code
+        code_file = os.path.join(UPLOAD_DIR, f"{app['id']}.py")
+        if os.path.exists(code_file):
+            with open(code_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        return None
+
+    def sync_sources_from_files(self) -> bool:
+        """用应用文件的内容刷新 blob 存储与配置中的摘要，返回配置是否有改动"""
+        changed = False
+        for app in list(self.apps_config["apps"]):
+            code_file = os.path.join(UPLOAD_DIR, f"{app['id']}.py")
+            if not os.path.exists(code_file):
+                continue
+            with open(code_file, 'r', encoding='utf-8') as f:
+                code = f.read()
+            digest = blob_store.put(code)
+            if app.get("code_sha256") != digest:
+                # 共享配置只通过变更日志修改，后台压缩线程可能正在序列化它
+                updated = dict(app)
+                updated["code_sha256"] = digest
+                updated.update(describe_source(code))
+                self.record_config_change({"op": "upsert_app", "app": updated})
+                changed = True
+        return changed
 
     def delete_app(self, app_id: str) -> bool:
         """删除应用及其相关文件"""
@@ -127,18 +289,17 @@ class AppManager:
             app_file = os.path.join(UPLOAD_DIR, f"{app_id}.py")
             if os.path.exists(app_file):
                 os.remove(app_file)
-            
-            # 从配置中移除应用
-            self.apps_config["apps"] = [
-                app for app in self.apps_config["apps"] 
-                if app["id"] != app_id
-            ]
+            code_cache.invalidate(app_id)
+            compute_cache.invalidate(app_id)
+            profiler.clear(app_id)
+            job_store.remove(app_id)
             
             # 从系统模块中移除
-            if app_id in sys.modules:
-                del sys.modules[app_id]
+            module_registry.discard(app_id)
             
-            self.save_apps_config()
+            # 从配置中移除应用
+            self.record_config_change({"op": "delete_app", "id": app_id})
+            self.get_search_index().remove(app_id)
             return True
         except Exception as e:
             st.error(f"删除应用失败: {str(e)}")
@@ -156,9 +317,18 @@ class AppManager:
             if os.path.exists(UPLOAD_DIR):
                 shutil.rmtree(UPLOAD_DIR)
             os.makedirs(UPLOAD_DIR)
+            if os.path.exists(BLOB_DIR):
+                shutil.rmtree(BLOB_DIR)
+            blob_store.clear()
+            if os.path.exists(COMPUTE_CACHE_DIR):
+                shutil.rmtree(COMPUTE_CACHE_DIR)
+            for app_id in profiler.profiled_apps():
+                profiler.clear(app_id)
+            if os.path.exists(JOB_DIR):
+                shutil.rmtree(JOB_DIR)
 
             # 重置配置文件
-            self.apps_config = DEFAULT_CONFIG.copy()
+            self.apps_config = copy.deepcopy(DEFAULT_CONFIG)
             self.save_apps_config()
             return True
         except Exception as e:
@@ -166,45 +336,73 @@ class AppManager:
             return False
 
     def load_apps_config(self) -> Dict:
-        """加载应用配置"""
+        """加载应用配置（进程内共享缓存，文件变化时才重新解析）"""
         try:
-            if os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            return get_config_store(CONFIG_FILE).get(DEFAULT_CONFIG)
         except Exception as e:
             st.error(f"加载配置文件失败: {str(e)}")
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
 
     def save_apps_config(self) -> bool:
         """保存应用配置"""
         try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.apps_config, f, ensure_ascii=False, indent=4)
+            get_config_store(CONFIG_FILE).save(self.apps_config)
+            return True
+        except Exception as e:
+            st.error(f"保存配置文件失败: {str(e)}")
+            return False
+
+    def record_config_change(self, change: Dict) -> bool:
+        """向配置变更日志追加一条记录（只写入变更本身，不重写整个配置文件）"""
+        try:
+            self.apps_config = get_config_store(CONFIG_FILE).record(change)
+            # 同步到所有已创建的注册表，切换后端时不会读到过期数据
+            apply_change_to_registries(change)
             return True
         except Exception as e:
             st.error(f"保存配置文件失败: {str(e)}")
             return False
 
+    def get_registry(self):
+        """获取与当前配置同步的应用注册表（按设置使用内存索引或 SQLite）"""
+        return get_app_registry(
+            self.get_setting("registry_backend"),
+            self.apps_config["apps"],
+            get_config_store(CONFIG_FILE).load_generation,
+        )
+
+    def get_app(self, app_id: str) -> Optional[Dict]:
+        """按 ID 查找应用"""
+        return self.get_registry().get(app_id)
+
+    def app_title(self, app_id: str) -> str:
+        """应用标题（通过注册表按 ID 查询，找不到时返回 ID）"""
+        app = self.get_app(app_id)
+        return app["title"] if app else app_id
+
+    def get_app_by_title(self, title: str) -> Optional[Dict]:
+        """按标题查找应用"""
+        return self.get_registry().get_by_title(title)
+
     def get_apps_by_category(self, category_id: str) -> List[Dict]:
         """获取指定分类的应用列表"""
-        return [app for app in self.apps_config["apps"] if app.get("category", "default") == category_id]
-
-    def render_app_card(self, app: Dict, run_callback):
-        """渲染应用卡片"""
-        with st.container():
-            card_html = f'''
-            <div class="app-card" onclick="/">
-                <div style="display: flex; align-items: center;">
-                    <img src="{app['icon']}" style="width: 40px; height: 40px; margin-right: 15px;">
-                    <div>
-                        <h3 style="margin: 0;">{app['title']}</h3>
-                        <p style="margin: 5px 0 0 0; color: #666;">{app['description']}</p>
-                    </div>
-                </div>
-            </div>
-            '''
-            if st.markdown(card_html, unsafe_allow_html=True):
-                run_callback(app["id"])
+        return self.get_registry().by_category(category_id)
+
+    def get_search_index(self):
+        """获取共享的搜索索引（配置被整体重新加载时自动重建）"""
+        return get_search_index(
+            self.apps_config["apps"],
+            get_config_store(CONFIG_FILE).load_generation,
+            include_source=self.get_setting("search_include_source"),
+            get_source=self.get_app_source,
+        )
+
+    def search_apps_by_category(self, query: str, title_only: bool = False) -> Dict[str, List[Dict]]:
+        """搜索应用，按分类分组并保持相关度顺序"""
+        grouped: Dict[str, List[Dict]] = {}
+        for app in self.get_search_index().search(query, title_only=title_only):
+            grouped.setdefault(app.get("category", "default"), []).append(app)
+        return grouped
 
     def render_app_details_compact(self):
         """渲染应用详情列表"""
@@ -213,23 +411,38 @@ class AppManager:
         # 搜索框
         search_query = st.text_input("🔍 搜索应用", key="search_apps")
         
-        # 按分类显示应用
+        # 如果有搜索查询，通过索引检索并按相关度排序
+        search_results = self.search_apps_by_category(search_query) if search_query else None
+        page_size = self.get_setting("home_page_size")
+        
+        sections = []
         for category in self.apps_config["categories"]:
-            apps_in_category = self.get_apps_by_category(category["id"])
-            
-            # 如果有搜索查询，过滤应用
-            if search_query:
-                apps_in_category = [
-                    app for app in apps_in_category
-                    if search_query.lower() in app["title"].lower() or 
-                       search_query.lower() in app["description"].lower()
-                ]
-            
+            if search_results is not None:
+                apps_in_category = search_results.get(category["id"], [])
+            else:
+                apps_in_category = self.get_apps_by_category(category["id"])
             if apps_in_category:
-                with st.container():
-                    st.markdown(f"### {category['name']}")
-                    for app in apps_in_category:
-                        self.render_app_card(app, self.run_app)
+                visible_key = f"home_visible_{category['id']}"
+                sections.append((category, apps_in_category, visible_key,
+                                 st.session_state.get(visible_key, page_size)))
+
+        # 本页用到的图标以内联样式输出一次，卡片只引用 CSS 类
+        st.markdown(icon_assets.stylesheet(app.get("icon", "") for _, apps_in_category, _, visible in sections
+                                           for app in apps_in_category[:visible]),
+                    unsafe_allow_html=True)
+
+        # 按分类显示应用：每个分类只输出一个 markdown 块，大分类分批加载
+        for category, apps_in_category, visible_key, visible in sections:
+            with st.container():
+                st.markdown(
+                    f"### {html.escape(category['name'])}\n\n{card_cache.block(apps_in_category[:visible])}",
+                    unsafe_allow_html=True,
+                )
+                remaining = len(apps_in_category) - visible
+                if remaining > 0:
+                    if st.button(f"加载更多（还有 {remaining} 个）", key=f"more_{category['id']}"):
+                        st.session_state[visible_key] = visible + page_size
+                        st.experimental_rerun()
 
     def render_navigation(self):
         """渲染导航栏"""
@@ -240,16 +453,15 @@ class AppManager:
             menu_items = ["主页", "设置"]
             icons = ["house", "gear"]
             
+            # 搜索过滤
+            search_results = self.search_apps_by_category(search_query, title_only=True) if search_query else None
+            
             # 按分类组织应用
             for category in self.apps_config["categories"]:
-                apps_in_category = self.get_apps_by_category(category["id"])
-                
-                # 搜索过滤
-                if search_query:
-                    apps_in_category = [
-                        app for app in apps_in_category
-                        if search_query.lower() in app["title"].lower()
-                    ]
+                if search_results is not None:
+                    apps_in_category = search_results.get(category["id"], [])
+                else:
+                    apps_in_category = self.get_apps_by_category(category["id"])
                 
                 if apps_in_category:
                     st.markdown(f"### {category['name']}")
@@ -271,7 +483,8 @@ class AppManager:
         """渲染设置界面"""
         st.markdown("## ⚙️ 系统设置")
         
-        tabs = st.tabs(["📱 应用管理", "📂 分类管理", "💾 备份管理", "⬆️ 上传新应用", "🔄 系统重置"])
+        tabs = st.tabs(["📱 应用管理", "📂 分类管理", "💾 备份管理", "⬆️ 上传新应用", "🚀 执行与性能",
+                        "📊 性能监控", "🔄 系统重置"])
 
         # 应用管理标签页
         with tabs[0]:
@@ -289,10 +502,342 @@ class AppManager:
         with tabs[3]:
             self.render_upload_form()
 
-        # 系统重置标签页
+        # 执行与性能标签页
         with tabs[4]:
+            self.render_execution_settings()
+
+        # 性能监控标签页：Streamlit 每次重跑都会执行所有标签页，监控数据按需加载
+        with tabs[5]:
+            if st.checkbox("加载性能监控", key="show_performance_monitor"):
+                self.render_performance_monitor()
+            else:
+                st.caption("勾选后显示运行统计、常驻模块和采样分析")
+
+        # 系统重置标签页
+        with tabs[6]:
             self.render_system_reset()
 
+    def render_performance_monitor(self):
+        """渲染应用性能监控界面"""
+        st.markdown("### 📊 性能监控")
+
+        summary = telemetry.summary()
+        resident = module_registry.stats()
+        # 只查询表格中出现的应用标题
+        titles = {app_id: self.app_title(app_id)
+                  for app_id in {row["app_id"] for row in summary} | {row["app_id"] for row in resident}}
+        if summary:
+            st.dataframe([{
+                "应用": titles.get(row["app_id"], row["app_id"]),
+                "运行次数": row["runs"],
+                "会话数": row["sessions"],
+                "异常次数": row["errors"],
+                "耗时 p50 (ms)": round(row["wall_p50"] * 1000, 1),
+                "耗时 p95 (ms)": round(row["wall_p95"] * 1000, 1),
+                "耗时 p99 (ms)": round(row["wall_p99"] * 1000, 1),
+                "CPU p50 (ms)": round(row["cpu_p50"] * 1000, 1),
+                "CPU p95 (ms)": round(row["cpu_p95"] * 1000, 1),
+                "平均编译 (ms)": round(row["compile_mean"] * 1000, 2),
+                "最大内存增量 (MB)": round(row["peak_mem_max"] / 1024 / 1024, 1) if row["peak_mem_max"] else None,
+            } for row in summary], use_container_width=True)
+
+            with st.expander("最近的运行记录"):
+                app_ids = [row["app_id"] for row in summary]
+                selected = st.selectbox("应用", app_ids, format_func=lambda x: titles.get(x, x),
+                                        key="telemetry_app")
+                st.dataframe(telemetry.records(selected)[-100:][::-1], use_container_width=True)
+        else:
+            st.info("📝 暂无运行记录")
+
+        scheduler_stats = scheduler.stats()
+        st.caption(f"运行名额：{scheduler_stats['in_use']}/{scheduler_stats['capacity']}　"
+                   f"运行中 {scheduler_stats['running']}　排队 {scheduler_stats['queued']}　"
+                   f"平均排队 {scheduler_stats['mean_wait'] * 1000:.0f} ms　"
+                   f"排队超时 {scheduler_stats['timeouts']} 次　取消 {scheduler_stats['cancellations']} 次")
+
+        cache_stats = compute_cache.stats()
+        disk_mb = "—" if cache_stats["disk_bytes"] is None else f"{cache_stats['disk_bytes'] / 1024 / 1024:.1f} MB"
+        st.caption(f"计算缓存：内存命中 {cache_stats['memory_hits']}　磁盘命中 {cache_stats['disk_hits']}　"
+                   f"未命中 {cache_stats['misses']}　未缓存 {cache_stats['bypasses']}　"
+                   f"内存 {cache_stats['memory_bytes'] / 1024 / 1024:.1f} MB（{cache_stats['memory_entries']} 项）　"
+                   f"磁盘 {disk_mb}")
+        card_stats = card_cache.stats()
+        st.caption(f"卡片缓存：{card_stats['cards']} 张　命中 {card_stats['hits']}　生成 {card_stats['misses']}")
+
+        st.markdown("#### 🧠 常驻模块")
+        if resident:
+            st.caption(f"共 {len(resident)} 个模块，估算占用 {module_registry.total_bytes() / 1024 / 1024:.1f} MB，"
+                       f"累计淘汰 {module_registry.evictions} 次")
+            st.dataframe([{
+                "应用": titles.get(row["app_id"], row["app_id"]),
+                "估算内存 (MB)": round(row["size"] / 1024 / 1024, 2),
+                "复用次数": row["hits"],
+                "加载时间": datetime.fromtimestamp(row["loaded_at"]).strftime('%Y-%m-%d %H:%M:%S'),
+                "最近使用": datetime.fromtimestamp(row["last_used"]).strftime('%Y-%m-%d %H:%M:%S'),
+            } for row in resident], use_container_width=True)
+        else:
+            st.info("📝 暂无常驻模块")
+
+        if st.checkbox("显示采样分析", key="show_profiler"):
+            self.render_profiler()
+
+        col1, col2 = st.columns(2)
+        with col1:
+            sample_rate = st.number_input("内存采样比例", min_value=0.0, max_value=1.0, step=0.01,
+                                          value=float(self.get_setting("telemetry_memory_sample_rate")),
+                                          help="按此比例对运行统计内存增量（进程开启 tracemalloc 时为分配峰值，否则为 RSS 增长）",
+                                          key="telemetry_memory_sample_rate")
+            if st.button("保存采样设置", key="save_telemetry_settings"):
+                if self.record_config_change({"op": "update_settings", "settings": {
+                    "telemetry_memory_sample_rate": float(sample_rate),
+                }}):
+                    st.success("✅ 设置已保存！")
+        with col2:
+            if st.button("立即写入遥测文件", key="flush_telemetry"):
+                telemetry.flush()
+                st.success("✅ 已写入")
+
+    def render_profiler(self):
+        """渲染采样分析：开启采样、火焰图与热点函数"""
+        st.markdown("#### 🔥 采样分析")
+        # 选择框只列出搜索结果（未输入时为前几个应用），不展开整个应用目录
+        query = st.text_input("搜索要采样的应用", key="profile_query")
+        candidates = (self.get_search_index().search(query, limit=PICKER_LIMIT, title_only=True) if query
+                      else self.get_registry().page(0, PICKER_LIMIT))
+        titles = {app["id"]: app["title"] for app in candidates}
+        armed = profiler.armed()
+        profiled = profiler.profiled_apps()
+        for app_id in list(armed) + profiled:
+            if app_id not in titles:
+                titles[app_id] = self.app_title(app_id)
+        if not candidates:
+            st.info("📝 没有匹配的应用")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            target = st.selectbox("应用", [app["id"] for app in candidates], format_func=titles.get,
+                                  key="profile_app")
+        with col2:
+            runs = st.number_input("采样的运行次数", min_value=1, max_value=1000, value=DEFAULT_RUNS,
+                                   key="profile_runs")
+        with col3:
+            interval_ms = st.number_input("采样间隔（毫秒）", min_value=1, max_value=1000, value=5,
+                                          key="profile_interval")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("开启采样", key="arm_profiler", disabled=target is None):
+                profiler.arm(target, int(runs), interval_ms / 1000)
+                st.success(f"✅ {titles[target]} 接下来的 {int(runs)} 次运行将被采样")
+        with col2:
+            if st.button("取消采样", key="disarm_profiler", disabled=target is None):
+                profiler.arm(target, 0)
+        armed = profiler.armed()
+        if armed:
+            st.caption("等待采样：" + "　".join(f"{titles.get(app_id, app_id)} 剩余 {count} 次"
+                                              for app_id, count in armed.items()))
+
+        if not profiled:
+            st.info("📝 暂无采样结果")
+            return
+        selected = st.selectbox("查看结果", profiled, format_func=titles.get, key="profile_view")
+        stacks = profiler.stacks(selected)
+        st.caption(f"已采样 {profiler.runs(selected)} 次运行，共 {sum(stacks.values())} 个样本")
+        if stacks:
+            components.html(flamegraph_html(stacks, titles[selected]), height=420, scrolling=True)
+            st.dataframe([{
+                "函数": row["function"],
+                "自身样本": row["self"],
+                "自身占比 (%)": round(row["self_pct"], 1),
+                "总样本": row["total"],
+                "总占比 (%)": round(row["total_pct"], 1),
+            } for row in top_functions(stacks)], use_container_width=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button("下载 collapsed stacks", profiler.folded(selected),
+                               file_name=f"{selected}.folded", key="download_folded")
+        with col2:
+            st.download_button("下载火焰图 HTML", flamegraph_html(stacks, titles[selected]),
+                               file_name=f"{selected}_flamegraph.html", mime="text/html", key="download_flamegraph")
+        with col3:
+            if st.button("清除结果", key="clear_profile"):
+                profiler.clear(selected)
+                st.experimental_rerun()
+
+    def render_execution_settings(self):
+        """渲染执行与性能设置界面"""
+        st.markdown("### 🚀 执行与性能")
+        st.caption("执行方式设为“工作进程池执行”的应用，通过 offload(func, *args) 调用的模块级函数会在预启动的工作进程中运行。")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            pool_size = st.number_input("工作进程数", min_value=1, max_value=64,
+                                        value=int(self.get_setting("worker_pool_size")),
+                                        key="worker_pool_size")
+        with col2:
+            timeout = st.number_input("单次计算超时（秒）", min_value=1, max_value=3600,
+                                      value=int(self.get_setting("worker_timeout")),
+                                      key="worker_timeout")
+        col1, col2 = st.columns(2)
+        with col1:
+            module_cache_size = st.number_input("常驻模块数上限", min_value=1, max_value=10000,
+                                                value=int(self.get_setting("module_cache_size")),
+                                                key="module_cache_size")
+        with col2:
+            module_cache_mb = st.number_input("常驻模块内存上限（MB）", min_value=16, max_value=65536,
+                                              value=int(self.get_setting("module_cache_mb")),
+                                              key="module_cache_mb")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            max_concurrent_runs = st.number_input("并发运行名额", min_value=1, max_value=256,
+                                                  value=int(self.get_setting("max_concurrent_runs")),
+                                                  help="设置了资源权重的应用运行时按权重占用名额",
+                                                  key="max_concurrent_runs")
+        with col2:
+            queue_timeout = st.number_input("排队超时（秒）", min_value=1, max_value=3600,
+                                            value=int(self.get_setting("queue_timeout")),
+                                            key="queue_timeout")
+        with col3:
+            run_timeout = st.number_input("运行超时（秒）", min_value=1, max_value=86400,
+                                          value=int(self.get_setting("run_timeout")),
+                                          help="超时后应用中的 should_stop() 返回 True",
+                                          key="run_timeout")
+        st.caption("准入控制需要按应用开启：只有在应用管理中把“资源权重”设为大于 0 的应用才会排队和占用名额，"
+                   "未设置权重的应用（默认 0）直接运行，负载高时它们的延迟不受名额限制。")
+        col1, col2 = st.columns(2)
+        with col1:
+            compute_cache_memory_mb = st.number_input("计算缓存内存上限（MB）", min_value=16, max_value=65536,
+                                                      value=int(self.get_setting("compute_cache_memory_mb")),
+                                                      help="应用中用 @cache 装饰的函数结果",
+                                                      key="compute_cache_memory_mb")
+        with col2:
+            compute_cache_disk_mb = st.number_input("计算缓存磁盘上限（MB）", min_value=16, max_value=1048576,
+                                                    value=int(self.get_setting("compute_cache_disk_mb")),
+                                                    key="compute_cache_disk_mb")
+        col1, col2 = st.columns(2)
+        with col1:
+            job_workers = st.number_input("后台任务进程数", min_value=1, max_value=64,
+                                          value=int(self.get_setting("job_workers")),
+                                          help="应用通过 jobs.submit() 提交的任务在这些进程中执行",
+                                          key="job_workers")
+        with col2:
+            job_retention_days = st.number_input("任务结果保留天数", min_value=1, max_value=3650,
+                                                 value=int(self.get_setting("job_retention_days")),
+                                                 key="job_retention_days")
+
+        home_page_size = st.number_input("主页每个分类首次显示的应用数", min_value=5, max_value=10000,
+                                         value=int(self.get_setting("home_page_size")),
+                                         help="超出部分通过“加载更多”分批显示",
+                                         key="home_page_size")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            api_port = st.number_input("HTTP 接口端口", min_value=0, max_value=65535,
+                                       value=int(self.get_setting("api_port")),
+                                       help="0 表示不启动；应用中的 compute(**params) 可通过 POST /apps/<应用ID>/compute 调用",
+                                       key="api_port")
+        with col2:
+            api_modes = list(API_MODES)
+            api_mode = st.selectbox("HTTP 接口执行方式", api_modes,
+                                    index=api_modes.index(self.get_setting("api_mode")),
+                                    format_func=API_MODES.get, key="api_mode")
+        with col3:
+            api_workers = st.number_input("HTTP 接口线程数", min_value=1, max_value=256,
+                                          value=int(self.get_setting("api_workers")),
+                                          key="api_workers")
+        include_source = st.checkbox("搜索时包含应用源码", value=bool(self.get_setting("search_include_source")),
+                                     key="search_include_source")
+        registry_backends = list(REGISTRY_BACKENDS)
+        registry_backend = st.selectbox("应用注册表", registry_backends,
+                                        index=registry_backends.index(self.get_setting("registry_backend")),
+                                        format_func=REGISTRY_BACKENDS.get,
+                                        key="registry_backend")
+
+        if st.button("保存执行设置", key="save_execution_settings"):
+            if self.record_config_change({"op": "update_settings", "settings": {
+                "worker_pool_size": int(pool_size),
+                "worker_timeout": int(timeout),
+                "module_cache_size": int(module_cache_size),
+                "module_cache_mb": int(module_cache_mb),
+                "max_concurrent_runs": int(max_concurrent_runs),
+                "queue_timeout": int(queue_timeout),
+                "run_timeout": int(run_timeout),
+                "compute_cache_memory_mb": int(compute_cache_memory_mb),
+                "compute_cache_disk_mb": int(compute_cache_disk_mb),
+                "job_workers": int(job_workers),
+                "job_retention_days": int(job_retention_days),
+                "api_port": int(api_port),
+                "api_mode": api_mode,
+                "api_workers": int(api_workers),
+                "home_page_size": int(home_page_size),
+                "search_include_source": include_source,
+                "registry_backend": registry_backend,
+            }}):
+                st.success("✅ 设置已保存！")
+
+        if self.api_server is not None:
+            api_status = self.api_server.status()
+            if api_status["error"]:
+                st.error(f"HTTP 接口启动失败: {api_status['error']}")
+            else:
+                st.caption(f"HTTP 接口：http://{api_status['host']}:{api_status['port']}　"
+                           f"{API_MODES.get(api_status['mode'], api_status['mode'])}　"
+                           f"已处理 {api_status['requests']} 个请求，失败 {api_status['errors']} 个")
+
+        st.markdown("#### 🗂️ 后台任务")
+        # 分页读取：只解析当前页任务的状态文件
+        job_page = max(1, int(st.session_state.get("job_page", 1)))
+        total_jobs, jobs = job_store.page_jobs((job_page - 1) * JOB_PAGE_SIZE, JOB_PAGE_SIZE)
+        job_page_count = max(1, (total_jobs + JOB_PAGE_SIZE - 1) // JOB_PAGE_SIZE)
+        if job_page > job_page_count:
+            # 任务被清理后页数变少
+            job_page = st.session_state["job_page"] = job_page_count
+            total_jobs, jobs = job_store.page_jobs((job_page - 1) * JOB_PAGE_SIZE, JOB_PAGE_SIZE)
+        if total_jobs:
+            st.number_input("任务列表页码", min_value=1, max_value=job_page_count, key="job_page")
+            st.caption(f"共 {total_jobs} 个任务，按最近更新排序")
+            st.dataframe([{
+                "应用": self.app_title(job["app_id"]),
+                "函数": job.get("function", ""),
+                "状态": JOB_STATES.get(job.get("state"), job.get("state")),
+                "进度 (%)": round(job.get("progress", 0.0) * 100),
+                "说明": job.get("error") or job.get("message", ""),
+                "提交时间": datetime.fromtimestamp(job["submitted_at"]).strftime('%Y-%m-%d %H:%M:%S')
+                if job.get("submitted_at") else "",
+                "任务 ID": job["job_id"],
+            } for job in jobs], use_container_width=True)
+        else:
+            st.info("📝 暂无后台任务")
+        if st.button("清理过期的任务结果", key="prune_jobs"):
+            removed = job_store.prune(self.get_setting("job_retention_days"))
+            st.success(f"✅ 已清理 {removed} 个任务")
+
+        st.markdown("#### 📦 导入清单与预热")
+        # 一次遍历得到每个模块的使用次数
+        modules = manifest_usage(self.apps_config)
+        if modules:
+            status_names = {"pending": "等待预热", "loaded": "已预热", "cached": "启动前已加载", "failed": "导入失败"}
+            rows = []
+            for module_name, app_count in modules.items():
+                status = import_status.get(module_name, {})
+                rows.append({
+                    "模块": module_name,
+                    "使用的应用数": app_count,
+                    "状态": status_names.get(status.get("status"), "未预热"),
+                    "导入耗时 (ms)": round(status.get("seconds", 0.0) * 1000, 1),
+                    "错误": status.get("error", ""),
+                })
+            st.dataframe(rows, use_container_width=True)
+        else:
+            st.info("📝 暂无导入清单")
+
+        st.markdown("#### 👀 应用文件监视")
+        watcher_status = self.watcher.status()
+        backend_names = {"watchdog": "系统文件通知（watchdog）", "polling": "后台轮询"}
+        st.caption(f"监视方式：{backend_names.get(watcher_status['backend'], watcher_status['backend'])}"
+                   f"　已热重载 {watcher_status['reloads']} 次"
+                   + (f"　最近：{watcher_status['last_reload']}" if watcher_status["last_reload"] else ""))
+        for name, error in watcher_status["errors"].items():
+            st.warning(f"{name}: {error}")
+
     def render_system_reset(self):
         """渲染系统重置界面"""
         st.markdown("### 🔄 系统重置")
@@ -314,11 +859,12 @@ class AppManager:
                 new_icon = st.text_input("分类图标", category["icon"], key=f"cat_icon_{category['id']}")
                 
                 if st.button("更新", key=f"update_cat_{category['id']}"):
-                    category.update({
+                    # 在副本上修改后记录变更，不直接改动共享的配置对象
+                    self.record_config_change({"op": "upsert_category", "category": {
+                        **category,
                         "name": new_name,
                         "icon": new_icon
-                    })
-                    self.save_apps_config()
+                    }})
                     st.success("✅ 更新成功！")
                     st.experimental_rerun()
         
@@ -329,72 +875,135 @@ class AppManager:
         new_cat_icon = st.text_input("分类图标", key="new_cat_icon")
         
         if st.button("添加分类"):
-            self.apps_config["categories"].append({
+            self.record_config_change({"op": "upsert_category", "category": {
                 "id": new_cat_id,
                 "name": new_cat_name,
                 "icon": new_cat_icon
-            })
-            self.save_apps_config()
+            }})
             st.success("✅ 添加成功！")
             st.experimental_rerun()
 
     def render_app_management(self):
         """渲染应用管理界面"""
         st.markdown("### 📱 应用管理")
+        cache_stats = code_cache.stats()
+        st.caption(
+            f"编译缓存：内存命中 {cache_stats['memory_hits']} · 磁盘命中 {cache_stats['disk_hits']} · "
+            f"未命中 {cache_stats['misses']} · 缓存条目 {cache_stats['entries']}"
+        )
         
-        # 按分类显示应用
-        for category in self.apps_config["categories"]:
-            apps_in_category = self.get_apps_by_category(category["id"])
-            if apps_in_category:
-                st.markdown(f"#### {category['name']}")
-                for app in apps_in_category:
-                    with st.expander(f"{app['title']}"):
-                        new_title = st.text_input("应用标题", app["title"], key=f"title_{app['id']}")
-                        new_desc = st.text_area("应用描述", app["description"], key=f"desc_{app['id']}")
-                        new_icon = st.selectbox("图标", ICON_LIST, 
-                                              index=ICON_LIST.index(app["icon"]) if app["icon"] in ICON_LIST else 0,
-                                              key=f"icon_{app['id']}")
-                        new_category = st.selectbox("分类", 
-                                                  [cat["id"] for cat in self.apps_config["categories"]],
-                                                  index=[cat["id"] for cat in self.apps_config["categories"]].index(app.get("category", "default")),
-                                                  format_func=lambda x: next((cat["name"] for cat in self.apps_config["categories"] if cat["id"] == x), x),
-                                                  key=f"cat_{app['id']}")
-                        
-                        code_file = os.path.join(UPLOAD_DIR, f"{app['id']}.py")
-                        try:
-                            with open(code_file, 'r', encoding='utf-8') as f:
-                                current_code = f.read()
-                        except Exception:
-                            current_code = app.get("code", "")
-                        
-                        new_code = st.text_area("应用代码", current_code, height=200, key=f"code_{app['id']}")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if st.button("更新", key=f"update_{app['id']}"):
-                                try:
-                                    app.update({
-                                        "title": new_title,
-                                        "description": new_desc,
-                                        "icon": new_icon,
-                                        "category": new_category,
-                                        "code": new_code
-                                    })
-                                    
-                                    with open(code_file, 'w', encoding='utf-8') as f:
-                                        f.write(new_code)
-                                    
-                                    self.save_apps_config()
-                                    st.success("✅ 更新成功！")
-                                    st.experimental_rerun()
-                                except Exception as e:
-                                    st.error(f"更新失败: {str(e)}")
+        # 筛选与分页：只渲染当前页的应用，源码仅在展开编辑时读取
+        category_names = {cat["id"]: cat["name"] for cat in self.apps_config["categories"]}
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            filter_category = st.selectbox("按分类筛选", ["__all__"] + list(category_names),
+                                           format_func=lambda x: "全部分类" if x == "__all__" else category_names.get(x, x),
+                                           key="manage_filter_category")
+        registry = self.get_registry()
+        total = registry.count(None if filter_category == "__all__" else filter_category)
+        with col2:
+            page_size = st.selectbox("每页数量", [10, 20, 50, 100], key="manage_page_size")
+        page_count = max(1, (total + page_size - 1) // page_size)
+        with col3:
+            page = st.number_input("页码", min_value=1, max_value=page_count, value=1, key="manage_page")
+        st.caption(f"共 {total} 个应用，第 {page}/{page_count} 页")
+
+        offset = (page - 1) * page_size
+        if filter_category == "__all__":
+            apps = registry.page(offset, page_size)
+        else:
+            apps = registry.by_category(filter_category, offset, page_size)
+        for app in apps:
+            self.render_app_editor(app, category_names)
+
+    def render_app_editor(self, app: Dict, category_names: Dict[str, str]):
+        """渲染单个应用的编辑面板"""
+        with st.expander(f"{app['title']} · {category_names.get(app.get('category', 'default'), '未分类')}"):
+            code_file = os.path.join(UPLOAD_DIR, f"{app['id']}.py")
+            size = app.get("code_size")
+            updated_at = app.get("updated_at")
+            if size is None and os.path.exists(code_file):
+                file_stat = os.stat(code_file)
+                size = file_stat.st_size
+                updated_at = datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+            st.caption(
+                f"ID：{app['id']} · 大小：{(size or 0) / 1024:.1f} KB · "
+                f"行数：{app.get('code_lines', '—')} · 最后修改：{updated_at or '—'}"
+            )
+
+            new_title = st.text_input("应用标题", app["title"], key=f"title_{app['id']}")
+            new_desc = st.text_area("应用描述", app["description"], key=f"desc_{app['id']}")
+            icon_choices = icon_assets.choices()
+            current_icon = icon_assets.localize(app["icon"])
+            new_icon = st.selectbox("图标", icon_choices, 
+                                  index=icon_choices.index(current_icon) if current_icon in icon_choices else 0,
+                                  key=f"icon_{app['id']}")
+            new_category = st.selectbox("分类", 
+                                      list(category_names),
+                                      index=list(category_names).index(app.get("category", "default")),
+                                      format_func=lambda x: category_names.get(x, x),
+                                      key=f"cat_{app['id']}")
+            execution_modes = list(EXECUTION_MODES)
+            new_execution = st.selectbox("执行方式", execution_modes,
+                                         index=execution_modes.index(app.get("execution", EXECUTION_INLINE)),
+                                         format_func=EXECUTION_MODES.get,
+                                         key=f"exec_{app['id']}")
+            new_weight = st.number_input("资源权重", min_value=0, max_value=256, value=int(app.get("weight", DEFAULT_APP_WEIGHT)),
+                                         help="重型应用运行时占用的并发名额，0 表示不受准入控制",
+                                         key=f"weight_{app['id']}")
+            
+            # 只有勾选编辑时才读取源码
+            current_code = None
+            new_code = None
+            if st.checkbox("编辑代码", key=f"edit_code_{app['id']}"):
+                try:
+                    current_code = self.get_app_source(app) or ""
+                except Exception:
+                    current_code = ""
+                new_code = st.text_area("应用代码", current_code, height=200, key=f"code_{app['id']}")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("更新", key=f"update_{app['id']}"):
+                    try:
+                        # 在副本上修改后记录变更，不直接改动共享的配置对象
+                        updated = dict(app)
+                        updated.update({
+                            "title": new_title,
+                            "description": new_desc,
+                            "icon": new_icon,
+                            "category": new_category,
+                            "execution": new_execution,
+                            "weight": int(new_weight),
+                        })
+                        if new_code is not None and new_code != current_code:
+                            updated.update({
+                                "code_sha256": blob_store.put(new_code),
+                                "imports": scan_imports(new_code),
+                                **describe_source(new_code),
+                            })
+                            prewarm(updated["imports"])
+                            
+                            with open(code_file, 'w', encoding='utf-8') as f:
+                                f.write(new_code)
+                            code_cache.invalidate(app["id"], old_code=current_code)
+                            module_registry.discard(app["id"])
+                        search_index = self.get_search_index()
+                        if new_code is None and search_index.include_source:
+                            new_code = self.get_app_source(updated)
+                        search_index.add(updated, new_code)
                         
-                        with col2:
-                            if st.button("删除", key=f"delete_{app['id']}", type="primary"):
-                                if self.delete_app(app["id"]):
-                                    st.success("✅ 删除成功！")
-                                    st.experimental_rerun()
+                        self.record_config_change({"op": "upsert_app", "app": updated})
+                        st.success("✅ 更新成功！")
+                        st.experimental_rerun()
+                    except Exception as e:
+                        st.error(f"更新失败: {str(e)}")
+            
+            with col2:
+                if st.button("删除", key=f"delete_{app['id']}", type="primary"):
+                    if self.delete_app(app["id"]):
+                        st.success("✅ 删除成功！")
+                        st.experimental_rerun()
 
     def render_backup_management(self):
         """渲染备份管理界面"""
@@ -433,19 +1042,21 @@ class AppManager:
         
         # 备份列表和管理
         st.markdown("#### 🗂️ 备份列表")
-        backup_dirs = self.get_available_backups()
-        if backup_dirs:
-            for backup_dir in backup_dirs:
+        backup_catalog = self.get_backup_catalog()
+        if backup_catalog:
+            for entry in backup_catalog:
+                backup_dir = entry["name"]
                 with st.expander(f"备份: {backup_dir}"):
                     backup_path = os.path.join(BACKUP_DIR, backup_dir)
-                    backup_time = os.path.getctime(backup_path)
-                    st.text(f"创建时间: {datetime.fromtimestamp(backup_time).strftime('%Y-%m-%d %H:%M:%S')}")
+                    st.text(f"创建时间: {datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d %H:%M:%S')}")
+                    st.text(f"文件数: {entry['file_count']} · 大小: {entry['size'] / 1024:.1f} KB")
                     
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button("删除备份", key=f"delete_backup_{backup_dir}"):
                             try:
-                                shutil.rmtree(backup_path)
+                                # 删除后回收不再被任何快照引用的对象
+                                get_backup_store(BACKUP_DIR, EXPORT_DIR).delete(backup_path)
                                 st.success("✅ 备份删除成功！")
                                 st.experimental_rerun()
                             except Exception as e:
@@ -453,19 +1064,20 @@ class AppManager:
                     with col2:
                         if st.button("导出备份", key=f"export_backup_{backup_dir}"):
                             try:
-                                zip_path = shutil.make_archive(
-                                    backup_path,
-                                    'zip',
-                                    backup_path
-                                )
-                                with open(zip_path, 'rb') as f:
-                                    st.download_button(
-                                        label="下载备份文件",
-                                        data=f.read(),
-                                        file_name=f"{backup_dir}.zip",
-                                        mime="application/zip",
-                                        key=f"download_{backup_dir}"
-                                    )
+                                # 归档写在磁盘上并按内容哈希缓存，相同内容的备份不重复打包
+                                zip_path, cached = get_backup_store(BACKUP_DIR, EXPORT_DIR).export_archive(backup_path)
+                                # 下载由 HTTP 接口按块发送，归档不经过 Streamlit 读入内存
+                                if self.api_server is not None and self.api_server.error is None:
+                                    token = download_links.issue(zip_path, f"{backup_dir}.zip")
+                                    st.markdown(f"[⬇️ 下载备份文件](http://{self.api_server.host}:"
+                                                f"{self.api_server.port}/downloads/{token})")
+                                    st.caption(f"链接 {DOWNLOAD_LINK_TTL // 60} 分钟内有效；HTTP 接口只监听 "
+                                               f"{self.api_server.host}，需在能访问该地址的浏览器中打开")
+                                else:
+                                    st.info(f"归档已保存在服务器上：{os.path.abspath(zip_path)}。"
+                                            "在“执行与性能”中设置 HTTP 接口端口后可通过临时链接下载。")
+                                if cached:
+                                    st.caption("已使用缓存的导出归档")
                             except Exception as e:
                                 st.error(f"导出备份失败: {str(e)}")
 
@@ -477,54 +1089,62 @@ class AppManager:
                 BACKUP_DIR,
                 f"backup_{backup_name}_{timestamp}" if backup_name else f"backup_{timestamp}"
             )
-            os.makedirs(backup_path, exist_ok=True)
             
-            # 备份配置文件
-            if os.path.exists(CONFIG_FILE):
-                shutil.copy2(CONFIG_FILE, backup_path)
+            # 先把变更日志合并进配置快照，备份中的配置文件即为完整状态
+            get_config_store(CONFIG_FILE).compact()
             
-            # 备份上传的应用
-            if os.path.exists(UPLOAD_DIR):
-                shutil.copytree(
-                    UPLOAD_DIR,
-                    os.path.join(backup_path, "uploaded_apps"),
-                    dirs_exist_ok=True
-                )
+            # 增量快照：配置文件与上传的应用写入共享对象存储，备份目录只保存清单
+            get_backup_store(BACKUP_DIR, EXPORT_DIR).snapshot(
+                backup_path, collect_backup_files(CONFIG_FILE, UPLOAD_DIR)
+            )
             
             return backup_path, True
         except Exception as e:
             st.error(f"创建备份失败: {str(e)}")
             return None, False
 
-    def get_available_backups(self) -> List[str]:
-        """获取可用的备份列表"""
+    def get_backup_catalog(self) -> List[Dict]:
+        """获取备份索引（按创建时间倒序）"""
         try:
-            return [d for d in os.listdir(BACKUP_DIR)
-                   if os.path.isdir(os.path.join(BACKUP_DIR, d)) and d.startswith("backup_")]
+            return get_backup_store(BACKUP_DIR, EXPORT_DIR).catalog()
         except Exception:
             return []
 
+    def get_available_backups(self) -> List[str]:
+        """获取可用的备份列表"""
+        return [entry["name"] for entry in self.get_backup_catalog()]
+
     def restore_backup(self, backup_dir: str) -> bool:
         """恢复备份"""
         try:
-            # 恢复配置文件
-            backup_config_path = os.path.join(backup_dir, CONFIG_FILE)
-            if os.path.exists(backup_config_path):
-                shutil.copy2(backup_config_path, ".")
-            else:
-                raise FileNotFoundError(f"备份中缺少配置文件: {backup_config_path}")
-
-            # 恢复上传的应用
-            uploaded_apps_backup = os.path.join(backup_dir, "uploaded_apps")
-            if os.path.exists(uploaded_apps_backup):
-                if os.path.exists(UPLOAD_DIR):
-                    shutil.rmtree(UPLOAD_DIR)
-                shutil.copytree(uploaded_apps_backup, UPLOAD_DIR)
+            backup_store = get_backup_store(BACKUP_DIR, EXPORT_DIR)
+            if backup_store.is_snapshot(backup_dir):
+                if CONFIG_FILE not in backup_store.read_manifest(backup_dir)["files"]:
+                    raise FileNotFoundError(f"备份中缺少配置文件: {CONFIG_FILE}")
+                # 只还原内容有变化的文件，并删除快照之后新增的应用文件
+                backup_store.restore(backup_dir, ".", prune_dirs=[UPLOAD_DIR])
             else:
-                raise FileNotFoundError(f"备份中缺少上传的应用目录: {uploaded_apps_backup}")
+                # 旧版备份：完整的目录拷贝
+                backup_config_path = os.path.join(backup_dir, CONFIG_FILE)
+                if os.path.exists(backup_config_path):
+                    shutil.copy2(backup_config_path, ".")
+                else:
+                    raise FileNotFoundError(f"备份中缺少配置文件: {backup_config_path}")
+
+                uploaded_apps_backup = os.path.join(backup_dir, "uploaded_apps")
+                if os.path.exists(uploaded_apps_backup):
+                    if os.path.exists(UPLOAD_DIR):
+                        shutil.rmtree(UPLOAD_DIR)
+                    shutil.copytree(uploaded_apps_backup, UPLOAD_DIR)
+                else:
+                    raise FileNotFoundError(f"备份中缺少上传的应用目录: {uploaded_apps_backup}")
 
-            # 重新加载配置
+            # 以恢复的配置为新快照并清空变更日志，避免旧日志被重放到恢复后的配置上
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                get_config_store(CONFIG_FILE).save(json.load(f))
             self.apps_config = self.load_apps_config()
+            # 备份可能来自其他机器，确保其中的源码都已进入 blob 存储
+            self.sync_sources_from_files()
             return True
         except Exception as e:
             st.error(f"恢复备份失败: {str(e)}")
@@ -539,7 +1159,8 @@ class AppManager:
         default_id = self.generate_random_id()
         default_title = self.generate_random_title()
         default_description = self.generate_random_description()
-        default_icon = random.choice(ICON_LIST)
+        icon_choices = icon_assets.choices()
+        default_icon = random.choice(icon_choices)
         
         # 上传方式选择
         upload_method = st.radio("选择上传方式", ["上传文件", "直接编写代码"])
@@ -550,7 +1171,7 @@ class AppManager:
             new_app_id = st.text_input("应用ID", value=default_id, help="留空将自动生成")
             new_app_title = st.text_input("应用标题", value=default_title, help="留空将自动生成")
         with col2:
-            new_app_icon = st.selectbox("应用图标", ICON_LIST, index=ICON_LIST.index(default_icon))
+            new_app_icon = st.selectbox("应用图标", icon_choices, index=icon_choices.index(default_icon))
             new_app_category = st.selectbox(
                 "应用分类",
                 [cat["id"] for cat in self.apps_config["categories"]],
@@ -594,43 +1215,67 @@ class AppManager:
             file_path = os.path.join(UPLOAD_DIR, f"{final_app_id}.py")
             with open(file_path, "w", encoding='utf-8') as f:
                 f.write(code_content)
+            code_cache.invalidate(final_app_id)
             
             # 更新配置
-            self.apps_config["apps"].append({
+            new_app = {
                 "id": final_app_id,
                 "title": final_title,
                 "description": final_description,
                 "icon": icon,
                 "category": category,
                 "module": final_app_id,
-                "code": code_content
-            })
+                "code_sha256": blob_store.put(code_content),
+                "imports": scan_imports(code_content),
+                **describe_source(code_content)
+            }
+            prewarm(new_app["imports"])
             
-            self.save_apps_config()
+            self.record_config_change({"op": "upsert_app", "app": new_app})
+            self.get_search_index().add(new_app, code_content)
             return True
         except Exception as e:
             st.error(f"上传应用失败: {str(e)}")
             return False
 
+    def get_session_id(self) -> str:
+        """当前浏览器会话的标识"""
+        if "session_id" not in st.session_state:
+            st.session_state.session_id = uuid.uuid4().hex
+        return st.session_state.session_id
+
     def run_app(self, app_id: str):
         """运行指定的应用"""
         try:
-            app = next((app for app in self.apps_config["apps"] if app["id"] == app_id), None)
+            app = self.get_app(app_id)
             if not app:
                 st.error("找不到指定的应用")
                 return
 
-            code_file = os.path.join(UPLOAD_DIR, f"{app['id']}.py")
-            if os.path.exists(code_file):
-                with open(code_file, 'r', encoding='utf-8') as f:
-                    code = f.read()
-                module = self.load_module(app["id"], code)
-                if module and hasattr(module, 'run'):
-                    module.run()
-                else:
-                    st.error("应用代码中未找到 run() 函数")
-            else:
-                st.error(f"无法找到应用代码文件：{code_file}")
+            scheduler.configure(int(self.get_setting("max_concurrent_runs")))
+            queue_notice = st.empty()
+            with scheduler.admit(app_id, self.get_session_id(), app.get("weight", DEFAULT_APP_WEIGHT),
+                                 queue_timeout=self.get_setting("queue_timeout"),
+                                 run_timeout=self.get_setting("run_timeout"),
+                                 on_wait=lambda position: queue_notice.info(f"⏳ 排队中，第 {position} 位")) as ticket:
+                queue_notice.empty()
+                with telemetry.measure(app_id, self.get_session_id(),
+                                       self.get_setting("telemetry_memory_sample_rate")):
+                    telemetry.note("queue_wait", ticket.admitted_at - ticket.arrival)
+                    code = self.get_app_source(app)
+                    if code is not None:
+                        with module_registry.pin(app["id"]), profiler.profile(app["id"]):
+                            module = self.load_module(app["id"], code, app.get("execution", EXECUTION_INLINE))
+                            if module and hasattr(module, 'run'):
+                                module.run()
+                            else:
+                                st.error("应用代码中未找到 run() 函数")
+                    else:
+                        st.error(f"无法找到应用代码文件：{os.path.join(UPLOAD_DIR, app['id'] + '.py')}")
+        except QueueTimeout:
+            st.warning("⏳ 当前运行的应用较多，排队超时，请稍后重试")
+        except RunCancelled:
+            pass
         except Exception as e:
             st.error(f"运行应用时出错：{str(e)}")
 
@@ -654,9 +1299,9 @@ def main():
     elif selected == "设置":
         st.session_state.selected_app = "settings"
     else:
-        for app in app_manager.apps_config["apps"]:
-            if app["title"] == selected:
-                st.session_state.selected_app = app["id"]
+        app = app_manager.get_app_by_title(selected)
+        if app:
+            st.session_state.selected_app = app["id"]
     
     # 加载页面
     if st.session_state.selected_app == "home":
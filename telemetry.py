@@ -0,0 +1,178 @@
+"""上传应用的运行遥测
+
+记录每次运行的墙钟时间、CPU 时间、编译耗时、异常以及（抽样的）内存增量，
+按应用 ID 与会话 ID 归档到有界的内存环形缓冲区中，并由后台线程定期追加写入
+本地 JSON Lines 文件。
+
+内存只对一部分运行抽样，且同一时间只有一次运行在采样。进程已经开启 tracemalloc
+（例如以 PYTHONTRACEMALLOC=1 启动）时记录运行期间的分配峰值，否则记录常驻内存
+（RSS）的增长。这里不会按次启停 tracemalloc：在其他线程仍在分配内存时调用
+tracemalloc.stop() 会让 CPython 3.11 崩溃。
+"""
+import contextlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Dict, List, Optional
+
+TELEMETRY_DIR = "telemetry"
+TELEMETRY_FILE = os.path.join(TELEMETRY_DIR, "runs.jsonl")
+MAX_FILE_BYTES = 20 * 1024 * 1024
+FLUSH_INTERVAL = 30
+
+# Streamlit 用异常实现重跑与停止，它们不是应用错误
+CONTROL_FLOW_EXCEPTIONS = {"RerunException", "StopException"}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩法求百分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存；不支持的平台返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Telemetry:
+    """有界的运行记录环形缓冲区，周期性落盘"""
+
+    def __init__(self, capacity: int = 10000, path: str = TELEMETRY_FILE, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._records: deque = deque(maxlen=capacity)
+        self._pending: List[Dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sampling = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    @contextlib.contextmanager
+    def measure(self, app_id: str, session_id: str, memory_sample_rate: float = 0.0):
+        """测量一次运行；异常照常抛出，但会被记为错误"""
+        record = {
+            "ts": time.time(),
+            "app_id": app_id,
+            "session_id": session_id,
+            "compile": 0.0,
+            "error": None,
+            "peak_mem": None,
+        }
+        sample_memory = (memory_sample_rate > 0 and random.random() < memory_sample_rate
+                         and self._sampling.acquire(blocking=False))
+        tracing = sample_memory and tracemalloc.is_tracing()
+        rss_start = None
+        if tracing:
+            tracemalloc.reset_peak()
+            traced_start = tracemalloc.get_traced_memory()[0]
+        elif sample_memory:
+            rss_start = _rss_bytes()
+        self._local.record = record
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        except BaseException as e:
+            if type(e).__name__ not in CONTROL_FLOW_EXCEPTIONS:
+                record["error"] = type(e).__name__
+            raise
+        finally:
+            record["wall"] = time.perf_counter() - wall_start
+            record["cpu"] = time.thread_time() - cpu_start
+            if sample_memory:
+                if tracing:
+                    record["peak_mem"] = max(0, tracemalloc.get_traced_memory()[1] - traced_start)
+                elif rss_start is not None:
+                    rss_end = _rss_bytes()
+                    record["peak_mem"] = max(0, rss_end - rss_start) if rss_end is not None else None
+                self._sampling.release()
+            self._local.record = None
+            self._append(record)
+
+    def note(self, key: str, value):
+        """在当前线程正在测量的运行上附加指标（例如编译耗时）"""
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            if isinstance(value, float) and isinstance(record.get(key), float):
+                record[key] += value
+            else:
+                record[key] = value
+
+    def _append(self, record: Dict):
+        with self._lock:
+            self._records.append(record)
+            self._pending.append(record)
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="telemetry-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """把尚未落盘的记录追加写入文件"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > MAX_FILE_BYTES:
+                os.replace(self.path, f"{self.path}.1")
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for record in pending:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            # 落盘失败不影响运行，记录仍保留在内存缓冲区中
+            pass
+
+    def records(self, app_id: Optional[str] = None) -> List[Dict]:
+        """返回缓冲区中的运行记录"""
+        with self._lock:
+            records = list(self._records)
+        if app_id is not None:
+            records = [record for record in records if record["app_id"] == app_id]
+        return records
+
+    def summary(self) -> List[Dict]:
+        """按应用汇总 p50/p95/p99 等指标"""
+        grouped: Dict[str, List[Dict]] = {}
+        for record in self.records():
+            grouped.setdefault(record["app_id"], []).append(record)
+        rows = []
+        for app_id, records in grouped.items():
+            walls = sorted(record["wall"] for record in records)
+            cpus = sorted(record["cpu"] for record in records)
+            peaks = [record["peak_mem"] for record in records if record.get("peak_mem") is not None]
+            rows.append({
+                "app_id": app_id,
+                "runs": len(records),
+                "sessions": len({record["session_id"] for record in records}),
+                "errors": sum(1 for record in records if record.get("error")),
+                "wall_p50": percentile(walls, 50),
+                "wall_p95": percentile(walls, 95),
+                "wall_p99": percentile(walls, 99),
+                "cpu_p50": percentile(cpus, 50),
+                "cpu_p95": percentile(cpus, 95),
+                "compile_mean": sum(record.get("compile", 0.0) for record in records) / len(records),
+                "peak_mem_max": max(peaks) if peaks else None,
+            })
+        rows.sort(key=lambda row: -row["wall_p95"])
+        return rows
+
+
+telemetry = Telemetry()
@@ -0,0 +1,9 @@
+import streamlit as st
+
+
+def run():
+    st.title("求和基准")
+    n = st.slider("项数", min_value=1, max_value=20000, value=1000, key="n")
+    power = st.selectbox("幂次", [1, 2, 3], key="power")
+    with st.expander("结果"):
+        st.write(sum(i ** power for i in range(n)))
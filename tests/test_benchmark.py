@@ -0,0 +1,40 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from benchmark import check_report
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BENCH_APP = "bench_sum"
+THRESHOLDS = os.path.join(HERE, "bench_thresholds.json")
+
+
+def test_benchmark_within_thresholds(tmp_path):
+    os.makedirs(tmp_path / "uploaded_apps")
+    shutil.copy(os.path.join(HERE, "bench_apps", f"{BENCH_APP}.py"), tmp_path / "uploaded_apps")
+    with open(tmp_path / "apps_config.json", 'w', encoding='utf-8') as f:
+        json.dump({"apps": [{"id": BENCH_APP, "title": "求和基准", "description": "", "icon": "",
+                             "category": "default", "module": BENCH_APP}],
+                   "categories": [{"id": "default", "name": "默认分组", "icon": "folder"}],
+                   "settings": {}}, f, ensure_ascii=False)
+
+    # 在子进程中运行：替身 streamlit 模块和启动器的后台线程不会留在测试进程里
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "benchmark.py"), "--app", BENCH_APP, "--repeat", "3",
+         "--output", "report.json", "--thresholds", THRESHOLDS],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+
+    with open(tmp_path / "report.json", 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    with open(THRESHOLDS, 'r', encoding='utf-8') as f:
+        thresholds = json.load(f)
+    assert [app["app_id"] for app in report["apps"]] == [BENCH_APP]
+    # 默认值、最小值、最大值三组输入
+    assert len(report["apps"][0]["scenarios"]) == 3
+    assert check_report(report, thresholds) == []
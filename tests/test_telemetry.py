@@ -0,0 +1,9 @@
+from telemetry import percentile
+
+
+def test_percentile_nearest_rank():
+    assert percentile(list(range(1, 11)), 50) == 5
+    assert percentile(list(range(1, 21)), 95) == 19
+    assert percentile(list(range(1, 21)), 100) == 20
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,191 @@
+"""上传应用的预启动工作进程池
+
+计算密集的应用可以把计算函数交给独立的工作进程执行，避免在 Streamlit
+脚本线程中长时间占用 GIL、拖慢同进程内的其他会话。工作进程启动时已经导入
+numpy、scipy、matplotlib 等常用库，应用源码按摘要从 blob 存储读取并在进程内缓存。
+"""
+import atexit
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from compute_cache import compute_cache
+
+PRELOAD_MODULES = [
+    "numpy",
+    "pandas",
+    "scipy",
+    "scipy.integrate",
+    "matplotlib",
+    "matplotlib.pyplot",
+    "skimage",
+]
+
+EXECUTION_INLINE = "inline"
+EXECUTION_POOL = "pool"
+EXECUTION_MODES = {
+    EXECUTION_INLINE: "脚本线程内执行",
+    EXECUTION_POOL: "工作进程池执行",
+}
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TIMEOUT = 300
+
+# 工作进程内已加载的应用模块，键为 (app_id, 源码摘要)
+_worker_modules: Dict[Tuple[str, str], types.ModuleType] = {}
+
+
+def _init_worker(preload):
+    """工作进程初始化：预先导入常用的科学计算库"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+    except ImportError:
+        pass
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _load_worker_module(app_id: str, digest: str, source_path: str) -> types.ModuleType:
+    key = (app_id, digest)
+    module = _worker_modules.get(key)
+    if module is None:
+        with open(source_path, 'r', encoding='utf-8', newline='') as f:
+            code = f.read()
+        module = types.ModuleType(app_id)
+        module.__file__ = source_path
+        module.offload = _call_inline
+        module.should_stop = _never_stop
+        module.cache = compute_cache.decorator(app_id, digest)
+        sys.modules[app_id] = module
+        exec(compile(code, source_path, 'exec', dont_inherit=True), module.__dict__)
+        # 同一应用只保留最新版本的模块
+        for stale in [k for k in _worker_modules if k[0] == app_id]:
+            del _worker_modules[stale]
+        _worker_modules[key] = module
+    return module
+
+
+def resolve_function(module: types.ModuleType, qualname: str) -> Callable:
+    """按限定名在模块中查找函数"""
+    target: Any = module
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def _run_in_worker(app_id: str, digest: str, source_path: str, qualname: str,
+                   args: tuple, kwargs: dict) -> Any:
+    module = _load_worker_module(app_id, digest, source_path)
+    return resolve_function(module, qualname)(*args, **kwargs)
+
+
+def _call_inline(func: Callable, *args, **kwargs) -> Any:
+    return func(*args, **kwargs)
+
+
+def _never_stop() -> bool:
+    return False
+
+
+def is_offloadable(func: Callable) -> bool:
+    """只有模块级函数（或类中的静态函数）才能在工作进程中按名称找到"""
+    qualname = getattr(func, "__qualname__", "")
+    return bool(qualname) and "<locals>" not in qualname and "<lambda>" not in qualname
+
+
+class WorkerPool:
+    """固定大小、启动时即创建全部进程的工作进程池"""
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, preload=None):
+        self.size = size
+        self.preload = list(PRELOAD_MODULES if preload is None else preload)
+        if os.name == "posix":
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(self.preload)
+        else:
+            context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(processes=size, initializer=_init_worker, initargs=(self.preload,))
+
+    def submit(self, app_id: str, digest: str, source_path: str, func: Callable,
+               args: tuple = (), kwargs: Optional[dict] = None):
+        """提交应用中的模块级函数，返回 AsyncResult"""
+        return self._pool.apply_async(
+            _run_in_worker,
+            (app_id, digest, os.path.abspath(source_path), func.__qualname__, args, kwargs or {}),
+        )
+
+    def call(self, app_id: str, digest: str, source_path: str, func: Callable,
+             args: tuple = (), kwargs: Optional[dict] = None, timeout: float = DEFAULT_TIMEOUT) -> Any:
+        """在工作进程中执行函数并等待结果"""
+        return self.submit(app_id, digest, source_path, func, args, kwargs).get(timeout)
+
+    def retire(self, grace: float = DEFAULT_TIMEOUT):
+        """不再接收新任务；已提交的任务照常执行并返回结果，grace 秒后仍未结束的进程被终止"""
+        pool = self._pool
+        pool.close()
+        timer = threading.Timer(grace, pool.terminate)
+        timer.daemon = True
+        timer.start()
+
+        def wait():
+            pool.join()
+            timer.cancel()
+
+        threading.Thread(target=wait, name="worker-pool-retire", daemon=True).start()
+
+    def close(self):
+        """终止所有工作进程"""
+        self._pool.terminate()
+        self._pool.join()
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(size: int = DEFAULT_POOL_SIZE) -> WorkerPool:
+    """获取进程级共享的工作进程池，池大小变化时重建（旧池中等待结果的调用不受影响）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.size != size:
+            _pool.retire()
+            _pool = None
+        if _pool is None:
+            _pool = WorkerPool(size)
+        return _pool
+
+
+def shutdown_worker_pool():
+    """关闭共享的工作进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(shutdown_worker_pool)
+
+
+def make_offload(app_id: str, digest: str, source_path: str, execution: str,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT) -> Callable:
+    """生成注入到应用模块中的 offload(func, *args, **kwargs)
+
+    应用被路由到进程池时，模块级函数会在工作进程中执行，结果经 pickle 传回；
+    否则（或函数无法按名称定位时）直接在当前线程调用。
+    """
+    def offload(func: Callable, *args, **kwargs) -> Any:
+        if execution != EXECUTION_POOL or not is_offloadable(func):
+            return func(*args, **kwargs)
+        return get_worker_pool(pool_size).call(
+            app_id, digest, source_path, func, args, kwargs, timeout=timeout
+        )
+    return offload